@@ -0,0 +1,3 @@
+# Benchmarks for the expense tracker
+#
+# Run from the project root, e.g. `python -m benchmarks.monthly_report`.
@@ -0,0 +1,87 @@
+# Deterministic data generator for benchmarks
+#
+# The same seed always produces the same users, accounts, categories and
+# transactions, so numbers from different runs are comparable.
+
+import random
+from datetime import date, timedelta
+
+import rollups
+
+DEFAULT_ACCOUNTS = [('UPI', 'upi'), ('Card', 'card'), ('Cash', 'cash')]
+INCOME_CATEGORIES = ['Home', 'Salary', 'Award', 'Lottery']
+EXPENSE_CATEGORIES = ['Rent', 'Transport', 'Food', 'Shopping', 'Health', 'Others']
+
+
+def seed_database(conn, users=10, transactions_per_user=1000, days=730, seed=42, end_date=None):
+    """Insert `users` users with `transactions_per_user` transactions each, spread over `days` days
+
+    Returns the list of created user ids.
+    """
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+    cursor = conn.cursor()
+    user_ids = []
+
+    for index in range(users):
+        cursor.execute(
+            "INSERT INTO users (username, email, password_hash, email_notifications) VALUES (%s, %s, %s, %s)",
+            (f"bench_user_{seed}_{index}", f"bench_{seed}_{index}@example.com", "x", True)
+        )
+        user_id = cursor.lastrowid
+        user_ids.append(user_id)
+
+        account_ids = []
+        for name, account_type in DEFAULT_ACCOUNTS:
+            cursor.execute(
+                "INSERT INTO accounts (user_id, name, account_type, balance) VALUES (%s, %s, %s, %s)",
+                (user_id, name, account_type, 0)
+            )
+            account_ids.append(cursor.lastrowid)
+
+        category_ids = {'income': [], 'expense': []}
+        for category_type, names in (('income', INCOME_CATEGORIES), ('expense', EXPENSE_CATEGORIES)):
+            for name in names:
+                cursor.execute(
+                    "INSERT INTO categories (user_id, name, type, is_default) VALUES (%s, %s, %s, TRUE)",
+                    (user_id, name, category_type)
+                )
+                category_ids[category_type].append(cursor.lastrowid)
+
+        rows = []
+        balances = dict.fromkeys(account_ids, 0.0)
+        for _ in range(transactions_per_user):
+            transaction_date = end_date - timedelta(days=rng.randrange(days))
+            account_id = rng.choice(account_ids)
+            roll = rng.random()
+            if roll < 0.2:
+                amount = round(rng.uniform(1000, 50000), 2)
+                rows.append((user_id, account_id, rng.choice(category_ids['income']), None,
+                             amount, 'income', transaction_date))
+                balances[account_id] += amount
+            elif roll < 0.95:
+                amount = round(rng.uniform(10, 5000), 2)
+                rows.append((user_id, account_id, rng.choice(category_ids['expense']), None,
+                             amount, 'expense', transaction_date))
+                balances[account_id] -= amount
+            else:
+                to_account_id = rng.choice([a for a in account_ids if a != account_id])
+                amount = round(rng.uniform(100, 10000), 2)
+                rows.append((user_id, account_id, None, to_account_id,
+                             amount, 'transfer', transaction_date))
+                balances[account_id] -= amount
+                balances[to_account_id] += amount
+
+        cursor.executemany("""
+            INSERT INTO transactions (user_id, account_id, category_id, to_account_id, amount, type, transaction_date)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+
+        for account_id, balance in balances.items():
+            cursor.execute("UPDATE accounts SET balance = %s WHERE id = %s", (round(balance, 2), account_id))
+
+        rollups.rebuild(cursor, user_id)
+
+    conn.commit()
+    cursor.close()
+    return user_ids
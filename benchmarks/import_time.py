@@ -0,0 +1,90 @@
+# Benchmark: cold-start cost of building the app, with and without the reporting stack
+#
+# Each sample runs in a fresh interpreter. "eager" pre-imports the modules app.py
+# used to load at module level (matplotlib.pyplot and the reportlab stack), which
+# reproduces the old startup; "lazy" is the current app, which imports them on
+# first use. The app is built with create_app(start_background=False). Peak RSS is reported above a bare interpreter.
+#
+# Usage: python -m benchmarks.import_time [--runs 5]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORTING_STACK = [
+    'matplotlib.pyplot',
+    'matplotlib.patches',
+    'matplotlib.backends.backend_agg',
+    'reportlab.lib.pagesizes',
+    'reportlab.lib.colors',
+    'reportlab.lib.styles',
+    'reportlab.platypus',
+    'reportlab.lib.units',
+]
+
+PROBE = """
+import importlib, json, os, resource, sys, time
+preload, import_app = json.loads(sys.argv[1])
+start = time.perf_counter()
+for name in preload:
+    importlib.import_module(name)
+if import_app:
+    import app
+    app.create_app(start_background=False)
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'reporting_loaded': any(m in sys.modules for m in ('matplotlib', 'reportlab')),
+}))
+sys.stdout.flush()
+os._exit(0)
+"""
+
+
+def sample(preload, import_app):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, json.dumps([preload, import_app])],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(preload, import_app, runs):
+    samples = [sample(preload, import_app) for _ in range(runs)]
+    return {
+        'seconds': statistics.median(s['seconds'] for s in samples),
+        'rss_kb': statistics.median(s['rss_kb'] for s in samples),
+        'reporting_loaded': samples[-1]['reporting_loaded'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import time of the app with and without the reporting stack")
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    # Warm the OS file cache and .pyc files so the runs compare imports, not disk reads
+    sample(REPORTING_STACK, True)
+
+    bare = measure([], False, args.runs)
+    eager = measure(REPORTING_STACK, True, args.runs)
+    lazy = measure([], True, args.runs)
+
+    print(f"median of {args.runs} fresh interpreters")
+    for label, result in (('eager (before)', eager), ('lazy (after)', lazy)):
+        print(f"{label:<16} import {result['seconds'] * 1000:7.1f} ms   "
+              f"RSS +{(result['rss_kb'] - bare['rss_kb']) / 1024:6.1f} MB   "
+              f"reporting stack loaded: {result['reporting_loaded']}")
+    print(f"saved            import {(eager['seconds'] - lazy['seconds']) * 1000:7.1f} ms   "
+          f"RSS  {(eager['rss_kb'] - lazy['rss_kb']) / 1024:6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
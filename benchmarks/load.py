@@ -0,0 +1,381 @@
+# Load test: concurrent authenticated sessions against the JSON and PDF APIs
+#
+# Seeds --users users with --transactions transactions each (benchmarks.datagen,
+# so the same seed gives the same data) into the SQLite stand-in, or into the
+# MySQL database in DB_CONFIG with --mysql, and builds the app with
+# create_app(start_background=False). --sessions threads then log in as
+# different seeded users and each send --requests requests, cycling through the
+# endpoints, either through the Flask test client or, with --http, over HTTP to
+# a local threaded server.
+#
+# Reported: p50/p95/p99 latency per endpoint and overall, requests/sec, and
+# queries per request (measured one request at a time, so concurrent sessions
+# do not blur it; on MySQL this reads the server-wide Questions counter).
+# --revalidate makes each session send back the ETag it last got for a path,
+# as a polling browser does, so unchanged data is answered 304 (ETags are
+# only sent with CACHE_BACKEND=redis).
+# --save NAME stores the results in benchmarks/baselines/NAME.json and
+# --compare NAME exits non-zero if latency, throughput or query count regressed
+# beyond --tolerance.
+#
+# Usage: python -m benchmarks.load [--users 20] [--transactions 1000] [--sessions 8]
+#        [--requests 40] [--http] [--no-cache] [--revalidate] [--save NAME | --compare NAME]
+
+import argparse
+import http.client
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+from benchmarks import standin
+from benchmarks.datagen import seed_database
+from periods import previous_month
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+ENDPOINTS = {
+    'dashboard_bootstrap': '/api/dashboard/bootstrap',
+    'dashboard_data': '/api/dashboard_data',
+    'transactions': '/api/transactions',
+    'expense_overview': '/api/analysis/expense_overview',
+    'income_flow': '/api/analysis/income_flow',
+    'monthly_report': '/api/monthly-report/{year}/{month}',
+    'monthly_report_pdf': '/api/monthly-report/{year}/{month}/pdf',
+}
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def summarize(latencies, errors, elapsed=None):
+    latencies = sorted(latencies)
+    result = {
+        'requests': len(latencies),
+        'errors': errors,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+    if elapsed is not None:
+        result['rps'] = round(len(latencies) / elapsed, 2) if elapsed else 0.0
+    return result
+
+
+def conditional_headers(etags, path):
+    if etags and path in etags:
+        return {'If-None-Match': etags[path]}
+    return {}
+
+
+def remember_etag(etags, path, etag):
+    if etags is not None and etag:
+        etags[path] = etag
+
+
+class TestClientSession:
+    """One logged-in user driving the app through the Flask test client"""
+
+    def __init__(self, app, user_id, revalidate=False):
+        self.client = app.test_client()
+        with self.client.session_transaction() as s:
+            s['user_id'] = user_id
+            s['username'] = f"user_{user_id}"
+        self.etags = {} if revalidate else None
+
+    def get(self, path):
+        response = self.client.get(path, headers=conditional_headers(self.etags, path))
+        response.get_data()
+        response.close()
+        remember_etag(self.etags, path, response.headers.get('ETag'))
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class HTTPSession:
+    """One logged-in user on a keep-alive HTTP connection with a signed session cookie"""
+
+    def __init__(self, app, user_id, port, revalidate=False):
+        serializer = app.session_interface.get_signing_serializer(app)
+        cookie = serializer.dumps({'user_id': user_id, 'username': f"user_{user_id}"})
+        self.headers = {'Cookie': f"{app.config['SESSION_COOKIE_NAME']}={cookie}"}
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        self.etags = {} if revalidate else None
+
+    def get(self, path):
+        self.conn.request('GET', path, headers={**self.headers, **conditional_headers(self.etags, path)})
+        response = self.conn.getresponse()
+        response.read()
+        remember_etag(self.etags, path, response.getheader('ETag'))
+        return response.status
+
+    def close(self):
+        self.conn.close()
+
+
+def start_server(app):
+    """Serve app from a local threaded WSGI server; returns (server, port)"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, name='load-server', daemon=True).start()
+    return server, server.server_port
+
+
+def build_app(args, tmp):
+    """(app, user_ids, query counter) for the configured database"""
+    import app as appmod
+    from config import load_config
+
+    config = load_config()
+    overrides = {
+        'SECRET_KEY': 'load-test',
+        'REPORT_CACHE_CONFIG': dict(config['REPORT_CACHE_CONFIG'], directory=os.path.join(tmp, 'report_cache')),
+        # One printed line per request would dominate the measurements
+        'QUERY_STATS_CONFIG': dict(config['QUERY_STATS_CONFIG'], log_requests=False),
+    }
+    if args.no_cache:
+        overrides['CACHE_CONFIG'] = dict(config['CACHE_CONFIG'], enabled=False)
+        overrides['REPORT_CACHE_CONFIG']['enabled'] = False
+    flask_app = appmod.create_app(overrides, start_background=False)
+    pool = flask_app.extensions['db_pool']
+    pool.max_overflow = max(pool.max_overflow, args.sessions)
+
+    if args.mysql:
+        conn = pool.connect_unpooled()
+
+        def queries():
+            probe = pool.connect_unpooled()
+            cursor = probe.cursor()
+            cursor.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+            count = int(cursor.fetchone()[1])
+            cursor.close()
+            probe.close()
+            return count - 1
+    else:
+        path = args.database or os.path.join(tmp, 'load.sqlite3')
+        conn = standin.connect(path)
+        connections = []
+        lock = threading.Lock()
+
+        def creator():
+            c = standin.connect(path, latency=args.latency_ms / 1000, create_schema=False)
+            with lock:
+                connections.append(c)
+            return c
+
+        pool._creator = creator
+
+        def queries():
+            with lock:
+                return sum(c.statements for c in connections)
+
+    user_ids = seeded_users(conn, args)
+    conn.close()
+    return flask_app, user_ids, queries
+
+
+def seeded_users(conn, args):
+    """Users seeded with args.seed, reusing them if an earlier run left them in the database"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE username LIKE %s ORDER BY id", (f"bench_user_{args.seed}_%",))
+    user_ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    if len(user_ids) >= args.users:
+        return user_ids[:args.users]
+    if user_ids:
+        sys.exit(f"Database has {len(user_ids)} users for seed {args.seed}; use another --seed or database")
+    print(f"Seeding {args.users} users x {args.transactions} transactions...")
+    return seed_database(conn, users=args.users, transactions_per_user=args.transactions,
+                         days=args.days, seed=args.seed)
+
+
+def endpoint_paths(names):
+    today = date.today()
+    year, month = previous_month(today.year, today.month)
+    return [(name, ENDPOINTS[name].format(year=year, month=month)) for name in names]
+
+
+def count_queries(make_session, user_ids, paths, queries):
+    """Statements per request for each endpoint, one request at a time after a warm-up"""
+    session = make_session(user_ids[0])
+    counts = {}
+    for name, path in paths:
+        session.get(path)
+        before = queries()
+        session.get(path)
+        counts[name] = queries() - before
+    session.close()
+    return counts
+
+
+def run_load(make_session, user_ids, paths, args):
+    results = {name: [] for name, _ in paths}
+    errors = {name: 0 for name, _ in paths}
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.sessions + 1)
+
+    def worker(index):
+        session = make_session(user_ids[index % len(user_ids)])
+        for i in range(args.warmup):
+            session.get(paths[(index + i) % len(paths)][1])
+        barrier.wait()
+        local = []
+        for i in range(args.requests):
+            name, path = paths[(index + i) % len(paths)]
+            start = time.perf_counter()
+            status = session.get(path)
+            local.append((name, time.perf_counter() - start, status >= 400))
+        session.close()
+        with lock:
+            for name, latency, failed in local:
+                results[name].append(latency)
+                errors[name] += failed
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.sessions)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = [latency for latencies in results.values() for latency in latencies]
+    return {
+        'total': summarize(all_latencies, sum(errors.values()), elapsed),
+        'endpoints': {name: summarize(results[name], errors[name]) for name, _ in paths},
+    }
+
+
+def print_results(results):
+    print(f"{'':<20} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8}")
+    for name, stats in results['endpoints'].items():
+        print(f"{name:<20} {stats['requests']:>8} {stats['errors']:>6} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['queries']:>8}")
+    total = results['total']
+    print(f"{'total':<20} {total['requests']:>8} {total['errors']:>6} {total['p50_ms']:>9.2f} "
+          f"{total['p95_ms']:>9.2f} {total['p99_ms']:>9.2f} {total['queries_per_request']:>8.1f}")
+    print(f"{total['rps']:.1f} requests/sec")
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of results against baseline, as printable lines"""
+    regressions = []
+
+    def check(label, new, old):
+        if new['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {old['p95_ms']:.2f} -> {new['p95_ms']:.2f} ms")
+        if 'queries' in old and new['queries'] > old['queries']:
+            regressions.append(f"{label}: queries {old['queries']} -> {new['queries']}")
+
+    check('total', results['total'], baseline['total'])
+    old_rps, new_rps = baseline['total']['rps'], results['total']['rps']
+    if new_rps < old_rps * (1 - tolerance):
+        regressions.append(f"total: {old_rps:.1f} -> {new_rps:.1f} requests/sec")
+    for name, stats in results['endpoints'].items():
+        if name in baseline['endpoints']:
+            check(name, stats, baseline['endpoints'][name])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the API with concurrent sessions')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--transactions', type=int, default=1000, help='transactions per user')
+    parser.add_argument('--days', type=int, default=365, help='spread transactions over this many days')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sessions', type=int, default=8, help='concurrent logged-in sessions')
+    parser.add_argument('--requests', type=int, default=40, help='measured requests per session')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured requests per session')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                        help=f"comma-separated subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument('--http', action='store_true', help='go through a local HTTP server')
+    parser.add_argument('--no-cache', action='store_true', help='disable the response and report caches')
+    parser.add_argument('--revalidate', action='store_true', help='send If-None-Match with the last ETag seen')
+    parser.add_argument('--mysql', action='store_true', help='use the MySQL database in DB_CONFIG')
+    parser.add_argument('--database', default=None, help='stand-in database file to reuse between runs')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='stand-in: simulated round trip')
+    parser.add_argument('--save', metavar='NAME', help='save the results as a baseline')
+    parser.add_argument('--compare', metavar='NAME', help='compare with a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = [name for name in names if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        flask_app, user_ids, queries = build_app(args, tmp)
+        paths = endpoint_paths(names)
+
+        server = None
+        if args.http:
+            server, port = start_server(flask_app)
+            make_session = lambda user_id: HTTPSession(flask_app, user_id, port, args.revalidate)
+        else:
+            make_session = lambda user_id: TestClientSession(flask_app, user_id, args.revalidate)
+
+        try:
+            query_counts = count_queries(make_session, user_ids, paths, queries)
+            print(f"{args.sessions} sessions x {args.requests} requests, {len(user_ids)} users, "
+                  f"{'HTTP' if args.http else 'test client'}, cache {'off' if args.no_cache else 'on'}, "
+                  f"{'revalidating, ' if args.revalidate else ''}"
+                  f"{'MySQL' if args.mysql else 'stand-in'}")
+            results = run_load(make_session, user_ids, paths, args)
+        finally:
+            if server is not None:
+                server.shutdown()
+
+    for name, count in query_counts.items():
+        results['endpoints'][name]['queries'] = count
+    results['total']['queries_per_request'] = round(
+        sum(query_counts[name] * stats['requests'] for name, stats in results['endpoints'].items())
+        / max(results['total']['requests'], 1), 2)
+    results['config'] = {
+        'users': args.users, 'transactions': args.transactions, 'seed': args.seed,
+        'sessions': args.sessions, 'requests': args.requests, 'http': args.http,
+        'cache': not args.no_cache, 'backend': 'mysql' if args.mysql else 'standin',
+        'latency_ms': args.latency_ms, 'revalidate': args.revalidate,
+    }
+    print_results(results)
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save}.json")
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline {path}")
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != results['config']:
+            print("Warning: baseline was recorded with different settings")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+# Benchmark: monthly report data, five queries per month vs one rollup query
+#
+# Usage: python -m benchmarks.monthly_report [--users 20] [--transactions 2000] [--latency-ms 0.5]
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import date
+
+from benchmarks import standin
+from benchmarks.datagen import seed_database
+from periods import month_range, previous_month
+from report_data import fetch_monthly_reports
+
+
+def legacy_monthly_report_data(cursor, user_id, month, year):
+    """The previous implementation: five separate queries for one month"""
+    cursor.execute("""
+        SELECT COALESCE(SUM(amount), 0) FROM transactions
+        WHERE user_id = %s AND type = 'income'
+        AND MONTH(transaction_date) = %s AND YEAR(transaction_date) = %s
+    """, (user_id, month, year))
+    total_income = float(cursor.fetchone()[0])
+
+    cursor.execute("""
+        SELECT COALESCE(SUM(amount), 0) FROM transactions
+        WHERE user_id = %s AND type = 'expense'
+        AND MONTH(transaction_date) = %s AND YEAR(transaction_date) = %s
+    """, (user_id, month, year))
+    total_expense = float(cursor.fetchone()[0])
+
+    cursor.execute("""
+        SELECT c.name, SUM(t.amount) as total
+        FROM transactions t
+        JOIN categories c ON t.category_id = c.id
+        WHERE t.user_id = %s AND t.type = 'income'
+        AND MONTH(transaction_date) = %s AND YEAR(transaction_date) = %s
+        GROUP BY c.id, c.name
+        ORDER BY total DESC
+    """, (user_id, month, year))
+    income_categories = [{'name': row[0], 'amount': float(row[1])} for row in cursor.fetchall()]
+
+    cursor.execute("""
+        SELECT c.name, SUM(t.amount) as total
+        FROM transactions t
+        JOIN categories c ON t.category_id = c.id
+        WHERE t.user_id = %s AND t.type = 'expense'
+        AND MONTH(transaction_date) = %s AND YEAR(transaction_date) = %s
+        GROUP BY c.id, c.name
+        ORDER BY total DESC
+    """, (user_id, month, year))
+    expense_categories = [{'name': row[0], 'amount': float(row[1])} for row in cursor.fetchall()]
+
+    cursor.execute("""
+        SELECT COUNT(*) FROM transactions
+        WHERE user_id = %s
+        AND MONTH(transaction_date) = %s AND YEAR(transaction_date) = %s
+    """, (user_id, month, year))
+    transaction_count = cursor.fetchone()[0]
+
+    return {
+        'total_income': total_income,
+        'total_expense': total_expense,
+        'income_categories': income_categories,
+        'expense_categories': expense_categories,
+        'transaction_count': transaction_count,
+    }
+
+
+def run_legacy(conn, user_ids, year, month):
+    """Current and previous month per user, as generate_monthly_report_pdf used to fetch them"""
+    prev_year, prev_month = previous_month(year, month)
+    cursor = conn.cursor()
+    results = {}
+    for user_id in user_ids:
+        results[user_id] = (
+            legacy_monthly_report_data(cursor, user_id, month, year),
+            legacy_monthly_report_data(cursor, user_id, prev_month, prev_year),
+        )
+    cursor.close()
+    return results
+
+
+def run_rollups(conn, user_ids, year, month):
+    """Current and previous month per user from one monthly_rollups query"""
+    prev_year, prev_month = previous_month(year, month)
+    cursor = conn.cursor()
+    results = {}
+    for user_id in user_ids:
+        reports = fetch_monthly_reports(cursor, user_id, [(year, month), (prev_year, prev_month)])
+        results[user_id] = (reports[(year, month)], reports[(prev_year, prev_month)])
+    cursor.close()
+    return results
+
+
+def measure(label, func, conn, user_ids, year, month, repeat):
+    best = None
+    for _ in range(repeat):
+        conn.statements = 0
+        start = time.perf_counter()
+        results = func(conn, user_ids, year, month)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    round_trips = conn.statements / len(user_ids)
+    print(f"{label:<14} {round_trips:>10.1f} {best * 1000:>12.2f} {best * 1000 / len(user_ids):>14.3f}")
+    return results
+
+
+def check_equivalent(legacy, current):
+    """Both implementations must agree on every figure"""
+    for user_id, legacy_pair in legacy.items():
+        for old, new in zip(legacy_pair, current[user_id]):
+            for key in ('total_income', 'total_expense', 'transaction_count'):
+                assert abs(old[key] - new[key]) < 0.01, (user_id, key, old[key], new[key])
+            for key in ('income_categories', 'expense_categories'):
+                old_totals = sorted((c['name'], round(c['amount'], 2)) for c in old[key])
+                new_totals = sorted((c['name'], round(c['amount'], 2)) for c in new[key])
+                assert old_totals == new_totals, (user_id, key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark monthly report data queries')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--transactions', type=int, default=2000, help='transactions per user')
+    parser.add_argument('--latency-ms', type=float, default=0.5, help='simulated network round trip')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    today = date.today()
+    year, month = previous_month(today.year, today.month)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.sqlite3')
+        conn = standin.connect(path)
+        user_ids = seed_database(conn, users=args.users, transactions_per_user=args.transactions,
+                                 seed=args.seed, end_date=month_range(today.year, today.month)[0])
+        conn.latency = args.latency_ms / 1000
+
+        print(f"{args.users} users x {args.transactions} transactions, "
+              f"report for {year}-{month:02d} plus previous month, "
+              f"{args.latency_ms}ms simulated latency per statement")
+        print(f"{'':<14} {'trips/user':>10} {'wall ms':>12} {'ms/user':>14}")
+        legacy = measure('five-query', run_legacy, conn, user_ids, year, month, args.repeat)
+        current = measure('rollups', run_rollups, conn, user_ids, year, month, args.repeat)
+        check_equivalent(legacy, current)
+        print("Results match.")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Benchmark: per-report PDF render time, fresh styles per report vs shared templates
+#
+# Usage: python -m benchmarks.report_render [--reports 200] [--categories 8]
+
+import argparse
+import random
+import statistics
+import time
+
+from report_pdf import build_templates, render_monthly_report_pdf, report_templates
+
+
+def sample_report(rng, categories):
+    income = [{'name': f"Income {i}", 'amount': round(rng.uniform(1000, 50000), 2)} for i in range(2)]
+    expense = [{'name': f"Expense {i}", 'amount': round(rng.uniform(10, 5000), 2)} for i in range(categories)]
+    expense.sort(key=lambda c: c['amount'], reverse=True)
+    total_income = sum(c['amount'] for c in income)
+    total_expense = sum(c['amount'] for c in expense)
+    return {
+        'total_income': total_income,
+        'total_expense': total_expense,
+        'total_saving': total_income - total_expense,
+        'income_categories': income,
+        'expense_categories': expense,
+        'transaction_count': categories * 10,
+        'month_year': 'September 2026'
+    }
+
+
+def timed(fn, reports):
+    timings = []
+    for report, prev in reports:
+        start = time.perf_counter()
+        fn(report, prev)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def describe(label, timings):
+    ordered = sorted(timings)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{label:<22} mean {statistics.mean(timings):6.2f} ms  "
+          f"p50 {statistics.median(timings):6.2f} ms  p95 {p95:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF render benchmark: fresh styles vs shared templates")
+    parser.add_argument('--reports', type=int, default=200)
+    parser.add_argument('--categories', type=int, default=8)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    reports = [(sample_report(rng, args.categories), sample_report(rng, args.categories))
+               for _ in range(args.reports)]
+
+    # Warm up reportlab's font and module caches so both runs start equal
+    report_templates()
+    render_monthly_report_pdf('warmup', 9, 2026, *reports[0])
+
+    start = time.perf_counter()
+    for _ in range(args.reports):
+        build_templates()
+    build_ms = (time.perf_counter() - start) * 1000 / args.reports
+
+    fresh = timed(lambda r, p: render_monthly_report_pdf('bench', 9, 2026, r, p, build_templates()), reports)
+    shared = timed(lambda r, p: render_monthly_report_pdf('bench', 9, 2026, r, p), reports)
+
+    print(f"{args.reports} reports, {args.categories} expense categories each")
+    print(f"building templates     {build_ms:6.2f} ms per report")
+    describe("fresh styles", fresh)
+    describe("shared templates", shared)
+    print(f"saved per report       {statistics.mean(fresh) - statistics.mean(shared):6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# Benchmark: signup provisioning under concurrent load
+#
+# Compares the previous signup (user, accounts and categories committed
+# separately on three checkouts, one INSERT per row) with provisioning.py
+# (one transaction, one multi-row INSERT per table), with `--workers` threads
+# signing users up through a shared connection pool.
+#
+# Usage: python -m benchmarks.signup [--signups 300] [--workers 8] [--latency-ms 0.5]
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import provisioning
+from benchmarks import standin
+from db_pool import ConnectionPool
+
+
+def legacy_signup(pool, username, email, compiled):
+    """The previous implementation: three commits, one INSERT per default row"""
+    accounts, categories = compiled
+    conn = pool.connect()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
+        (username, email, 'x')
+    )
+    user_id = cursor.lastrowid
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    conn = pool.connect()
+    cursor = conn.cursor()
+    for name, account_type, balance in accounts:
+        cursor.execute(
+            "INSERT INTO accounts (user_id, name, account_type, balance) VALUES (%s, %s, %s, %s)",
+            (user_id, name, account_type, balance)
+        )
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    conn = pool.connect()
+    cursor = conn.cursor()
+    for name, category_type in categories:
+        cursor.execute(
+            "INSERT INTO categories (user_id, name, type, is_default) VALUES (%s, %s, %s, TRUE)",
+            (user_id, name, category_type)
+        )
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def batched_signup(pool, username, email, compiled):
+    """complete_signup() as it is now"""
+    conn = pool.connect()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
+            (username, email, 'x')
+        )
+        provisioning.provision_user(cursor, cursor.lastrowid, compiled)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def measure(label, func, path, args, compiled):
+    connections = []
+    lock = threading.Lock()
+
+    def creator():
+        conn = standin.connect(path, latency=args.latency_ms / 1000, create_schema=False)
+        with lock:
+            connections.append(conn)
+        return conn
+
+    pool = ConnectionPool(creator, pool_size=args.workers, max_overflow=0, pre_ping=False)
+
+    def signup(index):
+        start = time.perf_counter()
+        func(pool, f"{label}_{index}", f"{label}_{index}@example.com", compiled)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.workers) as executor:
+        latencies = sorted(executor.map(signup, range(args.signups)))
+    elapsed = time.perf_counter() - start
+
+    checkouts = pool.stats()['checkouts']
+    round_trips = sum(conn.statements for conn in connections)
+    pool.dispose()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<10} {args.signups / elapsed:>10.1f} {statistics.median(latencies) * 1000:>9.2f} "
+          f"{p95 * 1000:>9.2f} {round_trips / args.signups:>11.1f} {checkouts / args.signups:>10.1f}")
+
+
+def check_provisioned(path, compiled):
+    """Every user must have got the full template"""
+    accounts, categories = compiled
+    conn = standin.connect(path, create_schema=False)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT u.id,
+               (SELECT COUNT(*) FROM accounts a WHERE a.user_id = u.id),
+               (SELECT COUNT(*) FROM categories c WHERE c.user_id = u.id)
+        FROM users u
+    """)
+    for user_id, account_count, category_count in cursor.fetchall():
+        assert (account_count, category_count) == (len(accounts), len(categories)), user_id
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark signup provisioning')
+    parser.add_argument('--signups', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=8, help='concurrent signups')
+    parser.add_argument('--latency-ms', type=float, default=0.5, help='simulated network round trip')
+    parser.add_argument('--template', default=None, help='JSON signup template (default: built-in)')
+    args = parser.parse_args()
+
+    compiled = provisioning.load_template(args.template)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.sqlite3')
+        standin.connect(path).close()
+
+        print(f"{args.signups} signups, {args.workers} workers, "
+              f"{len(compiled[0])} accounts + {len(compiled[1])} categories each, "
+              f"{args.latency_ms}ms simulated latency per statement")
+        print(f"{'':<10} {'signups/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'trips/user':>11} {'checkouts':>10}")
+        measure('legacy', legacy_signup, path, args, compiled)
+        measure('batched', batched_signup, path, args, compiled)
+        check_provisioned(path, compiled)
+        print("Every user was fully provisioned.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+# SQLite-backed stand-in for MySQL
+#
+# Implements the slice of the mysql.connector API the app uses (connections,
+# cursors, %s placeholders, YEAR()/MONTH()/CURDATE()/NOW(), ON DUPLICATE KEY
+# UPDATE, GET_LOCK()/RELEASE_LOCK()) so benchmarks can run without a MySQL
+# server. Every execute() counts as one round trip and can be delayed by a
+# simulated network latency. Multi-table UPDATE ... JOIN is not supported.
+# Advisory locks are shared by the connections of one process only and
+# GET_LOCK never waits.
+
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(50) UNIQUE NOT NULL,
+    email VARCHAR(100) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    email_notifications BOOLEAN DEFAULT FALSE
+);
+CREATE TABLE IF NOT EXISTS otp_verification (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email VARCHAR(100) NOT NULL,
+    otp VARCHAR(6) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    is_used BOOLEAN DEFAULT FALSE
+);
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    name VARCHAR(50) NOT NULL,
+    balance DECIMAL(10,2) DEFAULT 0.00,
+    opening_balance DECIMAL(10,2) NOT NULL DEFAULT 0.00,
+    account_type VARCHAR(10) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    name VARCHAR(50) NOT NULL,
+    type VARCHAR(10) NOT NULL,
+    is_default BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    account_id INT NOT NULL REFERENCES accounts(id) ON DELETE CASCADE,
+    category_id INT REFERENCES categories(id) ON DELETE SET NULL,
+    amount DECIMAL(10,2) NOT NULL,
+    type VARCHAR(10) NOT NULL,
+    description TEXT,
+    to_account_id INT NULL REFERENCES accounts(id) ON DELETE SET NULL,
+    transaction_date DATE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date_created_id ON transactions(user_id, transaction_date, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_type_date_created_id ON transactions(user_id, type, transaction_date, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_category_date_created_id ON transactions(user_id, category_id, transaction_date, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_transactions_account_date_created_id ON transactions(account_id, transaction_date, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_category_type_date ON transactions(user_id, category_id, type, transaction_date);
+CREATE TABLE IF NOT EXISTS budgets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    category_id INT NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+    amount DECIMAL(10,2) NOT NULL,
+    month INT NOT NULL,
+    year INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (user_id, category_id, month, year)
+);
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    year INT NOT NULL,
+    month INT NOT NULL,
+    type VARCHAR(10) NOT NULL,
+    category_id INT NOT NULL DEFAULT 0,
+    total DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    transaction_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, year, month, type, category_id)
+);
+CREATE TABLE IF NOT EXISTS email_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind VARCHAR(30) NOT NULL,
+    recipient VARCHAR(100) NOT NULL,
+    payload TEXT NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    next_attempt_at TIMESTAMP NOT NULL,
+    last_error TEXT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP NULL
+);
+CREATE INDEX IF NOT EXISTS idx_email_jobs_status_next ON email_jobs(status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS scheduled_jobs (
+    id VARCHAR(64) PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    schedule VARCHAR(200) NOT NULL,
+    next_run_at TIMESTAMP NULL,
+    last_run_at TIMESTAMP NULL
+);
+CREATE TABLE IF NOT EXISTS job_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id VARCHAR(64) NOT NULL,
+    scheduled_for TIMESTAMP NOT NULL,
+    worker VARCHAR(100) NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'running',
+    started_at TIMESTAMP NOT NULL,
+    finished_at TIMESTAMP NULL,
+    duration_ms INT NULL,
+    users INT NULL,
+    succeeded INT NULL,
+    failed INT NULL,
+    summary TEXT NULL,
+    error TEXT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_runs_job_started ON job_runs(job_id, started_at);
+CREATE TABLE IF NOT EXISTS report_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    year INT NOT NULL,
+    month INT NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'running',
+    checkpoint_user_id INT NOT NULL DEFAULT 0,
+    invocations INT NOT NULL DEFAULT 0,
+    started_at TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP NOT NULL,
+    finished_at TIMESTAMP NULL,
+    users INT NULL,
+    sent INT NULL,
+    failed INT NULL,
+    skipped INT NULL,
+    UNIQUE (year, month)
+);
+CREATE TABLE IF NOT EXISTS report_deliveries (
+    run_id INT NOT NULL REFERENCES report_runs(id) ON DELETE CASCADE,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending',
+    claim VARCHAR(32) NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NULL,
+    fingerprint VARCHAR(16) NULL,
+    stage VARCHAR(10) NULL,
+    last_error TEXT NULL,
+    sent_at TIMESTAMP NULL,
+    PRIMARY KEY (run_id, user_id)
+);
+"""
+
+_PLACEHOLDER = re.compile(r"%s")
+_INSERT_IGNORE = re.compile(r"\bINSERT\s+IGNORE\b", re.IGNORECASE)
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE(\s+OF\s+\w+)?(\s+SKIP\s+LOCKED)?\b", re.IGNORECASE)
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+_VALUES_REF = re.compile(r"\bVALUES\((\w+)\)", re.IGNORECASE)
+
+
+def translate(sql):
+    """Rewrite MySQL-flavoured SQL into something SQLite accepts"""
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _INSERT_IGNORE.sub("INSERT OR IGNORE", sql)
+    sql = _FOR_UPDATE.sub("", sql)
+    sql = _ON_DUPLICATE.sub("ON CONFLICT DO UPDATE SET", sql)
+    sql = _VALUES_REF.sub(r"excluded.\1", sql)
+    return sql
+
+
+def _date_part(value, start, end):
+    if value is None:
+        return None
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    return int(value[start:end])
+
+
+def _adapt_date(value):
+    return value.isoformat()
+
+
+def _adapt_datetime(value):
+    return value.isoformat(" ")
+
+
+def _convert_date(value):
+    return date.fromisoformat(value.decode())
+
+
+def _convert_timestamp(value):
+    return datetime.fromisoformat(value.decode())
+
+
+sqlite3.register_adapter(date, _adapt_date)
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter("DATE", _convert_date)
+sqlite3.register_converter("TIMESTAMP", _convert_timestamp)
+
+
+# Advisory locks: lock name -> id of the owning connection
+_named_locks = {}
+_named_locks_guard = threading.Lock()
+_connection_ids = iter(range(1, 1 << 62))
+
+
+def _get_lock(owner, name, timeout):
+    with _named_locks_guard:
+        if _named_locks.setdefault(name, owner) == owner:
+            return 1
+    return 0
+
+
+def _release_lock(owner, name):
+    with _named_locks_guard:
+        if name not in _named_locks:
+            return None
+        if _named_locks[name] != owner:
+            return 0
+        del _named_locks[name]
+    return 1
+
+
+def _release_all_locks(owner):
+    with _named_locks_guard:
+        for name in [n for n, o in _named_locks.items() if o == owner]:
+            del _named_locks[name]
+
+
+class StandinCursor:
+    """mysql.connector-style cursor over a sqlite3 cursor"""
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection._raw.cursor()
+
+    def execute(self, operation, params=()):
+        self._connection._round_trip()
+        self._cursor.execute(translate(operation), tuple(params or ()))
+
+    def executemany(self, operation, seq_params):
+        self._connection._round_trip()
+        self._cursor.executemany(translate(operation), [tuple(p) for p in seq_params])
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandinConnection:
+    """mysql.connector-style connection backed by a SQLite database file"""
+
+    def __init__(self, database, latency=0.0):
+        self._raw = sqlite3.connect(
+            database,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            timeout=30,
+        )
+        self._raw.execute("PRAGMA foreign_keys = ON")
+        self._raw.create_function("YEAR", 1, lambda v: _date_part(v, 0, 4), deterministic=True)
+        self._raw.create_function("MONTH", 1, lambda v: _date_part(v, 5, 7), deterministic=True)
+        self._raw.create_function("CURDATE", 0, lambda: date.today().isoformat())
+        self._raw.create_function("NOW", 0, lambda: datetime.now().isoformat(" "))
+        with _named_locks_guard:
+            self.connection_id = next(_connection_ids)
+        self._raw.create_function("CONNECTION_ID", 0, lambda: self.connection_id)
+        self._raw.create_function("GET_LOCK", 2, lambda name, timeout: _get_lock(self.connection_id, name, timeout))
+        self._raw.create_function("RELEASE_LOCK", 1, lambda name: _release_lock(self.connection_id, name))
+        self.latency = latency
+        self.statements = 0
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        with self._lock:
+            self.statements += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def cursor(self, *args, **kwargs):
+        return StandinCursor(self)
+
+    def commit(self):
+        # COMMIT is a round trip of its own on MySQL
+        self._round_trip()
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def ping(self, reconnect=False):
+        self._raw.execute("SELECT 1")
+
+    def is_connected(self):
+        return True
+
+    @property
+    def in_transaction(self):
+        return self._raw.in_transaction
+
+    def close(self):
+        # Like a MySQL session ending, closing drops the connection's locks
+        _release_all_locks(self.connection_id)
+        self._raw.close()
+
+
+def connect(database, latency=0.0, create_schema=True):
+    """Open a stand-in connection, creating the schema if requested"""
+    conn = StandinConnection(database, latency=latency)
+    if create_schema:
+        conn._raw.executescript(SCHEMA)
+    return conn
@@ -0,0 +1,9 @@
+# Route blueprints: auth, dashboard pages, the JSON api, monthly reports and
+# user settings. Importing them only defines views; create_app() registers them.
+
+
+def register_blueprints(app):
+    from blueprints import api, auth, dashboard, reports, settings
+
+    for module in (auth, dashboard, api, reports, settings):
+        app.register_blueprint(module.bp)
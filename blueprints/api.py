@@ -0,0 +1,669 @@
+# JSON API behind the dashboard pages, plus the health endpoints (enabled by
+# MONITORING_CONFIG, see extensions.internal_only)
+
+import calendar
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, jsonify, request, session
+
+import ledger
+import rollups
+from cache import cached, versioned
+from charts import chart_stats
+from extensions import db_pool, get_db_connection, internal_only, login_required, mail_pool, mail_queue, report_cache, response_cache
+from importer import ImportFormatError, FORMATS as IMPORT_FORMATS, detect_format, import_transactions
+from periods import month_index, shift_month
+from transaction_export import EXPORT_FORMATS, stream_export
+from transaction_list import InvalidListingQuery, fetch_page as fetch_transaction_page, filter_conditions, parse_filters as parse_transaction_filters
+
+bp = Blueprint('api', __name__, url_prefix='/api')
+
+def transaction_json(t):
+    return {
+        'id': t[0],
+        'amount': float(t[1]),
+        'type': t[2],
+        'transaction_date': t[3].isoformat() if t[3] else None,
+        'description': t[4],
+        'category_name': t[5],
+        'account_name': t[6],
+        'to_account_name': t[7]
+    }
+
+@bp.route('/dashboard_data')
+@login_required
+@versioned(monthly=True)
+@cached('dashboard_data', monthly=True)
+def dashboard_data():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    # Get current month data
+    current_month = datetime.now().month
+    current_year = datetime.now().year
+    
+    # Income and expense totals for current month
+    cursor.execute("""
+        SELECT type, SUM(total) FROM monthly_rollups
+        WHERE user_id = %s AND year = %s AND month = %s
+        AND type IN ('income', 'expense')
+        GROUP BY type
+    """, (session['user_id'], current_year, current_month))
+    totals = {row[0]: float(row[1]) for row in cursor.fetchall()}
+    total_income = totals.get('income', 0.0)
+    total_expense = totals.get('expense', 0.0)
+    
+    total_saving = total_income - total_expense
+    
+    cursor.close()
+    conn.close()
+    
+    return jsonify({
+        'total_income': total_income,
+        'total_expense': total_expense,
+        'total_saving': total_saving
+    })
+
+@bp.route('/dashboard/bootstrap')
+@login_required
+@versioned(monthly=True)
+@cached('dashboard_bootstrap', monthly=True)
+def dashboard_bootstrap():
+    """Everything the dashboard page loads, from one connection in two round trips
+
+    Month totals, accounts, categories and budgets come back from one UNION
+    ALL query as (kind, id, name, amount, type, extra) rows; the first page
+    of transactions is a second query.
+    """
+    user_id = session['user_id']
+    now = datetime.now()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT 'total', NULL, NULL, SUM(total), type, NULL
+        FROM monthly_rollups
+        WHERE user_id = %s AND year = %s AND month = %s AND type IN ('income', 'expense')
+        GROUP BY type
+        UNION ALL
+        SELECT 'account', id, name, balance, account_type, NULL
+        FROM accounts WHERE user_id = %s
+        UNION ALL
+        SELECT 'category', id, name, NULL, type, is_default
+        FROM categories WHERE user_id = %s
+        UNION ALL
+        SELECT 'budget', b.category_id, c.name, b.amount, NULL, COALESCE(r.total, 0)
+        FROM budgets b
+        JOIN categories c ON b.category_id = c.id
+        LEFT JOIN monthly_rollups r ON r.user_id = b.user_id
+            AND r.category_id = b.category_id
+            AND r.type = 'expense'
+            AND r.year = b.year
+            AND r.month = b.month
+        WHERE b.user_id = %s AND b.month = %s AND b.year = %s
+    """, (user_id, now.year, now.month, user_id, user_id, user_id, now.month, now.year))
+    rows = cursor.fetchall()
+    transactions, next_cursor = fetch_transaction_page(cursor, user_id, parse_transaction_filters({}))
+    cursor.close()
+    conn.close()
+    
+    totals = {row[4]: float(row[3]) for row in rows if row[0] == 'total'}
+    total_income = totals.get('income', 0.0)
+    total_expense = totals.get('expense', 0.0)
+    accounts = sorted((row for row in rows if row[0] == 'account'), key=lambda row: row[1])
+    categories = sorted((row for row in rows if row[0] == 'category'), key=lambda row: (row[4], row[2].lower()))
+    
+    return jsonify({
+        'summary': {
+            'total_income': total_income,
+            'total_expense': total_expense,
+            'total_saving': total_income - total_expense
+        },
+        'accounts': [{
+            'id': row[1],
+            'name': row[2],
+            'balance': float(row[3]),
+            'type': row[4]
+        } for row in accounts],
+        'categories': [{
+            'id': row[1],
+            'name': row[2],
+            'type': row[4],
+            'is_default': bool(row[5])
+        } for row in categories],
+        'budgets': [{
+            'category_id': row[1],
+            'amount': float(row[3]),
+            'category_name': row[2],
+            'spent': float(row[5])
+        } for row in rows if row[0] == 'budget'],
+        'transactions': [transaction_json(t) for t in transactions],
+        'next_cursor': next_cursor
+    })
+
+@bp.route('/accounts')
+@login_required
+@versioned()
+@cached('accounts')
+def get_accounts():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, name, balance, account_type FROM accounts WHERE user_id = %s ORDER BY id", (session['user_id'],))
+    accounts = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    
+    return jsonify([{
+        'id': account[0],
+        'name': account[1],
+        'balance': float(account[2]),
+        'type': account[3]
+    } for account in accounts])
+
+@bp.route('/categories')
+@login_required
+@versioned()
+@cached('categories')
+def get_categories():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, name, type, is_default FROM categories WHERE user_id = %s ORDER BY type, name", (session['user_id'],))
+    categories = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    
+    return jsonify([{
+        'id': category[0],
+        'name': category[1],
+        'type': category[2],
+        'is_default': bool(category[3])
+    } for category in categories])
+
+@bp.route('/transactions')
+@login_required
+@versioned()
+def get_transactions():
+    """One page of transactions, newest first; the next page's cursor is in X-Next-Cursor"""
+    try:
+        filters = parse_transaction_filters(request.args)
+    except InvalidListingQuery as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    transactions, next_cursor = fetch_transaction_page(cursor, session['user_id'], filters)
+    cursor.close()
+    conn.close()
+    
+    response = jsonify([transaction_json(t) for t in transactions])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@bp.route('/add_transaction', methods=['POST'])
+@login_required
+def add_transaction():
+    data = request.json
+    transaction_type = data['type']
+    account_id = data['account_id']
+    amount = float(data['amount'])
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        to_account_id = data['to_account_id'] if transaction_type == 'transfer' else None
+        # Locks and checks the accounts before anything is written
+        ledger.apply(cursor, session['user_id'],
+                     ledger.transaction_deltas(transaction_type, account_id, to_account_id, amount))
+        
+        if transaction_type in ['income', 'expense']:
+            category_id = data['category_id']
+            cursor.execute("""
+                INSERT INTO transactions (user_id, account_id, category_id, amount, type, transaction_date)
+                VALUES (%s, %s, %s, %s, %s, CURDATE())
+            """, (session['user_id'], account_id, category_id, amount, transaction_type))
+            rollups.add_transaction(cursor, cursor.lastrowid)
+        
+        elif transaction_type == 'transfer':
+            cursor.execute("""
+                INSERT INTO transactions (user_id, account_id, to_account_id, amount, type, transaction_date)
+                VALUES (%s, %s, %s, %s, %s, CURDATE())
+            """, (session['user_id'], account_id, to_account_id, amount, transaction_type))
+            rollups.add_transaction(cursor, cursor.lastrowid)
+        
+        conn.commit()
+        response_cache.invalidate(session['user_id'])
+        cursor.close()
+        conn.close()
+        return jsonify({'success': True})
+    
+    except Exception as e:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        return jsonify({'success': False, 'error': str(e)})
+
+@bp.route('/transactions/export')
+@login_required
+def export_transactions():
+    """Stream the full transaction history as CSV or NDJSON (?format=), with the listing filters"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unsupported format: {fmt}"}), 400
+    try:
+        filters = parse_transaction_filters(request.args)
+    except InvalidListingQuery as e:
+        return jsonify({'error': str(e)}), 400
+    conditions, params = filter_conditions(session['user_id'], filters)
+    
+    # A dedicated connection: the streaming cursor holds it until the download ends
+    conn = db_pool.connect()
+    filename = f"transactions_{datetime.now().strftime('%Y%m%d')}.{fmt}"
+    response = Response(stream_export(conn, conditions, params, fmt), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Also release the connection if the body is never iterated
+    response.call_on_close(conn.close)
+    return response
+
+@bp.route('/transactions/import', methods=['POST'])
+@login_required
+def import_transactions_route():
+    """Bulk import from an uploaded file (multipart 'file') or the raw request body
+
+    ?format=csv|json|jsonl overrides detection, ?dry_run=true only validates.
+    """
+    upload = request.files.get('file')
+    if upload:
+        stream = upload.stream
+        fmt = request.args.get('format') or detect_format(upload.filename, upload.mimetype)
+    else:
+        stream = request.stream
+        fmt = request.args.get('format') or detect_format(content_type=request.mimetype)
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({'success': False, 'error': f"Unsupported format: {fmt}"}), 400
+    dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+    
+    conn = get_db_connection()
+    try:
+        result = import_transactions(conn, session['user_id'], stream, fmt,
+                                     chunk_size=current_app.config['IMPORT_CHUNK_SIZE'], dry_run=dry_run)
+    except ImportFormatError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error importing transactions: {e}")
+        return jsonify({'success': False, 'error': 'Import failed'}), 500
+    finally:
+        conn.close()
+    
+    if result['imported'] and not dry_run:
+        response_cache.invalidate(session['user_id'])
+    return jsonify({'success': True, **result})
+
+@bp.route('/transactions/<int:transaction_id>', methods=['DELETE'])
+@login_required
+def delete_transaction(transaction_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        # Lock the row so a concurrent delete cannot reverse it twice
+        cursor.execute("""
+            SELECT account_id, to_account_id, amount, type, category_id, transaction_date
+            FROM transactions 
+            WHERE id = %s AND user_id = %s
+            FOR UPDATE
+        """, (transaction_id, session['user_id']))
+        
+        transaction = cursor.fetchone()
+        if not transaction:
+            return jsonify({'success': False, 'error': 'Transaction not found'})
+        
+        account_id, to_account_id, amount, trans_type, category_id, transaction_date = transaction
+        
+        # Reverse the account balance changes
+        ledger.apply(cursor, session['user_id'],
+                     ledger.transaction_deltas(trans_type, account_id, to_account_id, amount, sign=-1))
+        
+        # Delete the transaction
+        rollups.remove_transaction(cursor, session['user_id'], transaction_date, trans_type, category_id, amount)
+        cursor.execute("DELETE FROM transactions WHERE id = %s AND user_id = %s", (transaction_id, session['user_id']))
+        
+        conn.commit()
+        response_cache.invalidate(session['user_id'])
+        cursor.close()
+        conn.close()
+        
+        return jsonify({'success': True})
+    
+    except Exception as e:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        return jsonify({'success': False, 'error': str(e)})
+
+@bp.route('/analysis/<analysis_type>')
+@login_required
+@versioned(monthly=True)
+@cached('analysis', monthly=True)
+def get_analysis_data(analysis_type):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    current_month = datetime.now().month
+    current_year = datetime.now().year
+    # Flow charts cover the current month and the six before it
+    flow_start = month_index(*shift_month(current_year, current_month, -6))
+    flow_end = month_index(current_year, current_month)
+    
+    if analysis_type == 'expense_overview':
+        cursor.execute("""
+            SELECT c.name, r.total
+            FROM monthly_rollups r
+            JOIN categories c ON r.category_id = c.id
+            WHERE r.user_id = %s AND r.type = 'expense'
+            AND r.year = %s AND r.month = %s
+            ORDER BY r.total DESC
+        """, (session['user_id'], current_year, current_month))
+        
+    elif analysis_type == 'income_overview':
+        cursor.execute("""
+            SELECT c.name, r.total
+            FROM monthly_rollups r
+            JOIN categories c ON r.category_id = c.id
+            WHERE r.user_id = %s AND r.type = 'income'
+            AND r.year = %s AND r.month = %s
+            ORDER BY r.total DESC
+        """, (session['user_id'], current_year, current_month))
+        
+    elif analysis_type == 'expense_flow':
+        cursor.execute("""
+            SELECT r.month, r.year, SUM(r.total) as total
+            FROM monthly_rollups r
+            WHERE r.user_id = %s AND r.type = 'expense'
+            AND r.year * 12 + r.month BETWEEN %s AND %s
+            GROUP BY r.year, r.month
+            ORDER BY r.year, r.month
+        """, (session['user_id'], flow_start, flow_end))
+        
+    elif analysis_type == 'income_flow':
+        cursor.execute("""
+            SELECT r.month, r.year, SUM(r.total) as total
+            FROM monthly_rollups r
+            WHERE r.user_id = %s AND r.type = 'income'
+            AND r.year * 12 + r.month BETWEEN %s AND %s
+            GROUP BY r.year, r.month
+            ORDER BY r.year, r.month
+        """, (session['user_id'], flow_start, flow_end))
+    
+    data = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    
+    if analysis_type in ['expense_overview', 'income_overview']:
+        return jsonify({
+            'labels': [row[0] for row in data],
+            'values': [float(row[1]) for row in data]
+        })
+    else:
+        labels = []
+        values = []
+        for row in data:
+            month_name = calendar.month_abbr[row[0]]
+            year = row[1]
+            labels.append(f"{month_name} {year}")
+            values.append(float(row[2]))
+        
+        return jsonify({
+            'labels': labels,
+            'values': values
+        })
+
+@bp.route('/budgets')
+@login_required
+@versioned(monthly=True)
+@cached('budgets', monthly=True)
+def get_budgets():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    current_month = datetime.now().month
+    current_year = datetime.now().year
+    
+    cursor.execute("""
+        SELECT b.category_id, b.amount, c.name,
+               COALESCE(r.total, 0) as spent
+        FROM budgets b
+        JOIN categories c ON b.category_id = c.id
+        LEFT JOIN monthly_rollups r ON r.user_id = b.user_id
+            AND r.category_id = b.category_id
+            AND r.type = 'expense'
+            AND r.year = b.year
+            AND r.month = b.month
+        WHERE b.user_id = %s AND b.month = %s AND b.year = %s
+    """, (session['user_id'], current_month, current_year))
+    
+    budgets = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    
+    return jsonify([{
+        'category_id': budget[0],
+        'amount': float(budget[1]),
+        'category_name': budget[2],
+        'spent': float(budget[3])
+    } for budget in budgets])
+
+@bp.route('/budgets', methods=['POST'])
+@login_required
+def set_budget():
+    data = request.json
+    category_id = data['category_id']
+    amount = data['amount']
+    
+    current_month = datetime.now().month
+    current_year = datetime.now().year
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            INSERT INTO budgets (user_id, category_id, amount, month, year)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE amount = %s
+        """, (session['user_id'], category_id, amount, current_month, current_year, amount))
+        
+        conn.commit()
+        response_cache.invalidate(session['user_id'])
+        cursor.close()
+        conn.close()
+        
+        return jsonify({'success': True})
+    
+    except Exception as e:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        return jsonify({'success': False, 'error': str(e)})
+
+@bp.route('/accounts', methods=['POST'])
+@login_required
+def add_account():
+    data = request.json
+    name = data['name']
+    initial_amount = data.get('initial_amount', 0)
+    account_type = data.get('account_type', 'personal')
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            INSERT INTO accounts (user_id, name, balance, opening_balance, account_type)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (session['user_id'], name, initial_amount, initial_amount, account_type))
+        
+        conn.commit()
+        response_cache.invalidate(session['user_id'])
+        cursor.close()
+        conn.close()
+        
+        return jsonify({'success': True})
+    
+    except Exception as e:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        return jsonify({'success': False, 'error': str(e)})
+
+@bp.route('/accounts/<int:account_id>', methods=['DELETE'])
+@login_required
+def delete_account(account_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            SELECT account_type FROM accounts 
+            WHERE id = %s AND user_id = %s
+        """, (account_id, session['user_id']))
+        
+        account = cursor.fetchone()
+        if not account:
+            return jsonify({'success': False, 'error': 'Account not found'})
+        
+        if account[0] != 'personal':
+            return jsonify({'success': False, 'error': 'Cannot delete default accounts'})
+        
+        # Its transactions are removed by ON DELETE CASCADE
+        rollups.remove_account_transactions(cursor, session['user_id'], account_id)
+        ledger.absorb_account(cursor, session['user_id'], account_id)
+        cursor.execute("DELETE FROM accounts WHERE id = %s AND user_id = %s", (account_id, session['user_id']))
+        
+        conn.commit()
+        response_cache.invalidate(session['user_id'])
+        cursor.close()
+        conn.close()
+        
+        return jsonify({'success': True})
+    
+    except Exception as e:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        return jsonify({'success': False, 'error': str(e)})
+
+@bp.route('/categories', methods=['POST'])
+@login_required
+def add_category():
+    data = request.json
+    name = data['name']
+    category_type = data['type']
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            INSERT INTO categories (user_id, name, type, is_default)
+            VALUES (%s, %s, %s, FALSE)
+        """, (session['user_id'], name, category_type))
+        
+        conn.commit()
+        response_cache.invalidate(session['user_id'])
+        cursor.close()
+        conn.close()
+        
+        return jsonify({'success': True})
+    
+    except Exception as e:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        return jsonify({'success': False, 'error': str(e)})
+
+@bp.route('/categories/<int:category_id>', methods=['DELETE'])
+@login_required
+def delete_category(category_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            SELECT is_default FROM categories 
+            WHERE id = %s AND user_id = %s
+        """, (category_id, session['user_id']))
+        
+        category = cursor.fetchone()
+        if not category:
+            return jsonify({'success': False, 'error': 'Category not found'})
+        
+        if category[0]:
+            return jsonify({'success': False, 'error': 'Cannot delete default categories'})
+        
+        rollups.uncategorize(cursor, session['user_id'], category_id)
+        cursor.execute("DELETE FROM categories WHERE id = %s AND user_id = %s", (category_id, session['user_id']))
+        
+        conn.commit()
+        response_cache.invalidate(session['user_id'])
+        cursor.close()
+        conn.close()
+        
+        return jsonify({'success': True})
+    
+    except Exception as e:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        return jsonify({'success': False, 'error': str(e)})
+
+@bp.route('/health/db-pool')
+@internal_only
+def db_pool_stats():
+    """Connection pool metrics for monitoring"""
+    return jsonify(db_pool.stats())
+
+@bp.route('/health/slow-queries')
+@internal_only
+def slow_query_log():
+    """Recent slow statements and the slowest normalised statements by total time"""
+    return jsonify(current_app.extensions['query_stats'].slow_queries())
+
+@bp.route('/health/cache')
+@internal_only
+def cache_stats():
+    """Read cache hit/miss counters for monitoring"""
+    return jsonify(response_cache.stats())
+
+@bp.route('/health/report-cache')
+@internal_only
+def report_cache_stats():
+    """Rendered PDF cache hit ratio and bytes saved"""
+    return jsonify(report_cache.stats())
+
+@bp.route('/health/charts')
+@internal_only
+def chart_render_stats():
+    """Chart render counts, average time and output size"""
+    return jsonify(chart_stats.as_dict())
+
+@bp.route('/health/mail')
+@internal_only
+def mail_stats():
+    """SMTP session pool counters for monitoring"""
+    stats = mail_pool.stats()
+    stats['queue'] = mail_queue.stats()
+    return jsonify(stats)
+
+@bp.route('/health/startup')
+@internal_only
+def startup_stats():
+    """Time spent in each create_app() step"""
+    return jsonify(current_app.extensions['startup_timings'].as_dict())
+
+@bp.route('/health/scheduler')
+@internal_only
+def scheduler_stats():
+    """Leader status and run counts of this worker's scheduler"""
+    return jsonify(current_app.extensions['scheduler'].stats())
@@ -0,0 +1,212 @@
+# Sign-in, sign-up with email OTP verification, and sign-out
+
+import random
+import re
+import string
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, session, url_for
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import provisioning
+from extensions import get_db_connection, mail_queue, response_cache
+
+bp = Blueprint('auth', __name__)
+
+def generate_otp():
+    return ''.join(random.choices(string.digits, k=6))
+
+@bp.route('/')
+def index():
+    if 'user_id' in session:
+        return redirect(url_for('dashboard.index'))
+    return redirect(url_for('auth.login'))
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, password_hash FROM users WHERE username = %s", (username,))
+        user = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        
+        if user and check_password_hash(user[1], password):
+            session['user_id'] = user[0]
+            session['username'] = username
+            return redirect(url_for('dashboard.index'))
+        else:
+            flash('Invalid username or password', 'error')
+    
+    return render_template('login.html')
+
+@bp.route('/signup', methods=['GET', 'POST'])
+def signup():
+    if request.method == 'POST':
+        email = request.form['email']
+        
+        # Validate email format
+        email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+        if not re.match(email_regex, email):
+            flash('Invalid email format', 'error')
+            return render_template('signup.html')
+        
+        # Check if email already exists
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+        if cursor.fetchone():
+            flash('Email already registered', 'error')
+            cursor.close()
+            conn.close()
+            return render_template('signup.html')
+        
+        # Generate and send OTP
+        otp = generate_otp()
+        expires_at = datetime.now() + timedelta(minutes=5)
+        
+        cursor.execute(
+            "INSERT INTO otp_verification (email, otp, expires_at) VALUES (%s, %s, %s)",
+            (email, otp, expires_at)
+        )
+        # Delivered by the mail queue workers; verify_otp polls the job status
+        job_id = mail_queue.enqueue(cursor, 'otp', email, {'otp': otp})
+        conn.commit()
+        cursor.close()
+        conn.close()
+        mail_queue.notify()
+        
+        session['signup_email'] = email
+        session['otp_job_id'] = job_id
+        return redirect(url_for('auth.verify_otp'))
+    
+    return render_template('signup.html')
+
+@bp.route('/verify_otp', methods=['GET', 'POST'])
+def verify_otp():
+    if 'signup_email' not in session:
+        return redirect(url_for('auth.signup'))
+    
+    if request.method == 'POST':
+        otp = request.form['otp']
+        email = session['signup_email']
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id FROM otp_verification WHERE email = %s AND otp = %s AND expires_at > NOW() AND is_used = FALSE",
+            (email, otp)
+        )
+        otp_record = cursor.fetchone()
+        
+        if otp_record:
+            cursor.execute(
+                "UPDATE otp_verification SET is_used = TRUE WHERE id = %s",
+                (otp_record[0],)
+            )
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return redirect(url_for('auth.complete_signup'))
+        else:
+            flash('Invalid or expired OTP', 'error')
+            cursor.close()
+            conn.close()
+    
+    return render_template('verify_otp.html')
+
+@bp.route('/api/otp_status')
+def otp_status():
+    """Delivery status of the OTP email for the signup in progress"""
+    if 'signup_email' not in session or 'otp_job_id' not in session:
+        return jsonify({'error': 'No signup in progress'}), 404
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    status = mail_queue.job_status(cursor, session['otp_job_id'], session['signup_email'])
+    cursor.close()
+    conn.close()
+    
+    if status is None:
+        return jsonify({'error': 'OTP job not found'}), 404
+    return jsonify(status)
+
+@bp.route('/complete_signup', methods=['GET', 'POST'])
+def complete_signup():
+    if 'signup_email' not in session:
+        return redirect(url_for('auth.signup'))
+    
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        confirm_password = request.form['confirm_password']
+        email = session['signup_email']
+        
+        if password != confirm_password:
+            flash('Passwords do not match', 'error')
+            return render_template('complete_signup.html')
+        
+        # Check if username already exists
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
+        if cursor.fetchone():
+            flash('Username already exists', 'error')
+            cursor.close()
+            conn.close()
+            return render_template('complete_signup.html')
+        
+        # Create the user with its default accounts and categories in one transaction
+        password_hash = generate_password_hash(password)
+        try:
+            cursor.execute(
+                "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
+                (username, email, password_hash)
+            )
+            user_id = cursor.lastrowid
+            provisioning.provision_user(cursor, user_id, current_app.extensions['signup_template'])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        
+        session.pop('signup_email', None)
+        session.pop('otp_job_id', None)
+        session['user_id'] = user_id
+        session['username'] = username
+        
+        return redirect(url_for('auth.email_permission'))
+    
+    return render_template('complete_signup.html')
+
+@bp.route('/email_permission', methods=['GET', 'POST'])
+def email_permission():
+    if request.method == 'POST':
+        allow_emails = request.form.get('allow_emails') == 'yes'
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE users SET email_notifications = %s WHERE id = %s",
+            (allow_emails, session['user_id'])
+        )
+        conn.commit()
+        response_cache.invalidate(session['user_id'])
+        cursor.close()
+        conn.close()
+        
+        return redirect(url_for('dashboard.index'))
+    
+    return render_template('email_permission.html')
+
+@bp.route('/logout')
+def logout():
+    session.clear()
+    return redirect(url_for('auth.login'))
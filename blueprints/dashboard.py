@@ -0,0 +1,42 @@
+# Dashboard pages; their data comes from the api blueprint
+
+from flask import Blueprint, render_template
+
+from extensions import login_required
+
+bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
+
+@bp.route('')
+@login_required
+def index():
+    return render_template('dashboard/main.html')
+
+@bp.route('/records')
+@login_required
+def records():
+    return render_template('dashboard/records.html')
+
+@bp.route('/analysis')
+@login_required
+def analysis():
+    return render_template('dashboard/analysis.html')
+
+@bp.route('/budget')
+@login_required
+def budget():
+    return render_template('dashboard/budget.html')
+
+@bp.route('/account')
+@login_required
+def account():
+    return render_template('dashboard/account.html')
+
+@bp.route('/category')
+@login_required
+def category():
+    return render_template('dashboard/category.html')
+
+@bp.route('/reports')
+@login_required
+def reports():
+    return render_template('dashboard/reports.html')
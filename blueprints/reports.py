@@ -0,0 +1,300 @@
+# Monthly reports: JSON data, PDF download, email delivery and the scheduled batch
+
+import calendar
+import io
+from datetime import datetime
+from functools import partial
+
+import click
+from flask import Blueprint, current_app, jsonify, send_file, session
+
+from cache import versioned
+from charts import render_chart
+from db_pool import get_connection
+from extensions import get_db_connection, login_required, mailer, report_cache
+from periods import previous_month
+from report_batch import MonthlyReportBatch
+from report_cache import fingerprint as report_fingerprint
+from report_data import fetch_monthly_report, fetch_monthly_reports
+
+bp = Blueprint('reports', __name__, url_prefix='/api')
+
+def generate_chart_image(data, chart_type='pie', title='Chart', preset='print', vector=False):
+    """Generate chart image for PDF reports (a reportlab Drawing when vector=True)"""
+    return render_chart(data, chart_type, title, preset=preset, vector=vector)
+
+def generate_monthly_report_pdf(user_id, month, year):
+    """Generate comprehensive monthly report PDF"""
+    # reportlab is imported on first use to keep it out of worker startup
+    from report_pdf import render_monthly_report_pdf
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # Get user info
+        cursor.execute("SELECT username, email FROM users WHERE id = %s", (user_id,))
+        user_info = cursor.fetchone()
+        if not user_info:
+            return None, None
+            
+        username, email = user_info
+        
+        # Get financial data for this and the previous month in one query
+        prev_year, prev_month = previous_month(year, month)
+        reports = fetch_monthly_reports(cursor, user_id, [(year, month), (prev_year, prev_month)])
+        report_data = reports[(year, month)]
+        prev_data = reports[(prev_year, prev_month)]
+        
+        pdf_bytes = render_monthly_report_pdf(username, month, year, report_data, prev_data)
+        buffer = io.BytesIO(pdf_bytes)
+        
+        cursor.close()
+        conn.close()
+        
+        return buffer, report_data
+        
+    except Exception as e:
+        print(f"Error generating PDF report: {e}")
+        return None, None
+
+def get_monthly_report_pdf(user_id, month, year):
+    """Monthly report PDF as an open file (from the report cache) or a buffer; None on failure"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    fp = report_fingerprint(cursor, user_id, year, month)
+    cursor.close()
+    conn.close()
+    
+    cached = report_cache.open(user_id, year, month, fp)
+    if cached is not None:
+        return cached
+    
+    pdf_buffer, _ = generate_monthly_report_pdf(user_id, month, year)
+    if pdf_buffer is None:
+        return None
+    try:
+        report_cache.put(user_id, year, month, fp, pdf_buffer.getvalue())
+    except OSError as e:
+        print(f"Error writing report cache: {e}")
+    return pdf_buffer
+
+def get_monthly_report_data(user_id, month, year):
+    """Get comprehensive monthly report data"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    report_data = fetch_monthly_report(cursor, user_id, year, month)
+    cursor.close()
+    conn.close()
+    return report_data
+
+def monthly_report_batch():
+    """Batch wired to the current app
+
+    The batch's worker threads run outside the app context, so it gets the
+    real pool and cache rather than the app-bound proxies.
+    """
+    return MonthlyReportBatch(partial(get_connection, current_app.extensions['db_pool']),
+                              mailer.send_monthly_report,
+                              report_cache=report_cache._get_current_object(),
+                              **current_app.config['REPORT_BATCH_CONFIG'])
+
+def send_monthly_reports(app, year=None, month=None, limit=None):
+    """Send monthly reports to all users who opted in; errors propagate to the scheduler's run log
+
+    Defaults to last month. Rerunning a month resumes it without re-sending.
+    """
+    with app.app_context():
+        if year is None:
+            today = datetime.now()
+            year, month = previous_month(today.year, today.month)
+        print("Starting monthly report generation...")
+        print(f"Generating reports for {calendar.month_name[month]} {year}")
+
+        summary = monthly_report_batch().run(year, month, limit=limit)
+        print(summary.format())
+        print("Monthly report generation completed.")
+        return summary
+
+def resume_monthly_reports(app):
+    """Resume report runs left unfinished by a crash, a limit or pending retries"""
+    with app.app_context():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT year, month FROM report_runs WHERE status = 'running' ORDER BY year, month")
+        periods = cursor.fetchall()
+        cursor.close()
+        conn.close()
+
+    summaries = [send_monthly_reports(app, year, month) for year, month in periods]
+    return {
+        'users': sum(s.users + s.retried for s in summaries),
+        'sent': sum(s.sent for s in summaries),
+        'failed': sum(len(s.failures) for s in summaries),
+        'runs': len(summaries),
+    }
+
+@bp.cli.command('send')
+@click.option('--year', type=int, default=None, help='Report year (default: last month).')
+@click.option('--month', type=int, default=None, help='Report month (default: last month).')
+@click.option('--limit', type=int, default=None, help='Handle at most this many users, then stop.')
+@click.option('--retry-failed', is_flag=True, help='Give users who ran out of attempts a fresh set.')
+def send_command(year, month, limit, retry_failed):
+    """Send (or resume) the monthly report emails for one month."""
+    if (year is None) != (month is None):
+        raise click.UsageError('Pass both --year and --month, or neither.')
+    if year is None:
+        today = datetime.now()
+        year, month = previous_month(today.year, today.month)
+    if retry_failed:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE report_deliveries SET status = 'pending', attempts = 0
+            WHERE status = 'failed'
+            AND run_id = (SELECT id FROM report_runs WHERE year = %s AND month = %s)
+        """, (year, month))
+        conn.commit()
+        cursor.close()
+        conn.close()
+    summary = send_monthly_reports(current_app._get_current_object(), year, month, limit)
+    if not summary.completed:
+        click.echo(f"{summary.remaining} users left; run the command again to resume.")
+
+@bp.cli.command('status')
+def status_command():
+    """Show recent monthly report runs."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT year, month, status, invocations, users, sent, failed, skipped, started_at, finished_at
+        FROM report_runs
+        ORDER BY year DESC, month DESC
+        LIMIT 12
+    """)
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    for year, month, status, invocations, users, sent, failed, skipped, started_at, finished_at in rows:
+        click.echo(f"{year}-{month:02d} {status:<9} users {users} sent {sent} failed {failed} "
+                   f"skipped {skipped} ({invocations} invocations, {started_at} -> {finished_at or '-'})")
+
+@bp.route('/monthly-reports')
+@login_required
+@versioned()
+def get_monthly_reports():
+    """Get available monthly reports for the user"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # Get months with transactions
+        cursor.execute("""
+            SELECT DISTINCT YEAR(transaction_date) as year, MONTH(transaction_date) as month,
+                   COUNT(*) as transaction_count
+            FROM transactions 
+            WHERE user_id = %s 
+            GROUP BY YEAR(transaction_date), MONTH(transaction_date)
+            ORDER BY year DESC, month DESC
+            LIMIT 12
+        """, (session['user_id'],))
+        
+        reports = []
+        for row in cursor.fetchall():
+            year, month, count = row
+            month_name = calendar.month_name[month]
+            reports.append({
+                'year': year,
+                'month': month,
+                'month_name': month_name,
+                'display_name': f"{month_name} {year}",
+                'transaction_count': count
+            })
+        
+        cursor.close()
+        conn.close()
+        
+        return jsonify(reports)
+        
+    except Exception as e:
+        print(f"Error getting monthly reports: {e}")
+        return jsonify({'error': 'Failed to load reports'}), 500
+
+@bp.route('/monthly-report/<int:year>/<int:month>')
+@login_required
+@versioned()
+def get_monthly_report(year, month):
+    """Get detailed monthly report data"""
+    try:
+        report_data = get_monthly_report_data(session['user_id'], month, year)
+        return jsonify(report_data)
+    except Exception as e:
+        print(f"Error getting monthly report: {e}")
+        return jsonify({'error': 'Failed to load report'}), 500
+
+@bp.route('/monthly-report/<int:year>/<int:month>/pdf')
+@login_required
+def download_monthly_report_pdf(year, month):
+    """Download monthly report as PDF"""
+    try:
+        pdf = get_monthly_report_pdf(session['user_id'], month, year)
+        
+        if pdf:
+            filename = f"Monthly_Report_{calendar.month_name[month]}_{year}.pdf"
+            return send_file(
+                pdf,
+                as_attachment=True,
+                download_name=filename,
+                mimetype='application/pdf'
+            )
+        else:
+            return jsonify({'error': 'Failed to generate PDF'}), 500
+            
+    except Exception as e:
+        print(f"Error generating PDF: {e}")
+        return jsonify({'error': 'Failed to generate PDF'}), 500
+
+@bp.route('/send-monthly-report/<int:year>/<int:month>', methods=['POST'])
+@login_required
+def send_monthly_report_manual(year, month):
+    """Manually send monthly report via email"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # Get user info
+        cursor.execute("SELECT username, email FROM users WHERE id = %s", (session['user_id'],))
+        user_info = cursor.fetchone()
+        
+        if not user_info:
+            return jsonify({'error': 'User not found'}), 404
+            
+        username, email = user_info
+        
+        # Generate report data and PDF
+        report_data = get_monthly_report_data(session['user_id'], month, year)
+        pdf = get_monthly_report_pdf(session['user_id'], month, year)
+        
+        if pdf:
+            if isinstance(pdf, io.BytesIO):
+                pdf_buffer = pdf
+            else:
+                with pdf:
+                    pdf_buffer = io.BytesIO(pdf.read())
+            
+            # Send email
+            success = mailer.send_monthly_report(email, username, report_data, pdf_buffer)
+            
+            if success:
+                return jsonify({'success': True, 'message': 'Report sent successfully'})
+            else:
+                return jsonify({'error': 'Failed to send email'}), 500
+        else:
+            return jsonify({'error': 'Failed to generate PDF'}), 500
+            
+        cursor.close()
+        conn.close()
+        
+    except Exception as e:
+        print(f"Error sending monthly report: {e}")
+        return jsonify({'error': 'Failed to send report'}), 500
@@ -1,10 +1,17 @@
-# Additional routes for user settings management
-# This should be added to the main app.py file
+# Per-user settings
 
-@app.route('/api/user-settings')
+from flask import Blueprint, jsonify, request, session
+
+from cache import versioned
+from extensions import get_db_connection, login_required, response_cache
+
+bp = Blueprint('settings', __name__, url_prefix='/api')
+
+@bp.route('/user-settings')
 @login_required
+@versioned()
 def get_user_settings():
-    """Get current user settings"""
+    """Get user settings including email preferences"""
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -26,7 +33,7 @@ def get_user_settings():
         print(f"Error getting user settings: {e}")
         return jsonify({'error': 'Failed to load settings'}), 500
 
-@app.route('/api/user-settings', methods=['POST'])
+@bp.route('/user-settings', methods=['POST'])
 @login_required
 def update_user_settings():
     """Update user settings"""
@@ -41,13 +48,14 @@ def update_user_settings():
             "UPDATE users SET email_notifications = %s WHERE id = %s",
             (email_notifications, session['user_id'])
         )
-        
         conn.commit()
+        response_cache.invalidate(session['user_id'])
+        
         cursor.close()
         conn.close()
         
-        return jsonify({'success': True})
+        return jsonify({'success': True, 'message': 'Settings updated successfully'})
         
     except Exception as e:
         print(f"Error updating user settings: {e}")
-        return jsonify({'success': False, 'error': 'Failed to update settings'}), 500
+        return jsonify({'error': 'Failed to update settings'}), 500
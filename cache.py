@@ -0,0 +1,377 @@
+# Per-user read cache for the dashboard JSON APIs
+#
+# Responses are stored under (user_id, endpoint, variant), where the variant
+# includes the user's data version. Invalidation is per user, not per
+# endpoint: since every cached body is keyed by the one data version, a write
+# makes all of the user's cached responses unreachable at once. Write routes
+# call ResponseCache.invalidate() after committing, which drops the user's
+# entries and bumps the version. The in-process backend is local to each
+# worker, so with several workers use the Redis backend (or keep the TTL
+# short) to bound staleness.
+#
+# The data version is a microsecond timestamp kept in the same backend. With
+# the shared (Redis) backend, views decorated with versioned() derive a strong
+# ETag and Last-Modified from it, so a poll whose If-None-Match still matches
+# is answered 304 from the version lookup alone, before the view or the cache
+# run. A request reads the version once, before any query, and uses it for
+# both the ETag and the cache key, so a body is only ever paired with the
+# version it was built under. Writers drop the cached entries and then bump
+# the version, after their commit; a reader racing a write gets at most one
+# extra 200, and nothing built before the bump is served or revalidated under
+# the new version. The in-process backend's versions are per worker, so a
+# write seen by one worker would leave the others answering 304 with stale
+# data; versioned() therefore sends no validators with that backend and every
+# request gets a full 200.
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, g, request, session
+
+
+def _now_version():
+    return time.time_ns() // 1000
+
+
+class LRUCache:
+    """In-process LRU cache with a TTL and a bound on the number of entries"""
+
+    # Local to one worker: versioned() sends no ETags from it
+    shared = False
+
+    def __init__(self, max_entries=10000, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys = {}
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, user_id, endpoint, variant):
+        key = (user_id, endpoint, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, user_id, endpoint, variant, value):
+        key = (user_id, endpoint, variant)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            for key in self._keys.pop(user_id, ()):
+                self._entries.pop(key, None)
+
+    def version(self, user_id):
+        """The user's data version, starting a new one if unknown
+
+        Versions only change on a write; the least recently used are dropped
+        beyond max_entries users.
+        """
+        with self._lock:
+            version = self._versions.get(user_id)
+            if version is not None:
+                self._versions.move_to_end(user_id)
+                return version
+            return self._set_version(user_id, _now_version())
+
+    def bump_version(self, user_id):
+        with self._lock:
+            version = _now_version()
+            if user_id in self._versions:
+                version = max(version, self._versions[user_id] + 1)
+            return self._set_version(user_id, version)
+
+    def _set_version(self, user_id, version):
+        self._versions[user_id] = version
+        self._versions.move_to_end(user_id)
+        while len(self._versions) > self.max_entries:
+            self._versions.popitem(last=False)
+        return version
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        user_id = key[0]
+        keys = self._keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys[user_id]
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'evictions': self.evictions, 'versions': len(self._versions)}
+
+
+class RedisCache:
+    """Cache backend for a Redis-compatible server shared by all workers
+
+    Each user's responses are one hash whose fields are endpoint|variant, so
+    invalidating a user is a single DEL. Data versions are plain keys
+    without a TTL, shared by every worker. Size is bounded by the server's
+    maxmemory policy.
+    """
+
+    shared = True
+
+    def __init__(self, url='redis://localhost:6379/0', ttl=60, prefix='expense_tracker:cache'):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, user_id):
+        return f"{self.prefix}:{user_id}"
+
+    def get(self, user_id, endpoint, variant):
+        raw = self._client.hget(self._key(user_id), f"{endpoint}|{variant}")
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if entry['expires_at'] < time.time():
+            return None
+        return entry['value']
+
+    def set(self, user_id, endpoint, variant, value):
+        key = self._key(user_id)
+        entry = json.dumps({'expires_at': time.time() + self.ttl, 'value': value})
+        pipe = self._client.pipeline()
+        pipe.hset(key, f"{endpoint}|{variant}", entry)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def invalidate(self, user_id):
+        self._client.delete(self._key(user_id))
+
+    def version(self, user_id):
+        key = f"{self.prefix}:version:{user_id}"
+        raw = self._client.get(key)
+        if raw is None:
+            # Another worker may start it first; SET NX keeps whichever came first
+            self._client.set(key, _now_version(), nx=True)
+            raw = self._client.get(key)
+        return int(raw)
+
+    def bump_version(self, user_id):
+        version = _now_version()
+        self._client.set(f"{self.prefix}:version:{user_id}", version)
+        return version
+
+    def stats(self):
+        return {'backend': 'redis'}
+
+
+def create_backend(config):
+    """Build the backend named in config['backend'], falling back to memory"""
+    if config.get('backend') == 'redis':
+        try:
+            return RedisCache(config['redis_url'], ttl=config['ttl'])
+        except ImportError:
+            print("Redis cache backend requested but the redis package is not installed; using memory cache")
+    return LRUCache(max_entries=config['max_entries'], ttl=config['ttl'])
+
+
+class ResponseCache:
+    """Caches successful JSON responses of per-user GET endpoints"""
+
+    def __init__(self, backend, enabled=True):
+        self.backend = backend
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._misses = {}
+        self._not_modified = {}
+
+    def _count(self, counter, endpoint):
+        with self._lock:
+            counter[endpoint] = counter.get(endpoint, 0) + 1
+
+    def init_app(self, app):
+        """Register the cache on the app for views decorated with cached()"""
+        app.extensions['response_cache'] = self
+
+    def serve(self, endpoint, monthly, f, args, kwargs):
+        """Answer a view call from the cache, or call the view and store its body"""
+        if not self.enabled:
+            return f(*args, **kwargs)
+
+        user_id = session['user_id']
+        # Keyed by the data version read before the view runs: a body a slow
+        # reader stores after a write's invalidate() lands under the old
+        # version and is never served again. versioned() hands over the
+        # version its ETag was built from.
+        version = g.pop('_data_version', None)
+        if version is None:
+            version = self.data_version(user_id)
+        if version is None:
+            return f(*args, **kwargs)
+        parts = [f"{k}={v}" for k, v in sorted(kwargs.items())]
+        if monthly:
+            parts.append(datetime.now().strftime('%Y-%m'))
+        parts.append(f"v={version}")
+        variant = '|'.join(parts)
+
+        try:
+            body = self.backend.get(user_id, endpoint, variant)
+        except Exception as e:
+            print(f"Error reading cache: {e}")
+            body = None
+
+        if body is not None:
+            self._count(self._hits, endpoint)
+            response = current_app.response_class(body, mimetype='application/json')
+            response.headers['X-Cache'] = 'HIT'
+            return response
+
+        self._count(self._misses, endpoint)
+        response = current_app.make_response(f(*args, **kwargs))
+        if response.status_code == 200 and response.is_json:
+            try:
+                self.backend.set(user_id, endpoint, variant, response.get_data(as_text=True))
+            except Exception as e:
+                print(f"Error writing cache: {e}")
+        response.headers['X-Cache'] = 'MISS'
+        return response
+
+    def invalidate(self, user_id):
+        """Drop every cached response of one user, then bump their data version
+
+        Call it after any write to the user's data commits. The version is
+        bumped even with the cache disabled, since versioned() ETags depend on it.
+        """
+        if self.enabled:
+            try:
+                self.backend.invalidate(user_id)
+            except Exception as e:
+                print(f"Error invalidating cache: {e}")
+        try:
+            self.backend.bump_version(user_id)
+        except Exception as e:
+            print(f"Error bumping data version: {e}")
+
+    def data_version(self, user_id):
+        """The user's current data version, or None if the backend is unavailable"""
+        try:
+            return self.backend.version(user_id)
+        except Exception as e:
+            print(f"Error reading data version: {e}")
+            return None
+
+    def serve_versioned(self, monthly, f, args, kwargs):
+        """Answer a conditional GET with 304 from the data version, or call the view and tag its response"""
+        if not self.backend.shared:
+            return f(*args, **kwargs)
+        version = self.data_version(session['user_id'])
+        if version is None:
+            return f(*args, **kwargs)
+        g._data_version = version
+
+        # Month-scoped views change when the month does, without any write
+        modified = version / 1_000_000
+        key = f"{session['user_id']}|{request.full_path}|{version}"
+        if monthly:
+            month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            modified = max(modified, month_start.timestamp())
+            key += f"|{month_start:%Y-%m}"
+        etag = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        # Last-Modified has one-second resolution, so it is only sent once the
+        # second of the last write is over; until then If-None-Match alone decides
+        last_modified = None
+        if int(modified) < int(time.time()):
+            last_modified = datetime.fromtimestamp(int(modified), timezone.utc)
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            since = request.if_modified_since
+            not_modified = since is not None and last_modified is not None and last_modified <= since
+
+        if not_modified:
+            g.pop('_data_version', None)
+            self._count(self._not_modified, request.endpoint)
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.make_response(f(*args, **kwargs))
+            g.pop('_data_version', None)
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def stats(self):
+        with self._lock:
+            hits = dict(self._hits)
+            misses = dict(self._misses)
+            not_modified = dict(self._not_modified)
+        total_hits = sum(hits.values())
+        total_requests = total_hits + sum(misses.values())
+        return {
+            'enabled': self.enabled,
+            'hits': total_hits,
+            'misses': total_requests - total_hits,
+            'hit_ratio': round(total_hits / total_requests, 4) if total_requests else 0.0,
+            'not_modified': sum(not_modified.values()),
+            'endpoints': {
+                endpoint: {'hits': hits.get(endpoint, 0), 'misses': misses.get(endpoint, 0)}
+                for endpoint in sorted(set(hits) | set(misses))
+            },
+            'not_modified_endpoints': dict(sorted(not_modified.items())),
+            'backend': self.backend.stats(),
+        }
+
+
+def cached(endpoint, monthly=False):
+    """Decorator caching a view's JSON body per user in the current app's ResponseCache
+
+    View arguments become part of the key; monthly=True also keys on the
+    current month so month-scoped data does not leak across months.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            cache = current_app.extensions['response_cache']
+            return cache.serve(endpoint, monthly, f, args, kwargs)
+        return decorated_function
+    return decorator
+
+
+def versioned(monthly=False):
+    """ResponseCache.serve_versioned for blueprint views: strong ETag and Last-Modified per user data version
+
+    Only with a shared backend; with the in-process one the view runs
+    untagged. Put it above cached() so a 304 skips the cache lookup too.
+    no-cache makes browsers revalidate on every load instead of reusing a
+    stale copy.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            cache = current_app.extensions['response_cache']
+            return cache.serve_versioned(monthly, f, args, kwargs)
+        return decorated_function
+    return decorator
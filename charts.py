@@ -0,0 +1,147 @@
+# Chart rendering for reports
+#
+# PNG charts are drawn with matplotlib's object-oriented API (a Figure bound to
+# its own FigureCanvasAgg), never through pyplot, so there is no global figure
+# state shared between request threads and nothing to close afterwards.
+# Vector charts are built from reportlab's graphics Pie and Legend and can be
+# placed straight into a PDF story without rasterising.
+#
+# matplotlib and reportlab are imported on first use to keep them out of app
+# startup.
+
+import io
+import threading
+import time
+
+# (width inches, height inches, dpi)
+PRESETS = {
+    'thumbnail': (4, 3, 72),
+    'screen': (8, 6, 100),
+    'print': (8, 6, 200),
+    'hires': (8, 6, 300),
+}
+
+# Matches matplotlib's Set3 colormap used by the PNG charts
+PALETTE = ['#8dd3c7', '#ffffb3', '#bebada', '#fb8072', '#80b1d3', '#fdb462',
+           '#b3de69', '#fccde5', '#d9d9d9', '#bc80bd', '#ccebc5', '#ffed6f']
+
+
+class ChartStats:
+    """Render counts, time and output size per (format, preset)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, key, seconds, size=None):
+        with self._lock:
+            entry = self._stats.setdefault(key, {'count': 0, 'seconds': 0.0, 'bytes': 0})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            entry['bytes'] += size or 0
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                key: {
+                    'count': s['count'],
+                    'avg_ms': round(s['seconds'] * 1000 / s['count'], 2),
+                    'avg_bytes': s['bytes'] // s['count'] if s['bytes'] else None,
+                }
+                for key, s in self._stats.items()
+            }
+
+
+chart_stats = ChartStats()
+
+
+def render_pie_png(data, title='Chart', preset='print', tight=False):
+    """Render a pie chart of [{'name', 'amount'}] items to a PNG buffer
+
+    tight=True trims the margins like bbox_inches='tight', at the cost of an
+    extra layout pass.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    start = time.perf_counter()
+    width, height, dpi = PRESETS[preset]
+    fig = Figure(figsize=(width, height), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    if data:
+        labels = [item['name'] for item in data]
+        sizes = [item['amount'] for item in data]
+        colors = [PALETTE[i % len(PALETTE)] for i in range(len(labels))]
+
+        wedges, texts, autotexts = ax.pie(sizes, labels=labels, autopct='%1.1f%%',
+                                          colors=colors, startangle=90)
+
+        # Improve text readability
+        for autotext in autotexts:
+            autotext.set_color('white')
+            autotext.set_fontweight('bold')
+
+    ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight' if tight else None)
+    buffer.seek(0)
+    chart_stats.record(f"png:{preset}", time.perf_counter() - start, buffer.getbuffer().nbytes)
+    return buffer
+
+
+def pie_drawing(data, title='Chart', width=400, height=220):
+    """Build a reportlab Drawing with a vector pie chart and legend for a PDF story"""
+    from reportlab.graphics.charts.legends import Legend
+    from reportlab.graphics.charts.piecharts import Pie
+    from reportlab.graphics.shapes import Drawing, String
+    from reportlab.lib import colors
+
+    start = time.perf_counter()
+    drawing = Drawing(width, height)
+    drawing.add(String(width / 2, height - 14, title, fontName='Helvetica-Bold',
+                       fontSize=12, textAnchor='middle'))
+
+    if data:
+        total = sum(item['amount'] for item in data) or 1
+        size = min(height - 40, width / 2 - 20)
+
+        pie = Pie()
+        pie.x = 10
+        pie.y = (height - 20 - size) / 2
+        pie.width = pie.height = size
+        pie.data = [item['amount'] for item in data]
+        pie.startAngle = 90
+        pie.direction = 'clockwise'
+        pie.slices.strokeColor = colors.white
+        for i in range(len(data)):
+            pie.slices[i].fillColor = colors.HexColor(PALETTE[i % len(PALETTE)])
+        drawing.add(pie)
+
+        legend = Legend()
+        legend.x = size + 40
+        legend.y = height - 30
+        legend.alignment = 'right'
+        legend.fontSize = 9
+        legend.columnMaximum = 12
+        legend.colorNamePairs = [
+            (colors.HexColor(PALETTE[i % len(PALETTE)]), f"{item['name']} ({item['amount'] / total * 100:.1f}%)")
+            for i, item in enumerate(data)
+        ]
+        drawing.add(legend)
+
+    # A drawing has no encoded size until it is built into a PDF
+    chart_stats.record('vector', time.perf_counter() - start)
+    return drawing
+
+
+def render_chart(data, chart_type='pie', title='Chart', preset='print', vector=False):
+    """PNG buffer, or a reportlab Drawing when vector=True"""
+    if chart_type != 'pie':
+        raise ValueError(f"Unsupported chart type: {chart_type}")
+    if vector:
+        return pie_drawing(data, title)
+    return render_pie_png(data, title, preset)
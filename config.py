@@ -0,0 +1,120 @@
+# Application configuration
+#
+# Every setting is read from the environment (or .env) when create_app() calls
+# load_config(), so each app built in a process sees the environment as it is
+# at that moment. Values passed to create_app(config=...) override these.
+
+import os
+
+from dotenv import load_dotenv
+
+
+def _flag(name, default):
+    return os.getenv(name, default).lower() == "true"
+
+
+def load_config():
+    """Return the app config as a dict of upper-case keys"""
+    load_dotenv()
+
+    return {
+        'SECRET_KEY': os.getenv("SECRET_KEY"),
+
+        # Database configuration
+        'DB_CONFIG': {
+            'host': 'localhost',
+            'user': 'root',
+            'password': os.getenv("DB_PASSWORD"),  # Change this
+            'database': 'expense_tracker1'
+        },
+
+        # Connection pool configuration
+        'DB_POOL_CONFIG': {
+            'pool_size': int(os.getenv("DB_POOL_SIZE", 5)),
+            'max_overflow': int(os.getenv("DB_POOL_MAX_OVERFLOW", 10)),
+            'timeout': float(os.getenv("DB_POOL_TIMEOUT", 30)),
+            'recycle': int(os.getenv("DB_POOL_RECYCLE", 3600)),
+            'idle_timeout': int(os.getenv("DB_POOL_IDLE_TIMEOUT", 600)),
+            'pre_ping': _flag("DB_POOL_PRE_PING", "true")
+        },
+
+        # Per-request SQL stats (Server-Timing header, JSON log line) and slow-query log
+        'QUERY_STATS_CONFIG': {
+            'enabled': _flag("QUERY_STATS_ENABLED", "true"),
+            'log_requests': _flag("QUERY_LOG_REQUESTS", "true"),
+            'server_timing': _flag("QUERY_SERVER_TIMING", "true"),
+            'slow_query_ms': float(os.getenv("SLOW_QUERY_MS", 100)),
+            'slow_log_size': int(os.getenv("SLOW_QUERY_LOG_SIZE", 200))
+        },
+
+        # /metrics and /api/health/* monitoring endpoints: 404 unless enabled;
+        # with a token set, callers must send "Authorization: Bearer <token>"
+        'MONITORING_CONFIG': {
+            'enabled': _flag("MONITORING_ENABLED", "false"),
+            'token': os.getenv("MONITORING_TOKEN") or None
+        },
+
+        # Read cache configuration ('memory' or 'redis')
+        'CACHE_CONFIG': {
+            'enabled': _flag("CACHE_ENABLED", "true"),
+            'backend': os.getenv("CACHE_BACKEND", "memory"),
+            'redis_url': os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"),
+            'max_entries': int(os.getenv("CACHE_MAX_ENTRIES", 10000)),
+            'ttl': int(os.getenv("CACHE_TTL", 60))
+        },
+
+        # Monthly report batch configuration (REPORT_RENDER_WORKERS=0 renders without subprocesses)
+        'REPORT_BATCH_CONFIG': {
+            'fetch_batch_size': int(os.getenv("REPORT_FETCH_BATCH_SIZE", 500)),
+            'render_workers': int(os.getenv("REPORT_RENDER_WORKERS", os.cpu_count() or 1)),
+            'send_workers': int(os.getenv("REPORT_SEND_WORKERS", 8)),
+            'max_in_flight': int(os.getenv("REPORT_MAX_IN_FLIGHT", 64)),
+            'max_attempts': int(os.getenv("REPORT_MAX_ATTEMPTS", 3)),
+            'backoff_base': float(os.getenv("REPORT_BACKOFF_BASE", 30)),
+            'backoff_max': float(os.getenv("REPORT_BACKOFF_MAX", 3600)),
+            'retry_wait': float(os.getenv("REPORT_RETRY_WAIT", 120))
+        },
+
+        # Rendered report PDF cache (directory None means instance/report_cache)
+        'REPORT_CACHE_CONFIG': {
+            'enabled': _flag("REPORT_CACHE_ENABLED", "true"),
+            'directory': os.getenv("REPORT_CACHE_DIR") or None,
+            'max_bytes': int(os.getenv("REPORT_CACHE_MAX_MB", 256)) * 1024 * 1024
+        },
+
+        # Email configuration
+        'EMAIL_CONFIG': {
+            'smtp_server': os.getenv("SMTP_SERVER", 'smtp.gmail.com'),
+            'smtp_port': int(os.getenv("SMTP_PORT", 587)),
+            'email': os.getenv("EMAIL"),  # Change this
+            'password': os.getenv("EMAIL_PASSWORD"),   # Change this
+            'use_tls': _flag("SMTP_USE_TLS", "true"),
+            'pool_size': int(os.getenv("SMTP_POOL_SIZE", 4)),
+            'timeout': float(os.getenv("SMTP_TIMEOUT", 30)),
+            'idle_timeout': int(os.getenv("SMTP_IDLE_TIMEOUT", 60)),
+            'max_messages': int(os.getenv("SMTP_MAX_MESSAGES", 100))
+        },
+
+        # Outbound mail queue configuration
+        'MAIL_QUEUE_CONFIG': {
+            'workers': int(os.getenv("MAIL_QUEUE_WORKERS", 2)),
+            'poll_interval': float(os.getenv("MAIL_QUEUE_POLL_INTERVAL", 2)),
+            'max_attempts': int(os.getenv("MAIL_QUEUE_MAX_ATTEMPTS", 5)),
+            'backoff_base': float(os.getenv("MAIL_QUEUE_BACKOFF_BASE", 5)),
+            'backoff_max': float(os.getenv("MAIL_QUEUE_BACKOFF_MAX", 300))
+        },
+
+        # Background jobs: every worker polls, the one holding the lock runs them
+        'SCHEDULER_CONFIG': {
+            'lock_name': os.getenv("SCHEDULER_LOCK_NAME", "expense_tracker:scheduler"),
+            'poll_interval': float(os.getenv("SCHEDULER_POLL_INTERVAL", 30)),
+            # Keep below MySQL's wait_timeout so the lock's session is never dropped as idle
+            'heartbeat_interval': float(os.getenv("SCHEDULER_HEARTBEAT_INTERVAL", 60))
+        },
+
+        # Default accounts and categories for new users (None means provisioning.DEFAULT_TEMPLATE)
+        'SIGNUP_TEMPLATE_FILE': os.getenv("SIGNUP_TEMPLATE_FILE") or None,
+
+        # Bulk transaction import: rows per executemany batch
+        'IMPORT_CHUNK_SIZE': int(os.getenv("IMPORT_CHUNK_SIZE", 1000)),
+    }
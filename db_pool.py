@@ -0,0 +1,282 @@
+# Connection pooling for the MySQL connections handed out by get_db_connection()
+
+import threading
+import time
+from collections import deque
+
+from flask import g, has_app_context
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no connection could be checked out before the pool timeout"""
+
+
+class _ConnectionRecord:
+    """A raw DB-API connection plus the bookkeeping the pool needs"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class PooledConnection:
+    """Connection proxy handed to callers; close() returns it to the pool"""
+
+    def __init__(self, pool, record):
+        self._pool = pool
+        self._record = record
+        self._scoped = False
+
+    def __getattr__(self, name):
+        if self._record is None:
+            raise AttributeError(f"Connection already returned to the pool ({name})")
+        return getattr(self._record.raw, name)
+
+    @property
+    def closed(self):
+        return self._record is None
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._record.raw.cursor(*args, **kwargs)
+        wrap = self._pool.cursor_wrapper
+        return wrap(cursor) if wrap else cursor
+
+    def close(self):
+        # Request-scoped connections are released by the app context teardown
+        if self._scoped:
+            return
+        self.release()
+
+    def release(self):
+        record, self._record = self._record, None
+        if record is not None:
+            self._pool._return(record)
+
+
+class ConnectionPool:
+    """Thread-safe pool of DB connections with overflow, health checks and recycling
+
+    pool_size connections are kept alive between checkouts; up to max_overflow
+    extra connections may be opened under load and are closed when returned.
+    A checkout waits up to `timeout` seconds for a free connection before
+    raising PoolExhaustedError. cursor_wrapper, if set, wraps every cursor
+    the pooled connections hand out (see query_stats.py).
+    """
+
+    cursor_wrapper = None
+
+    def __init__(self, creator, pool_size=5, max_overflow=10, timeout=30.0,
+                 recycle=3600, idle_timeout=600, pre_ping=True):
+        self._creator = creator
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._total = 0
+        self._checked_out = 0
+
+        self._checkouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._exhausted = 0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._health_check_failures = 0
+
+    def connect(self):
+        """Check out a connection, waiting for one to be returned if the pool is full"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    record = self._idle.pop()
+                    break
+                if self._total < self.pool_size + self.max_overflow:
+                    self._total += 1
+                    record = None
+                    break
+                if not waited:
+                    self._exhausted += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolExhaustedError(
+                        f"Connection pool exhausted (size={self.pool_size}, "
+                        f"overflow={self.max_overflow}, timeout={self.timeout}s)"
+                    )
+                self._cond.wait(remaining)
+
+        try:
+            if record is not None:
+                record = self._validate(record)
+            if record is None:
+                record = self._new_record()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+        wait = time.monotonic() - start
+        with self._cond:
+            self._checked_out += 1
+            self._checkouts += 1
+            self._wait_time_total += wait
+            self._wait_time_max = max(self._wait_time_max, wait)
+
+        return PooledConnection(self, record)
+
+    def connect_unpooled(self):
+        """Open a raw connection outside the pool
+
+        For sessions holding server-side state, such as advisory locks, that
+        must never be handed to another caller.
+        """
+        return self._creator()
+
+    def _new_record(self):
+        record = _ConnectionRecord(self._creator())
+        with self._cond:
+            self._created += 1
+        return record
+
+    def _validate(self, record):
+        """Return the record if still usable, otherwise close it and return None"""
+        now = time.monotonic()
+        stale = (
+            (self.recycle and now - record.created_at > self.recycle) or
+            (self.idle_timeout and now - record.last_used > self.idle_timeout)
+        )
+        if stale:
+            self._discard(record)
+            with self._cond:
+                self._recycled += 1
+            return None
+
+        if self.pre_ping:
+            try:
+                record.raw.ping(reconnect=False)
+            except Exception:
+                self._discard(record)
+                with self._cond:
+                    self._health_check_failures += 1
+                return None
+
+        return record
+
+    def _discard(self, record):
+        try:
+            record.raw.close()
+        except Exception:
+            pass
+
+    def _return(self, record):
+        # Never hand out a connection with an open transaction
+        try:
+            record.raw.rollback()
+        except Exception:
+            self._discard(record)
+            record = None
+
+        with self._cond:
+            self._checked_out -= 1
+            if record is not None and len(self._idle) < self.pool_size:
+                record.last_used = time.monotonic()
+                self._idle.append(record)
+                record = None
+            else:
+                self._total -= 1
+            self._cond.notify()
+
+        if record is not None:
+            self._discard(record)
+        # Checkouts take the most recently used connection, so ones left idle
+        # at the other end after a burst are only closed here
+        self.prune()
+
+    def prune(self):
+        """Close idle connections that have outlived recycle or idle_timeout; called on every return"""
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            keep = deque()
+            for record in self._idle:
+                if ((self.recycle and now - record.created_at > self.recycle) or
+                        (self.idle_timeout and now - record.last_used > self.idle_timeout)):
+                    expired.append(record)
+                else:
+                    keep.append(record)
+            self._idle = keep
+            self._total -= len(expired)
+            self._recycled += len(expired)
+            self._cond.notify(len(expired))
+
+        for record in expired:
+            self._discard(record)
+        return len(expired)
+
+    def dispose(self):
+        """Close every idle connection; checked-out ones are closed when returned"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._total -= len(idle)
+        for record in idle:
+            self._discard(record)
+
+    def stats(self):
+        """Snapshot of pool usage counters for monitoring"""
+        with self._cond:
+            return {
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'connections': self._total,
+                'checked_out': self._checked_out,
+                'idle': len(self._idle),
+                'overflow': max(0, self._total - self.pool_size),
+                'checkouts': self._checkouts,
+                'wait_time_total': round(self._wait_time_total, 6),
+                'wait_time_avg': round(self._wait_time_total / self._checkouts, 6) if self._checkouts else 0.0,
+                'wait_time_max': round(self._wait_time_max, 6),
+                'exhausted': self._exhausted,
+                'timeouts': self._timeouts,
+                'connections_created': self._created,
+                'connections_recycled': self._recycled,
+                'health_check_failures': self._health_check_failures,
+            }
+
+
+def get_connection(pool):
+    """Check out a connection, shared for the rest of the request when in an app context"""
+    if not has_app_context():
+        return pool.connect()
+
+    conn = g.get('_db_connection')
+    if conn is None or conn.closed:
+        conn = pool.connect()
+        conn._scoped = True
+        g._db_connection = conn
+    return conn
+
+
+def release_connection(exception=None):
+    """Return the request-scoped connection to the pool"""
+    conn = g.pop('_db_connection', None)
+    if conn is not None:
+        conn.release()
+
+
+def init_app(app, pool):
+    """Register the pool on the Flask app and release connections at teardown"""
+    app.extensions['db_pool'] = pool
+    app.teardown_appcontext(release_connection)
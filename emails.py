@@ -0,0 +1,151 @@
+# Outgoing email messages
+#
+# Mailer builds the OTP and monthly report emails and hands them to an
+# SMTPPool. It holds no app state, so its bound methods can be given to the
+# mail queue workers and the report batch threads as plain callables.
+
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import metrics
+
+
+class Mailer:
+    """Builds and sends the app's emails from one sender address"""
+
+    def __init__(self, pool, sender):
+        self.pool = pool
+        self.sender = sender
+
+    def _send(self, kind, msg):
+        try:
+            with metrics.smtp_send_seconds.labels(kind).time():
+                self.pool.send(msg)
+        except Exception:
+            metrics.smtp_sends.labels(kind, 'failed').inc()
+            raise
+        metrics.smtp_sends.labels(kind, 'sent').inc()
+
+    def send_otp(self, email, otp):
+        """Deliver an OTP email; raises on failure so the mail queue can retry"""
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = email
+        msg['Subject'] = "Expense Tracker - OTP Verification"
+        
+        body = f"""
+        Your OTP for Expense Tracker registration is: {otp}
+        This OTP is valid for 5 minutes only.
+        """
+        
+        msg.attach(MIMEText(body, 'plain'))
+        
+        self._send('otp', msg)
+
+    def send_monthly_report(self, email, username, report_data, pdf_buffer):
+        try:
+            msg = MIMEMultipart()
+            msg['From'] = self.sender
+            msg['To'] = email
+            msg['Subject'] = f"Monthly Financial Report - {report_data['month_year']}"
+        
+            # Create HTML email body
+            html_body = f"""
+            <html>
+            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                    <h2 style="color: #2563eb; text-align: center;">Monthly Financial Report</h2>
+                    <h3 style="color: #64748b;">Hello {username},</h3>
+                
+                    <p>Here's your financial summary for <strong>{report_data['month_year']}</strong>:</p>
+                
+                    <div style="background-color: #f8fafc; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                        <h4 style="margin-top: 0; color: #1e293b;">Financial Summary</h4>
+                        <table style="width: 100%; border-collapse: collapse;">
+                            <tr>
+                                <td style="padding: 8px 0; border-bottom: 1px solid #e2e8f0;">
+                                    <span style="color: #10b981; font-weight: bold;">💰 Total Income:</span>
+                                </td>
+                                <td style="padding: 8px 0; border-bottom: 1px solid #e2e8f0; text-align: right;">
+                                    <strong>₹{report_data['total_income']:,.2f}</strong>
+                                </td>
+                            </tr>
+                            <tr>
+                                <td style="padding: 8px 0; border-bottom: 1px solid #e2e8f0;">
+                                    <span style="color: #ef4444; font-weight: bold;">💸 Total Expenses:</span>
+                                </td>
+                                <td style="padding: 8px 0; border-bottom: 1px solid #e2e8f0; text-align: right;">
+                                    <strong>₹{report_data['total_expense']:,.2f}</strong>
+                                </td>
+                            </tr>
+                            <tr>
+                                <td style="padding: 8px 0;">
+                                    <span style="color: #f59e0b; font-weight: bold;">🏦 Total Savings:</span>
+                                </td>
+                                <td style="padding: 8px 0; text-align: right;">
+                                    <strong style="color: {'#10b981' if report_data['total_saving'] >= 0 else '#ef4444'};">
+                                        ₹{report_data['total_saving']:,.2f}
+                                    </strong>
+                                </td>
+                            </tr>
+                        </table>
+                    </div>
+                
+                    <div style="background-color: #f1f5f9; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                        <h4 style="margin-top: 0; color: #1e293b;">Top Expense Categories</h4>
+                        <ul style="list-style: none; padding: 0;">
+            """
+        
+            # Add top expense categories
+            for category in report_data['expense_categories'][:5]:
+                percentage = (category['amount'] / report_data['total_expense'] * 100) if report_data['total_expense'] > 0 else 0
+                html_body += f"""
+                            <li style="padding: 5px 0; border-bottom: 1px solid #cbd5e1;">
+                                <span style="font-weight: bold;">{category['name']}:</span> 
+                                ₹{category['amount']:,.2f} ({percentage:.1f}%)
+                            </li>
+                """
+        
+            html_body += f"""
+                        </ul>
+                    </div>
+                
+                    <p style="margin-top: 30px;">
+                        📊 Please find your detailed monthly report attached as a PDF.
+                    </p>
+                
+                    <p style="color: #64748b; font-size: 14px; margin-top: 30px;">
+                        Best regards,<br>
+                        Expense Tracker Team
+                    </p>
+                
+                    <hr style="border: none; border-top: 1px solid #e2e8f0; margin: 30px 0;">
+                    <p style="color: #94a3b8; font-size: 12px; text-align: center;">
+                        You're receiving this email because you opted in for monthly financial reports. 
+                        You can change your preferences in your account settings.
+                    </p>
+                </div>
+            </body>
+            </html>
+            """
+        
+            msg.attach(MIMEText(html_body, 'html'))
+        
+            # Attach PDF report
+            if pdf_buffer:
+                pdf_attachment = MIMEBase('application', 'octet-stream')
+                pdf_attachment.set_payload(pdf_buffer.getvalue())
+                encoders.encode_base64(pdf_attachment)
+                pdf_attachment.add_header(
+                    'Content-Disposition',
+                    f'attachment; filename="Monthly_Report_{report_data["month_year"].replace(" ", "_")}.pdf"'
+                )
+                msg.attach(pdf_attachment)
+        
+            self._send('monthly_report', msg)
+            return True
+        except Exception as e:
+            print(f"Error sending monthly report email: {e}")
+            return False
@@ -0,0 +1,51 @@
+# Shared services for the blueprints
+#
+# create_app() builds the connection pool, caches, SMTP pool and mail queue and
+# registers them in app.extensions. Blueprints reach them through these proxies,
+# which resolve against the current app, so importing a blueprint creates
+# nothing and several apps can live in one process.
+
+import hmac
+from functools import wraps
+
+from flask import abort, current_app, redirect, request, session, url_for
+from werkzeug.local import LocalProxy
+
+from db_pool import get_connection
+
+db_pool = LocalProxy(lambda: current_app.extensions['db_pool'])
+response_cache = LocalProxy(lambda: current_app.extensions['response_cache'])
+report_cache = LocalProxy(lambda: current_app.extensions['report_cache'])
+mail_pool = LocalProxy(lambda: current_app.extensions['mail_pool'])
+mailer = LocalProxy(lambda: current_app.extensions['mailer'])
+mail_queue = LocalProxy(lambda: current_app.extensions['mail_queue'])
+
+
+def get_db_connection():
+    return get_connection(current_app.extensions['db_pool'])
+
+
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return redirect(url_for('auth.login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def internal_only(f):
+    """Monitoring views: hidden unless MONITORING_CONFIG enables them, and token-checked if one is set"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        config = current_app.config['MONITORING_CONFIG']
+        if not config['enabled']:
+            abort(404)
+        token = config.get('token')
+        if token:
+            sent = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(sent.encode(), f"Bearer {token}".encode()):
+                return current_app.response_class('Unauthorized', status=401,
+                                                  headers={'WWW-Authenticate': 'Bearer'})
+        return f(*args, **kwargs)
+    return decorated_function
@@ -0,0 +1,327 @@
+# Bulk transaction import from CSV, JSON arrays or JSON Lines
+#
+# Rows are read from a binary stream one at a time, validated against the
+# user's accounts and categories and inserted with executemany in chunks.
+# Account balances (through ledger.apply, in one statement) and monthly rollups
+# are adjusted once per account / rollup key at the end instead of once per
+# row, and everything is committed in one DB transaction. Invalid rows are
+# skipped and reported with their row number.
+#
+# Each row has: date (YYYY-MM-DD), type (income/expense/transfer), amount,
+# account, category (income/expense only), to_account (transfers only) and an
+# optional description. Accounts and categories match by id or by name.
+
+import csv
+import io
+import json
+from datetime import date
+
+import click
+
+import ledger
+import rollups
+
+MAX_AMOUNT = 99999999.99
+MAX_REPORTED_ERRORS = 100
+FORMATS = ('csv', 'json', 'jsonl')
+
+
+class ImportFormatError(ValueError):
+    """Raised when the uploaded data cannot be parsed at all"""
+
+
+def detect_format(filename=None, content_type=None):
+    """Guess the import format from a file name or content type"""
+    name = (filename or '').lower()
+    content_type = (content_type or '').lower()
+    if name.endswith(('.jsonl', '.ndjson')) or 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'jsonl'
+    if name.endswith('.json') or 'json' in content_type:
+        return 'json'
+    return 'csv'
+
+
+def _iter_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    for row in reader:
+        # Header is line 1
+        yield reader.line_num, {(k or '').strip().lower(): v for k, v in row.items()}
+
+
+def _iter_jsonl(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, ImportFormatError(f"Invalid JSON: {e}")
+
+
+def _iter_json_array(stream, chunk_size=65536):
+    """Yield the elements of a top-level JSON array without reading it all into memory"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    index = 0
+    eof = False
+
+    while True:
+        # Skip whitespace and separators between elements
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise ImportFormatError('JSON import must be an array of objects')
+            started = True
+            position += 1
+            continue
+        if started and position < len(buffer) and buffer[position] == ']':
+            return
+
+        if position < len(buffer):
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if eof:
+                    raise ImportFormatError('Invalid JSON array')
+                value = None
+            else:
+                # A number or literal may continue in the next chunk
+                if end < len(buffer) or eof or isinstance(value, (dict, list, str)):
+                    index += 1
+                    yield index, value
+                    position = end
+                    continue
+
+        if eof:
+            if not started:
+                raise ImportFormatError('JSON import must be an array of objects')
+            raise ImportFormatError('Unterminated JSON array')
+        chunk = text.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def _unreadable_as_format_error(rows):
+    """Stop the import with ImportFormatError if the stream is not UTF-8 or not CSV"""
+    try:
+        yield from rows
+    except UnicodeDecodeError as e:
+        raise ImportFormatError(f"File is not valid UTF-8: {e.reason}")
+    except csv.Error as e:
+        raise ImportFormatError(f"Invalid CSV: {e}")
+
+
+def iter_rows(stream, fmt):
+    """Yield (row_number, dict) pairs; a row that failed to parse is yielded as an exception"""
+    if fmt == 'csv':
+        return _unreadable_as_format_error(_iter_csv(stream))
+    if fmt == 'jsonl':
+        return _unreadable_as_format_error(_iter_jsonl(stream))
+    if fmt == 'json':
+        return _unreadable_as_format_error(_iter_json_array(stream))
+    raise ImportFormatError(f"Unsupported format: {fmt}")
+
+
+def _lookup(table, value, what):
+    if value in (None, ''):
+        raise ValueError(f"{what} is required")
+    key = str(value).strip()
+    if key.isdigit() and int(key) in table['ids']:
+        return int(key)
+    match = table['names'].get(key.lower())
+    if match is None:
+        raise ValueError(f"Unknown {what}: {value}")
+    return match
+
+
+class TransactionImporter:
+    """Validates and inserts one user's rows; call run() with an iterable of rows"""
+
+    def __init__(self, cursor, user_id, chunk_size=1000):
+        self.cursor = cursor
+        self.user_id = user_id
+        self.chunk_size = chunk_size
+
+        cursor.execute("SELECT id, name FROM accounts WHERE user_id = %s", (user_id,))
+        rows = cursor.fetchall()
+        self.accounts = {'ids': {r[0] for r in rows}, 'names': {r[1].lower(): r[0] for r in rows}}
+
+        cursor.execute("SELECT id, name, type FROM categories WHERE user_id = %s", (user_id,))
+        rows = cursor.fetchall()
+        self.categories = {}
+        for category_type in ('income', 'expense'):
+            typed = [r for r in rows if r[2] == category_type]
+            self.categories[category_type] = {
+                'ids': {r[0] for r in typed},
+                'names': {r[1].lower(): r[0] for r in typed},
+            }
+
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.balance_deltas = {}
+        self.rollup_deltas = {}
+
+    def validate(self, row):
+        """Return the INSERT parameters for one row or raise ValueError"""
+        if not isinstance(row, dict):
+            raise ValueError('Row must be an object')
+        row = {str(k).strip().lower(): v for k, v in row.items()}
+
+        trans_type = str(row.get('type') or '').strip().lower()
+        if trans_type not in ('income', 'expense', 'transfer'):
+            raise ValueError(f"Invalid type: {row.get('type')}")
+
+        raw_date = row.get('date') or row.get('transaction_date')
+        try:
+            transaction_date = date.fromisoformat(str(raw_date).strip())
+        except ValueError:
+            raise ValueError(f"Invalid date: {raw_date}")
+
+        try:
+            amount = round(float(str(row.get('amount')).replace(',', '')), 2)
+        except ValueError:
+            raise ValueError(f"Invalid amount: {row.get('amount')}")
+        if not 0 < amount <= MAX_AMOUNT:
+            raise ValueError(f"Amount out of range: {row.get('amount')}")
+
+        account_id = _lookup(self.accounts, row.get('account') or row.get('account_id'), 'account')
+        category_id = None
+        to_account_id = None
+        if trans_type == 'transfer':
+            to_account_id = _lookup(self.accounts, row.get('to_account') or row.get('to_account_id'), 'to_account')
+            if to_account_id == account_id:
+                raise ValueError('Transfer needs two different accounts')
+        else:
+            category_id = _lookup(self.categories[trans_type], row.get('category') or row.get('category_id'),
+                                  f"{trans_type} category")
+
+        description = row.get('description') or None
+        if description is not None and not isinstance(description, str):
+            raise ValueError(f"Invalid description: {description!r}")
+        return (self.user_id, account_id, category_id, to_account_id, amount, trans_type,
+                description, transaction_date)
+
+    def _record_error(self, row_number, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': str(error)})
+
+    def _track(self, params):
+        _, account_id, category_id, to_account_id, amount, trans_type, _, transaction_date = params
+        if trans_type == 'income':
+            self.balance_deltas[account_id] = self.balance_deltas.get(account_id, 0.0) + amount
+        else:
+            self.balance_deltas[account_id] = self.balance_deltas.get(account_id, 0.0) - amount
+        if trans_type == 'transfer':
+            self.balance_deltas[to_account_id] = self.balance_deltas.get(to_account_id, 0.0) + amount
+
+        key = (transaction_date.year, transaction_date.month, trans_type, category_id or 0)
+        total, count = self.rollup_deltas.get(key, (0.0, 0))
+        self.rollup_deltas[key] = (total + amount, count + 1)
+
+    def _flush(self, chunk):
+        self.cursor.executemany("""
+            INSERT INTO transactions (user_id, account_id, category_id, to_account_id, amount, type,
+                                      description, transaction_date)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, chunk)
+        self.imported += len(chunk)
+
+    def run(self, rows, dry_run=False):
+        """Insert every valid row; balances and rollups are adjusted at the end"""
+        chunk = []
+        for row_number, row in rows:
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                params = self.validate(row)
+            except ValueError as e:
+                self._record_error(row_number, e)
+                continue
+
+            self._track(params)
+            if dry_run:
+                self.imported += 1
+                continue
+            chunk.append(params)
+            if len(chunk) >= self.chunk_size:
+                self._flush(chunk)
+                chunk = []
+
+        if dry_run:
+            return self.summary(dry_run)
+        if chunk:
+            self._flush(chunk)
+
+        # Each touched account's net change, in one locked UPDATE
+        ledger.apply(self.cursor, self.user_id, self.balance_deltas)
+        rollups.add_totals(self.cursor, self.user_id, self.rollup_deltas)
+        return self.summary(dry_run)
+
+    def summary(self, dry_run=False):
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'dry_run': dry_run,
+        }
+
+
+def import_transactions(conn, user_id, stream, fmt, chunk_size=1000, dry_run=False):
+    """Import a stream for one user in a single DB transaction and return the summary"""
+    cursor = conn.cursor()
+    try:
+        importer = TransactionImporter(cursor, user_id, chunk_size=chunk_size)
+        result = importer.run(iter_rows(stream, fmt), dry_run=dry_run)
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def init_app(app, get_connection, chunk_size=1000):
+    """Register the `flask transactions import` command"""
+
+    @app.cli.group()
+    def transactions():
+        """Manage transactions in bulk."""
+
+    @transactions.command('import')
+    @click.option('--user-id', type=int, required=True, help='Import into this user.')
+    @click.option('--format', 'fmt', type=click.Choice(FORMATS), default=None,
+                  help='Input format (default: from the file extension).')
+    @click.option('--dry-run', is_flag=True, help='Validate without writing anything.')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    def import_command(user_id, fmt, dry_run, path):
+        """Import transactions from a CSV, JSON or JSON Lines file."""
+        conn = get_connection()
+        try:
+            with open(path, 'rb') as stream:
+                result = import_transactions(conn, user_id, stream, fmt or detect_format(path),
+                                             chunk_size=chunk_size, dry_run=dry_run)
+        except ImportFormatError as e:
+            raise click.ClickException(str(e))
+        finally:
+            conn.close()
+
+        for error in result['errors']:
+            click.echo(f"row {error['row']}: {error['error']}")
+        if result['errors_truncated']:
+            click.echo(f"... {result['failed'] - len(result['errors'])} more errors")
+        verb = 'Validated' if dry_run else 'Imported'
+        click.echo(f"{verb} {result['imported']} transactions, {result['failed']} rows rejected.")
@@ -0,0 +1,214 @@
+# Account balance ledger
+#
+# accounts.balance is a cached running total of the account's transactions on
+# top of accounts.opening_balance. Every write route changes it through
+# apply(), which locks the touched account rows in id order (SELECT ... FOR
+# UPDATE, so two writers never deadlock on a transfer) and then applies all
+# the deltas in one UPDATE inside the caller's DB transaction. The statement
+# text only depends on how many accounts are touched, so it is built once per
+# arity and the server sees a handful of distinct statements.
+#
+# reconcile() recomputes the expected balances from transactions with one
+# grouped query per page of users and reports every account that drifted;
+# `flask ledger reconcile --fix` corrects them through apply() as well.
+
+from functools import lru_cache
+
+import click
+
+DRIFT_TOLERANCE = 0.005
+
+
+class LedgerError(ValueError):
+    """Raised when a balance change names an account the user does not own"""
+
+
+def transaction_deltas(trans_type, account_id, to_account_id, amount, sign=1):
+    """{account_id: change} a transaction makes to balances (sign=-1 reverses it)"""
+    amount = float(amount) * sign
+    deltas = {account_id: amount if trans_type == 'income' else -amount}
+    # The receiving account may have been deleted (to_account_id SET NULL)
+    if trans_type == 'transfer' and to_account_id:
+        deltas[to_account_id] = deltas.get(to_account_id, 0.0) + amount
+    return deltas
+
+
+@lru_cache(maxsize=None)
+def _lock_sql(count):
+    placeholders = ', '.join(['%s'] * count)
+    return f"SELECT id FROM accounts WHERE user_id = %s AND id IN ({placeholders}) ORDER BY id FOR UPDATE"
+
+
+@lru_cache(maxsize=None)
+def _update_sql(count):
+    cases = ' '.join(['WHEN %s THEN %s'] * count)
+    placeholders = ', '.join(['%s'] * count)
+    return (f"UPDATE accounts SET balance = balance + CASE id {cases} ELSE 0 END "
+            f"WHERE user_id = %s AND id IN ({placeholders})")
+
+
+def apply(cursor, user_id, deltas):
+    """Lock the accounts in deltas and add each delta to its balance
+
+    Raises LedgerError, before anything is written, if an account does not
+    exist or belongs to another user. The caller commits or rolls back.
+    """
+    # Request bodies may carry ids as strings; merge them under one int key
+    normalized = {}
+    for account_id, delta in deltas.items():
+        if account_id is None:
+            continue
+        try:
+            account_id = int(account_id)
+        except (TypeError, ValueError):
+            raise LedgerError(f"Invalid account: {account_id!r}")
+        normalized[account_id] = normalized.get(account_id, 0.0) + float(delta)
+    deltas = normalized
+    account_ids = sorted(deltas)
+    if not account_ids:
+        return
+    cursor.execute(_lock_sql(len(account_ids)), (user_id, *account_ids))
+    found = {row[0] for row in cursor.fetchall()}
+    missing = [account_id for account_id in account_ids if account_id not in found]
+    if missing:
+        raise LedgerError(f"Account not found: {missing[0]}")
+
+    changes = [(account_id, round(float(deltas[account_id]), 2)) for account_id in account_ids]
+    changes = [(account_id, delta) for account_id, delta in changes if delta]
+    if not changes:
+        return
+    cursor.execute(
+        _update_sql(len(changes)),
+        (*[value for change in changes for value in change], user_id, *[account_id for account_id, _ in changes])
+    )
+
+
+def absorb_account(cursor, user_id, account_id):
+    """Fold an account's outgoing transfers into the receivers' opening balances
+
+    Deleting an account cascades its transactions away, including transfers
+    into the user's other accounts. Their balances keep the money, so the
+    amount moves into opening_balance to keep reconciliation clean.
+    """
+    cursor.execute("""
+        SELECT to_account_id, SUM(amount)
+        FROM transactions
+        WHERE user_id = %s AND account_id = %s AND type = 'transfer'
+        AND to_account_id IS NOT NULL AND to_account_id <> %s
+        GROUP BY to_account_id
+    """, (user_id, account_id, account_id))
+    received = cursor.fetchall()
+    if received:
+        cursor.executemany(
+            "UPDATE accounts SET opening_balance = opening_balance + %s WHERE id = %s AND user_id = %s",
+            [(total, to_account_id, user_id) for to_account_id, total in received]
+        )
+
+
+def _expected_balances(cursor, user_ids):
+    """(user_id, account_id, name, balance, expected) for every account of user_ids"""
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    cursor.execute(f"""
+        SELECT a.user_id, a.id, a.name, a.balance, a.opening_balance + COALESCE(SUM(e.delta), 0)
+        FROM accounts a
+        LEFT JOIN (
+            SELECT account_id, CASE WHEN type = 'income' THEN amount ELSE -amount END as delta
+            FROM transactions
+            WHERE user_id IN ({placeholders})
+            UNION ALL
+            SELECT to_account_id, amount
+            FROM transactions
+            WHERE user_id IN ({placeholders}) AND type = 'transfer' AND to_account_id IS NOT NULL
+        ) e ON e.account_id = a.id
+        WHERE a.user_id IN ({placeholders})
+        GROUP BY a.user_id, a.id, a.name, a.balance, a.opening_balance
+        ORDER BY a.user_id, a.id
+    """, (*user_ids, *user_ids, *user_ids))
+    return cursor.fetchall()
+
+
+def reconcile(cursor, user_id=None, batch_size=500):
+    """Compare cached balances with the transactions and return the accounts that differ"""
+    if user_id is not None:
+        pages = [[user_id]]
+    else:
+        pages = _user_pages(cursor, batch_size)
+
+    drifted = []
+    for user_ids in pages:
+        for owner, account_id, name, balance, expected in _expected_balances(cursor, user_ids):
+            balance, expected = float(balance or 0), float(expected or 0)
+            if abs(balance - expected) >= DRIFT_TOLERANCE:
+                drifted.append({
+                    'user_id': owner,
+                    'account_id': account_id,
+                    'name': name,
+                    'balance': round(balance, 2),
+                    'expected': round(expected, 2),
+                    'drift': round(balance - expected, 2),
+                })
+    return drifted
+
+
+def _user_pages(cursor, batch_size):
+    last_id = 0
+    while True:
+        cursor.execute("SELECT id FROM users WHERE id > %s ORDER BY id LIMIT %s", (last_id, batch_size))
+        user_ids = [row[0] for row in cursor.fetchall()]
+        if not user_ids:
+            return
+        yield user_ids
+        last_id = user_ids[-1]
+
+
+def correct(cursor, drifted):
+    """Subtract each account's drift from its balance
+
+    The correction is a delta rather than an absolute value, so a write that
+    lands between reconcile() and correct() is not overwritten.
+    """
+    by_user = {}
+    for d in drifted:
+        by_user.setdefault(d['user_id'], {})[d['account_id']] = -d['drift']
+    for user_id, deltas in sorted(by_user.items()):
+        apply(cursor, user_id, deltas)
+    return len(by_user)
+
+
+def init_app(app, get_connection):
+    """Register the `flask ledger` maintenance commands"""
+
+    @app.cli.group()
+    def ledger():
+        """Check account balances against the transactions table."""
+
+    @ledger.command('reconcile')
+    @click.option('--user-id', type=int, default=None, help='Only check this user.')
+    @click.option('--batch-size', type=int, default=500, show_default=True, help='Users per grouped query.')
+    @click.option('--fix', is_flag=True, help='Correct the drifted balances.')
+    def reconcile_command(user_id, batch_size, fix):
+        """Report accounts whose balance disagrees with their transactions."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            drifted = reconcile(cursor, user_id, batch_size)
+            for d in drifted:
+                click.echo(
+                    f"user {d['user_id']} account {d['account_id']} ({d['name']}): "
+                    f"balance {d['balance']:.2f}, expected {d['expected']:.2f}, drift {d['drift']:+.2f}"
+                )
+            if drifted and fix:
+                users = correct(cursor, drifted)
+                conn.commit()
+                click.echo(f"Corrected {len(drifted)} accounts of {users} users.")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+        if not drifted:
+            click.echo("Balances are consistent.")
+        elif not fix:
+            raise SystemExit(1)
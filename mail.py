@@ -0,0 +1,178 @@
+# Outgoing mail transport with a pool of persistent SMTP sessions
+#
+# Opening an SMTP session costs a TCP connect, EHLO, STARTTLS and AUTH, which
+# dominates the time to send a small message. SMTPPool keeps up to pool_size
+# authenticated sessions open, hands them to one sender at a time and drops
+# any session the server has closed, reconnecting on the next send.
+#
+# For local testing point it at a debugging server with TLS and login off:
+#   python -m aiosmtpd -n -l localhost:1025
+#   SMTP_SERVER=localhost SMTP_PORT=1025 SMTP_USE_TLS=false EMAIL_PASSWORD=
+
+import smtplib
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Transport failures after which a session cannot be reused. Other
+# SMTPExceptions (a rejected recipient, a refused message) leave the session
+# usable, so it goes back to the pool and the error propagates unretried.
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout)
+
+
+class _Session:
+    """An open SMTP connection plus the bookkeeping the pool needs"""
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages = 0
+
+
+class SMTPPool:
+    """Thread-safe pool of authenticated SMTP sessions
+
+    A send blocks until one of the pool_size sessions is free. Sessions idle
+    for more than idle_timeout seconds are checked with NOOP before reuse and
+    sessions are closed after max_messages to stay under provider limits.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True,
+                 pool_size=4, timeout=30, idle_timeout=60, max_messages=100):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+
+        self._connections_opened = 0
+        self._reconnects = 0
+        self._messages_sent = 0
+        self._failures = 0
+
+    def _open(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.use_tls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            self._close(smtp)
+            raise
+        with self._lock:
+            self._connections_opened += 1
+        return _Session(smtp)
+
+    @staticmethod
+    def _close(smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    def _is_alive(self, session):
+        if time.monotonic() - session.last_used < self.idle_timeout:
+            return True
+        try:
+            return session.smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                return self._open()
+            if self._is_alive(session):
+                return session
+            self._close(session.smtp)
+            with self._lock:
+                self._reconnects += 1
+
+    def _checkin(self, session):
+        session.last_used = time.monotonic()
+        if session.messages >= self.max_messages:
+            self._close(session.smtp)
+            return
+        with self._lock:
+            self._idle.append(session)
+
+    @contextmanager
+    def session(self):
+        """Borrow one session; it is discarded if the connection broke"""
+        self._slots.acquire()
+        try:
+            session = self._checkout()
+            try:
+                yield session
+            except _CONNECTION_ERRORS:
+                self._close(session.smtp)
+                raise
+            except Exception:
+                self._checkin(session)
+                raise
+            else:
+                self._checkin(session)
+        finally:
+            self._slots.release()
+
+    def _send_on(self, session, msg):
+        session.smtp.send_message(msg)
+        session.messages += 1
+        with self._lock:
+            self._messages_sent += 1
+
+    def send(self, msg, retries=1):
+        """Send one email.message.Message, reconnecting up to `retries` times"""
+        for attempt in range(retries + 1):
+            try:
+                with self.session() as session:
+                    self._send_on(session, msg)
+                return
+            except _CONNECTION_ERRORS:
+                if attempt == retries:
+                    with self._lock:
+                        self._failures += 1
+                    raise
+                with self._lock:
+                    self._reconnects += 1
+            except Exception:
+                with self._lock:
+                    self._failures += 1
+                raise
+
+    def close_all(self):
+        """Close every idle session; sessions in use are closed on return"""
+        with self._lock:
+            sessions, self._idle = list(self._idle), deque()
+        for session in sessions:
+            self._close(session.smtp)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pool_size': self.pool_size,
+                'idle': len(self._idle),
+                'connections_opened': self._connections_opened,
+                'reconnects': self._reconnects,
+                'messages_sent': self._messages_sent,
+                'failures': self._failures,
+            }
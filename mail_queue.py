@@ -0,0 +1,266 @@
+# Outbound mail job queue backed by the email_jobs table
+#
+# Routes enqueue a job inside their own DB transaction and return right away;
+# a pool of background threads claims due jobs with SELECT ... FOR UPDATE
+# SKIP LOCKED (so several app processes can share the table), delivers them
+# and records the outcome. Failed jobs are retried with exponential backoff
+# and moved to the 'dead' status after max_attempts.
+#
+# Job lifecycle: pending -> sending -> sent
+#                                   -> pending (retry) -> ... -> dead
+# A claimed job's next_attempt_at is pushed out by `lease` seconds, so a job
+# left in 'sending' by a crashed worker becomes due again after the lease.
+# Jobs of a claimed batch are delivered one after another, so before each
+# delivery a worker renews that job's lease once half of it has gone by. The
+# renewal only matches while the job's attempts count is still the one this
+# worker claimed, so a job whose lease ran out and was claimed elsewhere is
+# skipped rather than sent twice. The lease must be more than twice as long
+# as one delivery can take (SMTP timeout x reconnect attempts).
+
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+
+
+class MailQueue:
+    """Background delivery of queued emails
+
+    handlers maps a job kind to a function (recipient, payload) that sends
+    the email and raises on failure.
+    """
+
+    def __init__(self, get_connection, handlers, workers=2, poll_interval=2.0, batch_size=10,
+                 max_attempts=5, backoff_base=5, backoff_max=300, lease=300):
+        self.get_connection = get_connection
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._delivered = 0
+        self._retried = 0
+        self._dead = 0
+
+    def enqueue(self, cursor, kind, recipient, payload):
+        """Insert a job using the caller's cursor; call notify() after committing"""
+        cursor.execute("""
+            INSERT INTO email_jobs (kind, recipient, payload, status, max_attempts, next_attempt_at)
+            VALUES (%s, %s, %s, 'pending', %s, %s)
+        """, (kind, recipient, json.dumps(payload), self.max_attempts, datetime.now()))
+        return cursor.lastrowid
+
+    def notify(self):
+        """Wake the workers so a freshly committed job is sent without waiting for the next poll"""
+        self._wakeup.set()
+
+    def job_status(self, cursor, job_id, recipient):
+        """Return the public status of one job, or None if it does not belong to recipient"""
+        cursor.execute("""
+            SELECT status, attempts, max_attempts, next_attempt_at, sent_at
+            FROM email_jobs
+            WHERE id = %s AND recipient = %s
+        """, (job_id, recipient))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        status, attempts, max_attempts, next_attempt_at, sent_at = row
+        return {
+            'status': status,
+            'attempts': attempts,
+            'max_attempts': max_attempts,
+            'next_attempt_at': next_attempt_at.isoformat() if status == 'pending' and next_attempt_at else None,
+            'sent_at': sent_at.isoformat() if sent_at else None
+        }
+
+    def backoff(self, attempts):
+        """Seconds to wait before the next attempt, with jitter"""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _claim(self):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            now = datetime.now()
+            cursor.execute("""
+                SELECT id, kind, recipient, payload, attempts, max_attempts
+                FROM email_jobs
+                WHERE status IN ('pending', 'sending') AND next_attempt_at <= %s
+                ORDER BY next_attempt_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (now, self.batch_size))
+            jobs = cursor.fetchall()
+            if jobs:
+                ids = [job[0] for job in jobs]
+                placeholders = ', '.join(['%s'] * len(ids))
+                cursor.execute(f"""
+                    UPDATE email_jobs
+                    SET status = 'sending', attempts = attempts + 1, next_attempt_at = %s
+                    WHERE id IN ({placeholders})
+                """, (now + timedelta(seconds=self.lease), *ids))
+            conn.commit()
+            return jobs
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _renew(self, job_id, attempts):
+        """Extend a claimed job's lease; False if another worker has claimed it since"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "UPDATE email_jobs SET next_attempt_at = %s WHERE id = %s AND status = 'sending' AND attempts = %s",
+                (datetime.now() + timedelta(seconds=self.lease), job_id, attempts)
+            )
+            renewed = cursor.rowcount == 1
+            conn.commit()
+            return renewed
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _finish(self, job_id, attempts, status, next_attempt_at=None, error=None):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            # Only the worker holding the claim (same attempts count) records the outcome
+            if status == 'sent':
+                cursor.execute(
+                    "UPDATE email_jobs SET status = 'sent', sent_at = %s, last_error = NULL "
+                    "WHERE id = %s AND attempts = %s",
+                    (datetime.now(), job_id, attempts)
+                )
+            else:
+                cursor.execute(
+                    "UPDATE email_jobs SET status = %s, next_attempt_at = %s, last_error = %s "
+                    "WHERE id = %s AND attempts = %s",
+                    (status, next_attempt_at or datetime.now(), error, job_id, attempts)
+                )
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _deliver(self, job, claimed_at):
+        job_id, kind, recipient, payload, attempts, max_attempts = job
+        attempts += 1
+        if time.monotonic() - claimed_at > self.lease / 2 and not self._renew(job_id, attempts):
+            print(f"Email job {job_id} ({kind} to {recipient}) was claimed by another worker; skipping")
+            return
+        try:
+            handler = self.handlers[kind]
+            handler(recipient, json.loads(payload))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:1000]
+            if attempts >= max_attempts:
+                print(f"Email job {job_id} ({kind} to {recipient}) dead after {attempts} attempts: {error}")
+                self._finish(job_id, attempts, 'dead', error=error)
+                with self._lock:
+                    self._dead += 1
+            else:
+                retry_at = datetime.now() + timedelta(seconds=self.backoff(attempts))
+                self._finish(job_id, attempts, 'pending', next_attempt_at=retry_at, error=error)
+                with self._lock:
+                    self._retried += 1
+            return
+        self._finish(job_id, attempts, 'sent')
+        with self._lock:
+            self._delivered += 1
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                claimed_at = time.monotonic()
+                jobs = self._claim()
+                for job in jobs:
+                    self._deliver(job, claimed_at)
+            except Exception as e:
+                print(f"Error in mail queue worker: {e}")
+                jobs = []
+            if len(jobs) < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def start(self):
+        """Start the worker threads"""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"mail-queue-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=10):
+        """Ask the workers to exit after their current job"""
+        self._stopping.set()
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        self._threads = []
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': len(self._threads),
+                'delivered': self._delivered,
+                'retried': self._retried,
+                'dead': self._dead,
+            }
+
+
+def init_app(app, queue):
+    """Register the `flask mail-queue` maintenance commands"""
+
+    @app.cli.group('mail-queue')
+    def mail_queue():
+        """Inspect and manage the outbound email queue."""
+
+    @mail_queue.command('status')
+    def status_command():
+        """Show job counts by status."""
+        conn = queue.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT status, COUNT(*) FROM email_jobs GROUP BY status ORDER BY status")
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        for status, count in rows:
+            click.echo(f"{status:<8} {count}")
+
+    @mail_queue.command('retry')
+    @click.option('--job-id', type=int, default=None, help='Only requeue this job.')
+    def retry_command(job_id):
+        """Move dead jobs back to pending with a fresh set of attempts."""
+        conn = queue.get_connection()
+        cursor = conn.cursor()
+        try:
+            query = "UPDATE email_jobs SET status = 'pending', attempts = 0, next_attempt_at = %s WHERE status = 'dead'"
+            params = [datetime.now()]
+            if job_id is not None:
+                query += " AND id = %s"
+                params.append(job_id)
+            cursor.execute(query, params)
+            count = cursor.rowcount
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        click.echo(f"Requeued {count} jobs.")
@@ -0,0 +1,347 @@
+# In-process Prometheus metrics, served at /metrics
+#
+# Counters and histograms keep one value array per thread, so recording a
+# sample is a thread-local lookup and a few additions with no lock taken; a
+# scrape sums the arrays. Arrays of threads that have exited are folded into a
+# running total the next time a thread registers, so short-lived request
+# threads do not pile up.
+#
+# Process-wide instruments (requests, scheduled jobs, the monthly report
+# batch, SMTP sends) are module-level objects, like charts.chart_stats.
+# Pool, cache and queue figures are read from their stats() at scrape time.
+# /metrics is gated like the health endpoints (MONITORING_CONFIG).
+
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, current_app, g, request
+
+from extensions import internal_only
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+# Any other request method is counted as 'other'
+HTTP_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+
+class _ShardedValues:
+    """A fixed-size array of floats with one copy per thread, summed on read"""
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._shards = []
+        self._retired = [0.0] * size
+        self._lock = threading.Lock()
+
+    def local(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            return self._register()
+
+    def _register(self):
+        values = [0.0] * self.size
+        with self._lock:
+            live = []
+            for owner, shard in self._shards:
+                if owner.is_alive():
+                    live.append((owner, shard))
+                else:
+                    for i, value in enumerate(shard):
+                        self._retired[i] += value
+            live.append((threading.current_thread(), values))
+            self._shards = live
+        self._local.values = values
+        return values
+
+    def snapshot(self):
+        with self._lock:
+            total = list(self._retired)
+            for _, shard in self._shards:
+                for i, value in enumerate(shard):
+                    total[i] += value
+        return total
+
+
+class _CounterChild:
+    def __init__(self):
+        self._values = _ShardedValues(1)
+
+    def inc(self, amount=1):
+        self._values.local()[0] += amount
+
+    def samples(self, name, labels):
+        return [(name, labels, self._values.snapshot()[0])]
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket, then +Inf, sum and count
+        self._values = _ShardedValues(len(buckets) + 3)
+
+    def observe(self, value):
+        values = self._values.local()
+        values[bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def samples(self, name, labels):
+        values = self._values.snapshot()
+        samples = []
+        cumulative = 0.0
+        for bound, count in zip(self.buckets + (float('inf'),), values):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else _format(bound)
+            samples.append((f"{name}_bucket", labels + (('le', le),), cumulative))
+        samples.append((f"{name}_sum", labels, values[-2]))
+        samples.append((f"{name}_count", labels, values[-1]))
+        return samples
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _Metric:
+    """A metric family; labels(...) returns the child for one label combination"""
+
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        # Label values as passed (e.g. an int status) -> child, to skip str() on the hot path
+        self._lookup = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self._lookup.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in values), self._new_child())
+                self._lookup[values] = child
+        return child
+
+    def collect(self):
+        samples = []
+        for values, child in sorted(self._children.items()):
+            samples.extend(child.samples(self.name, tuple(zip(self.labelnames, values))))
+        return self.name, self.kind, self.help, samples
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+http_requests = Counter('http_requests_total', 'HTTP requests by endpoint and status',
+                        ('method', 'endpoint', 'status'))
+http_request_seconds = Histogram('http_request_duration_seconds', 'HTTP request latency by endpoint',
+                                 ('method', 'endpoint'))
+job_runs = Counter('scheduled_job_runs_total', 'Scheduled job runs by outcome', ('job', 'status'))
+job_seconds = Histogram('scheduled_job_duration_seconds', 'Scheduled job run time', ('job',),
+                        buckets=JOB_BUCKETS)
+report_run_seconds = Histogram('monthly_report_run_duration_seconds',
+                               'Duration of each monthly report batch invocation', buckets=JOB_BUCKETS)
+report_user_seconds = Histogram('monthly_report_user_seconds', 'Per-user monthly report time by stage',
+                                ('stage',))
+report_users = Counter('monthly_report_users_total', 'Monthly report deliveries by outcome', ('outcome',))
+smtp_sends = Counter('smtp_messages_total', 'Emails handed to SMTP by kind and outcome', ('kind', 'outcome'))
+smtp_send_seconds = Histogram('smtp_send_duration_seconds', 'Time to send one email', ('kind',))
+
+INSTRUMENTS = (http_requests, http_request_seconds, job_runs, job_seconds, report_run_seconds,
+               report_user_seconds, report_users, smtp_sends, smtp_send_seconds)
+
+
+def _format(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render(families):
+    """Prometheus text exposition of (name, kind, help, samples) families"""
+    lines = []
+    for name, kind, help, samples in families:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample_name, labels, value in samples:
+            if labels:
+                label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels)
+                lines.append(f"{sample_name}{{{label_text}}} {_format(value)}")
+            else:
+                lines.append(f"{sample_name} {_format(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def _family(name, kind, help, values):
+    """Family from {label tuple: value}, or a single unlabelled value"""
+    if not isinstance(values, dict):
+        values = {(): values}
+    return name, kind, help, [(name, labels, value) for labels, value in values.items()]
+
+
+def collect_app(app):
+    """Families read from the app's pool, caches, mail and scheduler stats"""
+    ext = app.extensions
+    families = []
+
+    pool = ext['db_pool'].stats()
+    families += [
+        _family('db_pool_connections', 'gauge', 'Open pooled connections by state', {
+            (('state', 'checked_out'),): pool['checked_out'],
+            (('state', 'idle'),): pool['idle'],
+        }),
+        _family('db_pool_size', 'gauge', 'Configured pool size', pool['pool_size']),
+        _family('db_pool_max_overflow', 'gauge', 'Configured overflow connections', pool['max_overflow']),
+        _family('db_pool_checkouts_total', 'counter', 'Connection checkouts', pool['checkouts']),
+        _family('db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a connection',
+                pool['wait_time_total']),
+        _family('db_pool_exhausted_total', 'counter', 'Checkouts that had to wait', pool['exhausted']),
+        _family('db_pool_timeouts_total', 'counter', 'Checkouts that timed out', pool['timeouts']),
+        _family('db_pool_connections_created_total', 'counter', 'Connections opened',
+                pool['connections_created']),
+    ]
+
+    query_stats = ext.get('query_stats')
+    if query_stats is not None and query_stats.enabled:
+        counts = query_stats.stats()
+        families += [
+            _family('db_queries_total', 'counter', 'SQL statements executed', counts['queries']),
+            _family('db_slow_queries_total', 'counter', 'Statements slower than the slow-query threshold',
+                    counts['slow_queries']),
+        ]
+
+    cache = ext.get('response_cache')
+    if cache is not None:
+        cache_stats = cache.stats()
+        endpoints = cache_stats['endpoints']
+        families += [
+            _family('response_cache_hits_total', 'counter', 'Read cache hits by endpoint',
+                    {(('endpoint', e),): s['hits'] for e, s in endpoints.items()}),
+            _family('response_cache_misses_total', 'counter', 'Read cache misses by endpoint',
+                    {(('endpoint', e),): s['misses'] for e, s in endpoints.items()}),
+            _family('http_not_modified_total', 'counter', 'Conditional GETs answered 304 by endpoint',
+                    {(('endpoint', e),): n for e, n in cache_stats['not_modified_endpoints'].items()}),
+        ]
+
+    report_cache = ext.get('report_cache')
+    if report_cache is not None:
+        report_stats = report_cache.stats()
+        families += [
+            _family('report_cache_hits_total', 'counter', 'Rendered PDF cache hits', report_stats['hits']),
+            _family('report_cache_misses_total', 'counter', 'Rendered PDF cache misses', report_stats['misses']),
+            _family('report_cache_bytes', 'gauge', 'Bytes of cached PDFs', report_stats['bytes']),
+        ]
+
+    mail_pool = ext.get('mail_pool')
+    if mail_pool is not None:
+        mail_stats = mail_pool.stats()
+        families += [
+            _family('smtp_pool_idle_sessions', 'gauge', 'Idle SMTP sessions', mail_stats['idle']),
+            _family('smtp_connections_opened_total', 'counter', 'SMTP sessions opened',
+                    mail_stats['connections_opened']),
+            _family('smtp_reconnects_total', 'counter', 'SMTP sessions reopened after an error',
+                    mail_stats['reconnects']),
+        ]
+
+    mail_queue = ext.get('mail_queue')
+    if mail_queue is not None:
+        queue_stats = mail_queue.stats()
+        families.append(_family('mail_queue_jobs_total', 'counter', 'Queued emails by outcome', {
+            (('outcome', outcome),): queue_stats[outcome] for outcome in ('delivered', 'retried', 'dead')
+        }))
+
+    scheduler = ext.get('scheduler')
+    if scheduler is not None:
+        families.append(_family('scheduler_is_leader', 'gauge', 'Whether this worker runs scheduled jobs',
+                                scheduler.is_leader))
+    return families
+
+
+def init_app(app):
+    """Time every request and serve /metrics"""
+
+    @app.before_request
+    def start_timer():
+        g._metrics_started = time.perf_counter()
+
+    def record(status):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return
+        # Unmatched URLs and unknown methods share one label each so arbitrary
+        # requests cannot add series
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        http_request_seconds.labels(method, endpoint).observe(time.perf_counter() - started)
+        http_requests.labels(method, endpoint, status).inc()
+
+    @app.after_request
+    def record_request(response):
+        record(response.status_code)
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exception=None):
+        # after_request is skipped when a view raises
+        record(500)
+
+    def metrics_view():
+        families = [metric.collect() for metric in INSTRUMENTS] + collect_app(current_app)
+        return Response(render(families), content_type=CONTENT_TYPE)
+
+    app.add_url_rule('/metrics', 'metrics', internal_only(metrics_view))
@@ -0,0 +1,29 @@
+# Period helpers that turn calendar periods into half-open date ranges
+#
+# Filtering with `transaction_date >= start AND transaction_date < end` lets
+# MySQL use the (user_id, type, transaction_date) indexes, whereas
+# MONTH()/YEAR() predicates force a scan of the user's whole history.
+
+from datetime import date
+
+
+def month_index(year, month):
+    """Months since year 0, matching `year * 12 + month` in rollup queries"""
+    return year * 12 + month
+
+
+def shift_month(year, month, offset):
+    """Return the (year, month) that is `offset` months away from the given one"""
+    index = year * 12 + (month - 1) + offset
+    return index // 12, index % 12 + 1
+
+
+def previous_month(year, month):
+    """Return the (year, month) before the given one"""
+    return shift_month(year, month, -1)
+
+
+def month_range(year, month):
+    """Return (start, end) dates covering one calendar month, end exclusive"""
+    next_year, next_month = shift_month(year, month, 1)
+    return date(year, month, 1), date(next_year, next_month, 1)
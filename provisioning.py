@@ -0,0 +1,102 @@
+# Default accounts and categories for new users
+#
+# complete_signup() creates the user and everything it starts with in one DB
+# transaction on one connection: one multi-row INSERT for the accounts and one
+# for the categories. What a new user gets comes from a template, the built-in
+# DEFAULT_TEMPLATE or a JSON file named by SIGNUP_TEMPLATE_FILE:
+#
+#   {"accounts": [{"name": "UPI", "type": "upi", "balance": 0}],
+#    "categories": {"income": ["Salary"], "expense": ["Food", "Rent"]}}
+
+import json
+
+ACCOUNT_TYPES = ('upi', 'card', 'cash', 'personal')
+CATEGORY_TYPES = ('income', 'expense')
+MAX_NAME_LENGTH = 50
+
+DEFAULT_TEMPLATE = {
+    'accounts': [
+        {'name': 'UPI', 'type': 'upi', 'balance': 0.00},
+        {'name': 'Card', 'type': 'card', 'balance': 0.00},
+        {'name': 'Cash', 'type': 'cash', 'balance': 0.00},
+    ],
+    'categories': {
+        'income': ['Home', 'Salary', 'Award', 'Lottery'],
+        'expense': ['Rent', 'Transport', 'Food', 'Shopping', 'Health', 'Others'],
+    },
+}
+
+
+class TemplateError(ValueError):
+    """Raised when a signup template is malformed"""
+
+
+def _name(value, what):
+    name = str(value or '').strip()
+    if not name or len(name) > MAX_NAME_LENGTH:
+        raise TemplateError(f"Invalid {what} name: {value!r}")
+    return name
+
+
+def compile_template(template):
+    """Validate a template and return (account rows, category rows) ready to insert"""
+    if not isinstance(template, dict):
+        raise TemplateError('Template must be an object')
+
+    accounts = []
+    for account in template.get('accounts', []):
+        if not isinstance(account, dict):
+            raise TemplateError(f"Invalid account: {account!r}")
+        account_type = account.get('type', 'personal')
+        if account_type not in ACCOUNT_TYPES:
+            raise TemplateError(f"Invalid account type: {account_type!r}")
+        try:
+            balance = round(float(account.get('balance', 0)), 2)
+        except (TypeError, ValueError):
+            raise TemplateError(f"Invalid balance: {account.get('balance')!r}")
+        accounts.append((_name(account.get('name'), 'account'), account_type, balance))
+
+    categories = []
+    category_groups = template.get('categories', {})
+    if not isinstance(category_groups, dict):
+        raise TemplateError('categories must map income/expense to lists of names')
+    for category_type, names in category_groups.items():
+        if category_type not in CATEGORY_TYPES:
+            raise TemplateError(f"Invalid category type: {category_type!r}")
+        categories.extend((_name(name, 'category'), category_type) for name in names)
+
+    return accounts, categories
+
+
+def load_template(path=None):
+    """Compiled DEFAULT_TEMPLATE, or the template in the JSON file at path"""
+    if not path:
+        return compile_template(DEFAULT_TEMPLATE)
+    with open(path, encoding='utf-8') as f:
+        try:
+            template = json.load(f)
+        except json.JSONDecodeError as e:
+            raise TemplateError(f"{path}: {e}")
+    return compile_template(template)
+
+
+def _values(row_count, row_placeholder):
+    return ', '.join([row_placeholder] * row_count)
+
+
+def provision_user(cursor, user_id, compiled):
+    """Insert a new user's default accounts and categories; the caller commits"""
+    accounts, categories = compiled
+    if accounts:
+        cursor.execute(
+            "INSERT INTO accounts (user_id, name, account_type, balance, opening_balance) VALUES "
+            + _values(len(accounts), '(%s, %s, %s, %s, %s)'),
+            tuple(value for name, account_type, balance in accounts
+                  for value in (user_id, name, account_type, balance, balance))
+        )
+    if categories:
+        cursor.execute(
+            "INSERT INTO categories (user_id, name, type, is_default) VALUES "
+            + _values(len(categories), '(%s, %s, %s, TRUE)'),
+            tuple(value for name, category_type in categories for value in (user_id, name, category_type))
+        )
@@ -0,0 +1,248 @@
+# Per-request SQL instrumentation and slow-query log
+#
+# When enabled, the connection pool hands out InstrumentedCursor wrappers that
+# time every execute() and count the rows fetched. Inside a request the numbers
+# add up in a RequestQueryStats on flask.g; after the request they are sent
+# back as a Server-Timing header and printed as one JSON log line with the
+# statement count, DB time, slowest statement and the most repeated statement
+# (a repeat count that grows with the data is an N+1 pattern).
+#
+# Statements slower than slow_query_ms, from requests and background threads
+# alike, go to a bounded in-memory slow-query log keyed by normalised SQL
+# (literals and parameters replaced by ?, IN lists and multi-row VALUES
+# collapsed), served at /api/health/slow-queries.
+
+import json
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+
+from flask import g, has_app_context, has_request_context, request
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+_IN_LIST = re.compile(r"\bIN \(\?(?:, \?)*\)", re.IGNORECASE)
+_VALUES_ROWS = re.compile(r"(\(\?(?:, (?:\?|\w+))*\))(?:, \(\?(?:, (?:\?|\w+))*\))+")
+_CASE_ARMS = re.compile(r"(WHEN \? THEN \?)(?: WHEN \? THEN \?)+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql):
+    """Statement text with literals and parameters replaced, for grouping"""
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    sql = _STRING.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_ROWS.sub(r'\1, ...', sql)
+    return _CASE_ARMS.sub(r'\1 ...', sql)
+
+
+class RequestQueryStats:
+    """Statement count, DB time, rows fetched and slowest statement of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.errors = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.slowest_time = 0.0
+        self.slowest_sql = None
+        self.by_statement = {}
+
+    def record(self, sql, seconds):
+        self.queries += 1
+        self.db_time += seconds
+        self.by_statement[sql] = self.by_statement.get(sql, 0) + 1
+        if seconds > self.slowest_time:
+            self.slowest_time = seconds
+            self.slowest_sql = sql
+
+    def most_repeated(self):
+        if not self.by_statement:
+            return None, 0
+        sql = max(self.by_statement, key=self.by_statement.get)
+        return sql, self.by_statement[sql]
+
+    def server_timing(self, total):
+        return (f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries", '
+                f'app;dur={total * 1000:.2f}')
+
+    def as_dict(self, total):
+        repeated_sql, repeated = self.most_repeated()
+        return {
+            'duration_ms': round(total * 1000, 2),
+            'queries': self.queries,
+            'query_errors': self.errors,
+            'db_ms': round(self.db_time * 1000, 2),
+            'rows': self.rows,
+            'slowest_ms': round(self.slowest_time * 1000, 2),
+            'slowest_sql': normalize_sql(self.slowest_sql) if self.slowest_sql else None,
+            'repeated': repeated,
+            'repeated_sql': normalize_sql(repeated_sql) if repeated > 1 else None,
+        }
+
+
+def _current_stats():
+    return g.get('_query_stats') if has_app_context() else None
+
+
+class InstrumentedCursor:
+    """DB-API cursor wrapper that reports every statement to a QueryInstrumentation"""
+
+    def __init__(self, cursor, instrumentation):
+        self._cursor = cursor
+        self._instrumentation = instrumentation
+        self._stats = _current_stats()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _timed(self, method, operation, params):
+        start = time.perf_counter()
+        try:
+            return method(operation, params)
+        except Exception:
+            if self._stats is not None:
+                self._stats.errors += 1
+            raise
+        finally:
+            self._instrumentation.record(operation, time.perf_counter() - start, self._stats)
+
+    def execute(self, operation, params=()):
+        return self._timed(self._cursor.execute, operation, params)
+
+    def executemany(self, operation, seq_params):
+        return self._timed(self._cursor.executemany, operation, seq_params)
+
+    def _fetched(self, count):
+        if self._stats is not None:
+            self._stats.rows += count
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._fetched(1)
+        return row
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._fetched(len(rows))
+        return rows
+
+    def fetchmany(self, size=1):
+        rows = self._cursor.fetchmany(size)
+        self._fetched(len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._fetched(1)
+            yield row
+
+    def close(self):
+        return self._cursor.close()
+
+
+class QueryInstrumentation:
+    """Wraps pool cursors and keeps the slow-query log"""
+
+    def __init__(self, enabled=True, log_requests=True, server_timing=True,
+                 slow_query_ms=100.0, slow_log_size=200):
+        self.enabled = enabled
+        self.log_requests = log_requests
+        self.server_timing = server_timing
+        self.slow_query_time = slow_query_ms / 1000
+        self._recent = deque(maxlen=slow_log_size)
+        self._by_statement = {}
+        self._lock = threading.Lock()
+        self._queries = 0
+        self._slow_queries = 0
+
+    def wrap(self, cursor):
+        return InstrumentedCursor(cursor, self)
+
+    def record(self, sql, seconds, stats=None):
+        if stats is not None:
+            stats.record(sql, seconds)
+        if seconds < self.slow_query_time:
+            with self._lock:
+                self._queries += 1
+            return
+        self._record_slow(sql, seconds)
+
+    def _record_slow(self, sql, seconds):
+        normalized = normalize_sql(sql)
+        entry = {
+            'sql': normalized,
+            'duration_ms': round(seconds * 1000, 2),
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'endpoint': request.endpoint if has_request_context() else None,
+            'thread': threading.current_thread().name,
+        }
+        with self._lock:
+            self._queries += 1
+            self._slow_queries += 1
+            self._recent.append(entry)
+            count, total, worst = self._by_statement.get(normalized, (0, 0.0, 0.0))
+            self._by_statement[normalized] = (count + 1, total + seconds, max(worst, seconds))
+        print(json.dumps({'event': 'slow_query', **entry}))
+
+    def stats(self):
+        with self._lock:
+            return {'queries': self._queries, 'slow_queries': self._slow_queries}
+
+    def slow_queries(self, limit=50):
+        """Most recent slow statements and the slowest statements by total time"""
+        with self._lock:
+            recent = list(self._recent)[-limit:]
+            grouped = sorted(self._by_statement.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+            return {
+                'threshold_ms': round(self.slow_query_time * 1000, 2),
+                'queries': self._queries,
+                'slow_queries': self._slow_queries,
+                'recent': recent[::-1],
+                'statements': [{
+                    'sql': sql,
+                    'count': count,
+                    'total_ms': round(total * 1000, 2),
+                    'max_ms': round(worst * 1000, 2),
+                } for sql, (count, total, worst) in grouped],
+            }
+
+
+def init_app(app, instrumentation, pool):
+    """Instrument the pool's cursors and report per-request stats"""
+    app.extensions['query_stats'] = instrumentation
+    if not instrumentation.enabled:
+        return
+    pool.cursor_wrapper = instrumentation.wrap
+
+    @app.before_request
+    def start_query_stats():
+        g._query_stats = RequestQueryStats()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.pop('_query_stats', None)
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats.started
+        if instrumentation.server_timing:
+            response.headers['Server-Timing'] = stats.server_timing(total)
+        if instrumentation.log_requests:
+            print(json.dumps({
+                'event': 'request',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                **stats.as_dict(total),
+            }))
+        return response
@@ -0,0 +1,552 @@
+# Staged pipeline for the monthly report emails
+#
+# fetch  - main thread pages through opted-in users and loads report data for
+#          a whole page with one rollup query
+# render - PDFs are built in a process pool (reportlab is CPU bound)
+# send   - emails go out from a bounded thread pool (SMTP is I/O bound)
+#
+# With a report_cache, users whose report fingerprint is already cached skip
+# the render stage and the PDF is sent from the cached file.
+#
+# At most max_in_flight users are between fetch and send at any time, which
+# keeps rendered PDFs from piling up in memory when SMTP is the bottleneck.
+#
+# Progress is checkpointed in the database. A month has one report_runs row
+# and one report_deliveries row per opted-in user, whose status moves
+# pending -> sending -> sent, or to failed (retried with backoff until
+# max_attempts) or skipped (no transactions). A run first seeds pending rows
+# for users past its checkpoint, then works through every row that is not
+# finished, so rerunning a month after a crash or a `limit` cut-off resumes
+# where it stopped and never re-sends a report recorded as sent.
+#
+# Due rows are claimed a page at a time (SELECT ... FOR UPDATE SKIP LOCKED,
+# then status 'sending', a claim token unique to the pass and next_attempt_at
+# pushed out by `lease` seconds), so a manual `flask reports send` and the
+# scheduled job, or two workers that both believe they lead, never render and
+# email the same users. Right before a user's email is queued the lease is
+# renewed under the token; if the claim expired and another run took the row,
+# the renewal matches nothing and this run drops the user. Outcomes are only
+# recorded while the token still matches. A claim left by a crashed run
+# becomes due again once it expires. A crash between an SMTP send and its
+# status update can still send that one report twice.
+
+import io
+import multiprocessing
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+
+import metrics
+from periods import previous_month
+from report_cache import fingerprints
+from report_data import fetch_users_monthly_reports
+
+
+def _render(username, month, year, report_data, prev_data):
+    """Process pool entry point; returns the PDF bytes and the render time"""
+    # Imported here so loading this module (and app) does not pull in reportlab
+    from report_pdf import render_monthly_report_pdf
+
+    start = time.perf_counter()
+    pdf = render_monthly_report_pdf(username, month, year, report_data, prev_data)
+    return pdf, time.perf_counter() - start
+
+
+class StageMetrics:
+    """Completed/failed counts and timings for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.completed = 0
+        self.failed = 0
+        self.items = 0
+        self.busy_time = 0.0
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+
+    def record(self, elapsed, ok=True, items=1):
+        now = time.monotonic()
+        if self.started_at is None:
+            self.started_at = now - elapsed
+        if ok:
+            self.completed += 1
+            self.items += items
+        else:
+            self.failed += 1
+        self.busy_time += elapsed
+        self.finished_at = now
+
+    def as_dict(self):
+        wall = (self.finished_at - self.started_at) if self.started_at and self.finished_at else 0.0
+        return {
+            'completed': self.completed,
+            'failed': self.failed,
+            'items': self.items,
+            'busy_seconds': round(self.busy_time, 3),
+            'wall_seconds': round(wall, 3),
+            'throughput_per_second': round(self.items / wall, 2) if wall else 0.0,
+        }
+
+
+class BatchSummary:
+    """Outcome of one invocation of a monthly report run"""
+
+    def __init__(self, year, month):
+        self.year = year
+        self.month = month
+        self.run_id = None
+        self.users = 0
+        self.sent = 0
+        self.skipped = 0
+        self.retried = 0
+        self.cached = 0
+        # user_id -> the user's latest failure; cleared when a retry succeeds
+        self.failures = {}
+        self.remaining = 0
+        self.completed = False
+        self.stages = {name: StageMetrics(name) for name in ('fetch', 'render', 'send')}
+        self.started_at = time.monotonic()
+        self.duration = 0.0
+
+    def as_dict(self):
+        return {
+            'year': self.year,
+            'month': self.month,
+            'run_id': self.run_id,
+            'users': self.users,
+            'sent': self.sent,
+            'skipped': self.skipped,
+            'retried': self.retried,
+            'cached': self.cached,
+            'failed': len(self.failures),
+            'failures': list(self.failures.values()),
+            'remaining': self.remaining,
+            'completed': self.completed,
+            'duration_seconds': round(self.duration, 3),
+            'stages': {name: stage.as_dict() for name, stage in self.stages.items()},
+        }
+
+    def format(self):
+        lines = [
+            f"Monthly reports for {self.year}-{self.month:02d} (run {self.run_id}): {self.users} users, "
+            f"{self.sent} sent, {self.skipped} skipped (no transactions), {self.cached} PDFs from cache, "
+            f"{self.retried} retries, {len(self.failures)} failed in {self.duration:.1f}s; "
+            + ("run complete" if self.completed else f"{self.remaining} users left to resume")
+        ]
+        for name, stage in self.stages.items():
+            d = stage.as_dict()
+            lines.append(
+                f"  {name:<6} {d['items']} done, {d['failed']} failed, "
+                f"{d['throughput_per_second']}/s, busy {d['busy_seconds']}s over {d['wall_seconds']}s"
+            )
+        for failure in self.failures.values():
+            lines.append(f"  failed user {failure['user_id']} at {failure['stage']} "
+                         f"(attempt {failure['attempts']}): {failure['error']}")
+        return '\n'.join(lines)
+
+
+class MonthlyReportBatch:
+    """Runs the fetch -> render -> send pipeline for one month, resumably
+
+    Failed users are retried with exponential backoff: within the same call
+    when the next retry is due within retry_wait seconds, otherwise by a
+    later call for the same month.
+    """
+
+    def __init__(self, get_connection, send_email, fetch_batch_size=500,
+                 render_workers=None, send_workers=8, max_in_flight=64, report_cache=None,
+                 max_attempts=3, backoff_base=30, backoff_max=3600, retry_wait=120, lease=900):
+        self.get_connection = get_connection
+        self.send_email = send_email
+        self.report_cache = report_cache
+        self.fetch_batch_size = fetch_batch_size
+        self.render_workers = os.cpu_count() if render_workers is None else render_workers
+        self.send_workers = send_workers
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_wait = retry_wait
+        self.lease = lease
+
+    def backoff(self, attempts):
+        """Seconds to wait before the next attempt, with jitter"""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _write(self, sql, params, many=False):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            if many:
+                cursor.executemany(sql, params)
+            else:
+                cursor.execute(sql, params)
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+            conn.close()
+
+    def start_run(self, year, month):
+        """Create or reopen the month's run; returns (run_id, checkpoint_user_id)"""
+        now = datetime.now()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO report_runs (year, month, status, started_at, updated_at, invocations)
+                VALUES (%s, %s, 'running', %s, %s, 1)
+                ON DUPLICATE KEY UPDATE status = 'running', updated_at = VALUES(updated_at),
+                    invocations = invocations + 1
+            """, (year, month, now, now))
+            cursor.execute("SELECT id, checkpoint_user_id FROM report_runs WHERE year = %s AND month = %s",
+                           (year, month))
+            run_id, checkpoint = cursor.fetchone()
+            conn.commit()
+            return run_id, checkpoint
+        finally:
+            cursor.close()
+            conn.close()
+
+    def seed(self, run_id, checkpoint):
+        """Add pending deliveries for opted-in users past the checkpoint, a page at a time"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        seeded = 0
+        try:
+            while True:
+                cursor.execute("""
+                    SELECT id FROM users
+                    WHERE email_notifications = TRUE AND id > %s
+                    ORDER BY id
+                    LIMIT %s
+                """, (checkpoint, self.fetch_batch_size))
+                user_ids = [row[0] for row in cursor.fetchall()]
+                if not user_ids:
+                    return seeded
+                cursor.executemany(
+                    "INSERT IGNORE INTO report_deliveries (run_id, user_id, status) VALUES (%s, %s, 'pending')",
+                    [(run_id, user_id) for user_id in user_ids]
+                )
+                checkpoint = user_ids[-1]
+                cursor.execute("UPDATE report_runs SET checkpoint_user_id = %s, updated_at = %s WHERE id = %s",
+                               (checkpoint, datetime.now(), run_id))
+                conn.commit()
+                seeded += len(user_ids)
+        finally:
+            cursor.close()
+            conn.close()
+
+    def iter_due(self, run_id, now, claim, limit=None):
+        """Claim unfinished deliveries under the claim token a page at a time and yield (cursor, users)
+
+        users are (user_id, username, email, attempts) tuples, each claimed
+        by this call; rows held by another run's live lease are skipped.
+        'rendered' only appears on rows left by runs that predate claiming.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        claimed = 0
+        try:
+            last_id = 0
+            while limit is None or claimed < limit:
+                page_size = self.fetch_batch_size if limit is None else min(self.fetch_batch_size, limit - claimed)
+                try:
+                    cursor.execute("""
+                        SELECT d.user_id, u.username, u.email, d.attempts
+                        FROM report_deliveries d
+                        JOIN users u ON u.id = d.user_id
+                        WHERE d.run_id = %s AND d.user_id > %s
+                        AND u.email_notifications = TRUE
+                        AND (d.status IN ('pending', 'rendered')
+                             OR (d.status IN ('failed', 'sending') AND d.next_attempt_at <= %s
+                                 AND (d.status = 'sending' OR d.attempts < %s)))
+                        ORDER BY d.user_id
+                        LIMIT %s
+                        FOR UPDATE OF d SKIP LOCKED
+                    """, (run_id, last_id, now, self.max_attempts, page_size))
+                    users = cursor.fetchall()
+                    if users:
+                        placeholders = ', '.join(['%s'] * len(users))
+                        cursor.execute(f"""
+                            UPDATE report_deliveries
+                            SET status = 'sending', claim = %s, next_attempt_at = %s
+                            WHERE run_id = %s AND user_id IN ({placeholders})
+                        """, (claim, datetime.now() + timedelta(seconds=self.lease), run_id, *[u[0] for u in users]))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                if not users:
+                    return
+                claimed += len(users)
+                yield cursor, users
+                last_id = users[-1][0]
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _read_cached(self, user_id, year, month, fp):
+        if fp is None:
+            return None
+        f = self.report_cache.open(user_id, year, month, fp)
+        if f is None:
+            return None
+        try:
+            with f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _process(self, run_id, year, month, summary, limit=None, retry_pass=False):
+        """One pass over the due deliveries; returns the number of users handled"""
+        lock = threading.Lock()
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        periods = [(year, month), previous_month(year, month)]
+        handled = 0
+        claim = uuid.uuid4().hex
+
+        if self.render_workers:
+            # Spawned, not forked: a fork would copy the parent's open DB and
+            # SMTP sockets and whatever locks its other threads hold
+            render_pool = ProcessPoolExecutor(max_workers=self.render_workers,
+                                              mp_context=multiprocessing.get_context('spawn'))
+        else:
+            # Render in a background thread instead of subprocesses
+            render_pool = ThreadPoolExecutor(max_workers=1)
+        send_pool = ThreadPoolExecutor(max_workers=self.send_workers)
+
+        def record_failure(user_id, email, attempts, stage, error):
+            attempts += 1
+            retry_at = datetime.now() + timedelta(seconds=self.backoff(attempts))
+            try:
+                self._write("""
+                    UPDATE report_deliveries
+                    SET status = 'failed', attempts = %s, next_attempt_at = %s, stage = %s, last_error = %s
+                    WHERE run_id = %s AND user_id = %s AND status = 'sending' AND claim = %s
+                """, (attempts, retry_at, stage, str(error)[:1000], run_id, user_id, claim))
+            except Exception as e:
+                print(f"Error recording report failure for user {user_id}: {e}")
+            with lock:
+                summary.failures[user_id] = {'user_id': user_id, 'email': email, 'stage': stage,
+                                             'attempts': attempts, 'error': str(error)}
+
+        def fail(user_id, email, attempts, stage, error):
+            with lock:
+                summary.stages[stage].record(0.0, ok=False)
+            metrics.report_users.labels('failed').inc()
+            record_failure(user_id, email, attempts, stage, error)
+            in_flight.release()
+
+        def sent(user_id, email, attempts, started, future):
+            elapsed = time.perf_counter() - started
+            try:
+                ok = future.result()
+                error = None if ok else 'send_email returned False'
+            except Exception as e:
+                ok, error = False, e
+            if not ok:
+                fail(user_id, email, attempts, 'send', error)
+                return
+            try:
+                self._write("""
+                    UPDATE report_deliveries
+                    SET status = 'sent', attempts = %s, sent_at = %s, last_error = NULL
+                    WHERE run_id = %s AND user_id = %s AND status = 'sending' AND claim = %s
+                """, (attempts + 1, datetime.now(), run_id, user_id, claim))
+            except Exception as e:
+                print(f"Error recording report delivery for user {user_id}: {e}")
+            with lock:
+                summary.stages['send'].record(elapsed)
+                summary.sent += 1
+                summary.failures.pop(user_id, None)
+            metrics.report_user_seconds.labels('send').observe(elapsed)
+            metrics.report_users.labels('sent').inc()
+            in_flight.release()
+
+        def renew(user_id, fp):
+            """Extend this pass's claim on a user; False if the claim was lost"""
+            try:
+                return self._write("""
+                    UPDATE report_deliveries SET next_attempt_at = %s, fingerprint = COALESCE(%s, fingerprint)
+                    WHERE run_id = %s AND user_id = %s AND status = 'sending' AND claim = %s
+                """, (datetime.now() + timedelta(seconds=self.lease), fp, run_id, user_id, claim)) == 1
+            except Exception as e:
+                print(f"Error renewing report claim for user {user_id}: {e}")
+                return False
+
+        def submit_send(user_id, username, email, attempts, report_data, pdf, fp):
+            if not renew(user_id, fp):
+                # Another run holds the row now (or it could not be renewed); leave it to that run
+                print(f"Report for user {user_id} is no longer claimed by this run; not sending")
+                in_flight.release()
+                return
+            with lock:
+                summary.stages['send'].start()
+            started = time.perf_counter()
+            send_future = send_pool.submit(self.send_email, email, username, report_data, io.BytesIO(pdf))
+            send_future.add_done_callback(partial(sent, user_id, email, attempts, started))
+
+        def rendered(user_id, username, email, attempts, report_data, fp, future):
+            try:
+                pdf, elapsed = future.result()
+            except Exception as e:
+                fail(user_id, email, attempts, 'render', e)
+                return
+            with lock:
+                summary.stages['render'].record(elapsed)
+            metrics.report_user_seconds.labels('render').observe(elapsed)
+            if fp is not None:
+                try:
+                    self.report_cache.put(user_id, year, month, fp, pdf)
+                except OSError as e:
+                    print(f"Error writing report cache: {e}")
+            submit_send(user_id, username, email, attempts, report_data, pdf, fp)
+
+        try:
+            for cursor, users in self.iter_due(run_id, datetime.now(), claim, limit):
+                handled += len(users)
+                if retry_pass:
+                    summary.retried += len(users)
+                else:
+                    summary.users += len(users)
+
+                started = time.perf_counter()
+                try:
+                    user_ids = [u[0] for u in users]
+                    reports = fetch_users_monthly_reports(cursor, user_ids, periods)
+                    fps = fingerprints(cursor, user_ids, year, month) if self.report_cache and self.report_cache.enabled else {}
+                except Exception as e:
+                    with lock:
+                        summary.stages['fetch'].record(time.perf_counter() - started, ok=False)
+                    for user_id, _, email, attempts in users:
+                        record_failure(user_id, email, attempts, 'fetch', e)
+                    continue
+                with lock:
+                    summary.stages['fetch'].record(time.perf_counter() - started, items=len(users))
+
+                skipped = []
+                for user_id, username, email, attempts in users:
+                    report_data = reports[user_id][periods[0]]
+                    prev_data = reports[user_id][periods[1]]
+                    if report_data['transaction_count'] == 0:
+                        skipped.append((run_id, user_id, claim))
+                        continue
+
+                    in_flight.acquire()
+                    fp = fps.get(user_id)
+                    cached = self._read_cached(user_id, year, month, fp)
+                    if cached is not None:
+                        summary.cached += 1
+                        submit_send(user_id, username, email, attempts, report_data, cached, fp)
+                        continue
+
+                    with lock:
+                        summary.stages['render'].start()
+                    future = render_pool.submit(_render, username, month, year, report_data, prev_data)
+                    future.add_done_callback(partial(rendered, user_id, username, email, attempts, report_data, fp))
+
+                if skipped:
+                    self._write("""
+                        UPDATE report_deliveries SET status = 'skipped'
+                        WHERE run_id = %s AND user_id = %s AND status = 'sending' AND claim = %s
+                    """, skipped, many=True)
+                    summary.skipped += len(skipped)
+        finally:
+            # Render callbacks have queued every send once the render pool is drained
+            render_pool.shutdown(wait=True)
+            send_pool.shutdown(wait=True)
+
+        return handled
+
+    def _progress(self, run_id):
+        """Update the run's totals; returns (remaining users, seconds until the next retry or None)"""
+        now = datetime.now()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT status, COUNT(*) FROM report_deliveries WHERE run_id = %s GROUP BY status",
+                (run_id,)
+            )
+            counts = dict(cursor.fetchall())
+
+            # Users who opted out mid-run are left as they are and do not hold the run open.
+            # Rows another run has claimed count as remaining until it finishes them.
+            cursor.execute("""
+                SELECT COUNT(*) FROM report_deliveries d
+                JOIN users u ON u.id = d.user_id
+                WHERE d.run_id = %s AND u.email_notifications = TRUE
+                AND (d.status IN ('pending', 'rendered', 'sending') OR (d.status = 'failed' AND d.attempts < %s))
+            """, (run_id, self.max_attempts))
+            remaining = cursor.fetchone()[0]
+
+            cursor.execute("""
+                SELECT d.next_attempt_at FROM report_deliveries d
+                JOIN users u ON u.id = d.user_id
+                WHERE d.run_id = %s AND u.email_notifications = TRUE
+                AND ((d.status = 'failed' AND d.attempts < %s) OR d.status = 'sending')
+                ORDER BY d.next_attempt_at
+                LIMIT 1
+            """, (run_id, self.max_attempts))
+            row = cursor.fetchone()
+            next_retry = row[0] if row else None
+
+            cursor.execute("""
+                UPDATE report_runs
+                SET status = %s, updated_at = %s, finished_at = %s,
+                    users = %s, sent = %s, failed = %s, skipped = %s
+                WHERE id = %s
+            """, ('completed' if remaining == 0 else 'running', now, now if remaining == 0 else None,
+                  sum(counts.values()), counts.get('sent', 0), counts.get('failed', 0),
+                  counts.get('skipped', 0), run_id))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+        wait = max(0.0, (next_retry - now).total_seconds()) if next_retry else None
+        return remaining, wait
+
+    def run(self, year, month, limit=None):
+        """Send the month's reports, resuming a previous run of the same month
+
+        limit caps how many users this call handles, so a large run can be
+        spread over several calls.
+        """
+        summary = BatchSummary(year, month)
+        try:
+            run_id, checkpoint = self.start_run(year, month)
+            summary.run_id = run_id
+            self.seed(run_id, checkpoint)
+
+            handled = self._process(run_id, year, month, summary, limit)
+            remaining, wait = self._progress(run_id)
+            while remaining and wait is not None and wait <= self.retry_wait:
+                if limit is not None and handled >= limit:
+                    break
+                time.sleep(wait)
+                retried = self._process(run_id, year, month, summary,
+                                        None if limit is None else limit - handled, retry_pass=True)
+                handled += retried
+                remaining, wait = self._progress(run_id)
+                if not retried:
+                    break
+
+            summary.remaining = remaining
+            summary.completed = remaining == 0
+        finally:
+            summary.duration = time.monotonic() - summary.started_at
+            metrics.report_run_seconds.observe(summary.duration)
+
+        return summary
@@ -0,0 +1,203 @@
+# Disk cache for rendered monthly report PDFs
+#
+# A report is stored under (user, year, month, fingerprint). The fingerprint
+# summarises the transactions the PDF is built from (the month itself and the
+# previous month it is compared with): count, max id, sum of amounts and sum
+# of category ids. Adding, deleting or re-categorising a transaction changes
+# it, so a stale PDF is never served and nothing has to be invalidated
+# explicitly. Closed past months keep their fingerprint and hit every time.
+#
+# The cache directory is bounded by max_bytes with least-recently-used
+# eviction. Several processes (web workers, report subprocesses) share the
+# directory, and each keeps its own LRU index of it, so a put() that takes
+# the index over max_bytes, or comes RESCAN_INTERVAL after the last rescan,
+# rebuilds the index from the files on disk (ordered by access time) and
+# evicts down to LOW_WATER of max_bytes. The headroom absorbs what other
+# processes write between rescans. A file another process wrote is found on
+# disk on a miss.
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from periods import month_range, previous_month
+
+# Bump when the PDF layout changes so old renders are not reused
+RENDER_VERSION = 2
+
+# Seconds between rescans of the directory, and the fraction of max_bytes a
+# rescan evicts down to
+RESCAN_INTERVAL = 5.0
+LOW_WATER = 0.9
+
+
+def fingerprints(cursor, user_ids, year, month):
+    """Return {user_id: fingerprint} for the transactions behind each user's report"""
+    if not user_ids:
+        return {}
+    start, _ = month_range(*previous_month(year, month))
+    _, end = month_range(year, month)
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    cursor.execute(f"""
+        SELECT user_id, COUNT(*), MAX(id), SUM(amount), SUM(category_id)
+        FROM transactions
+        WHERE user_id IN ({placeholders})
+        AND transaction_date >= %s AND transaction_date < %s
+        GROUP BY user_id
+    """, (*user_ids, start, end))
+    found = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    result = {}
+    for user_id in user_ids:
+        count, max_id, total, category_sum = found.get(user_id, (0, None, 0, None))
+        raw = f"v{RENDER_VERSION}:{count}:{max_id or 0}:{float(total or 0):.2f}:{category_sum or 0}"
+        result[user_id] = hashlib.sha1(raw.encode()).hexdigest()[:16]
+    return result
+
+
+def fingerprint(cursor, user_id, year, month):
+    return fingerprints(cursor, [user_id], year, month)[user_id]
+
+
+class ReportCache:
+    """Size-bounded LRU cache of PDF files in one directory"""
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, enabled=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._files = OrderedDict()
+        self._bytes = 0
+        self._scanned_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+            self._load()
+
+    def _load(self):
+        """Rebuild the index from the directory, least recently used first"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.pdf'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((max(stat.st_atime, stat.st_mtime), entry.name, stat.st_size))
+        self._files = OrderedDict()
+        self._bytes = 0
+        self._scanned_at = time.monotonic()
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self._bytes += size
+
+    @staticmethod
+    def _prefix(user_id, year, month):
+        return f"{user_id}-{year}-{month:02d}-"
+
+    def _name(self, user_id, year, month, fp):
+        return f"{self._prefix(user_id, year, month)}{fp}.pdf"
+
+    def open(self, user_id, year, month, fp):
+        """The cached PDF opened for reading, or None on a miss; the caller closes it
+
+        The file is opened under the lock, so an eviction by a concurrent put()
+        only unlinks it and the open handle still reads the whole PDF.
+        """
+        if not self.enabled:
+            return None
+        name = self._name(user_id, year, month, fp)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                self._forget(name)
+                self.misses += 1
+                return None
+            size = self._files.get(name)
+            if size is None:
+                # Written by another process
+                size = os.fstat(f.fileno()).st_size
+                self._files[name] = size
+                self._bytes += size
+            self._files.move_to_end(name)
+            self.hits += 1
+            self.bytes_saved += size
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return f
+
+    def put(self, user_id, year, month, fp, pdf_bytes):
+        """Store a rendered PDF and return its path"""
+        if not self.enabled:
+            return None
+        name = self._name(user_id, year, month, fp)
+        path = os.path.join(self.directory, name)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, path)
+
+        prefix = self._prefix(user_id, year, month)
+        evicted = []
+        with self._lock:
+            self._forget(name)
+            self._files[name] = len(pdf_bytes)
+            self._bytes += len(pdf_bytes)
+            rescan = self._bytes > self.max_bytes or time.monotonic() - self._scanned_at >= RESCAN_INTERVAL
+            if rescan:
+                # Other processes write here too, so evict against what is on disk
+                self._load()
+                self._forget(name)
+                self._files[name] = len(pdf_bytes)
+                self._bytes += len(pdf_bytes)
+            # Renders of the same report with an older fingerprint are dead weight
+            evicted.extend(n for n in self._files if n.startswith(prefix) and n != name)
+            for n in evicted:
+                self._forget(n)
+            # Evicting below the limit leaves room for other processes' writes until the next rescan
+            limit = self.max_bytes * LOW_WATER if rescan else self.max_bytes
+            while self._bytes > limit and len(self._files) > 1:
+                oldest = next(iter(self._files))
+                self._forget(oldest)
+                evicted.append(oldest)
+                self.evictions += 1
+
+        for n in evicted:
+            try:
+                os.remove(os.path.join(self.directory, n))
+            except FileNotFoundError:
+                pass
+        return path
+
+    def _forget(self, name):
+        size = self._files.pop(name, None)
+        if size is not None:
+            self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._files),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / requests, 4) if requests else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'evictions': self.evictions,
+            }
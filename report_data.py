@@ -0,0 +1,85 @@
+# Monthly report aggregation
+#
+# All monthly figures (totals, per-category breakdowns and counts) are derived
+# from the monthly_rollups table with one query, so a report for several
+# months costs one round trip and O(categories) rows.
+
+import calendar
+
+from periods import month_index
+
+
+def empty_report(year, month):
+    """Report data for a month without any transactions"""
+    return {
+        'total_income': 0.0,
+        'total_expense': 0.0,
+        'total_saving': 0.0,
+        'income_categories': [],
+        'expense_categories': [],
+        'transaction_count': 0,
+        'month_year': f"{calendar.month_name[month]} {year}"
+    }
+
+
+def build_reports(rows, periods):
+    """Fold (year, month, type, category_id, category_name, total, count) rows into report dicts"""
+    reports = {period: empty_report(*period) for period in periods}
+    categories = {period: {'income': [], 'expense': []} for period in periods}
+
+    for year, month, trans_type, category_id, category_name, total, count in rows:
+        period = (int(year), int(month))
+        report = reports.get(period)
+        if report is None:
+            continue
+
+        report['transaction_count'] += int(count)
+        if trans_type not in ('income', 'expense'):
+            continue
+
+        amount = float(total)
+        report[f'total_{trans_type}'] += amount
+        # Transactions without a (still existing) category only count towards totals
+        if category_name is not None:
+            categories[period][trans_type].append({'name': category_name, 'amount': amount})
+
+    for period, report in reports.items():
+        report['total_saving'] = report['total_income'] - report['total_expense']
+        for trans_type in ('income', 'expense'):
+            report[f'{trans_type}_categories'] = sorted(
+                categories[period][trans_type], key=lambda c: c['amount'], reverse=True
+            )
+
+    return reports
+
+
+def fetch_monthly_reports(cursor, user_id, periods):
+    """Return {(year, month): report data} for the given periods using a single query"""
+    return fetch_users_monthly_reports(cursor, [user_id], periods).get(user_id, {})
+
+
+def fetch_users_monthly_reports(cursor, user_ids, periods):
+    """Return {user_id: {(year, month): report data}} for several users using a single query"""
+    periods = sorted(set(periods))
+    if not periods or not user_ids:
+        return {}
+
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    cursor.execute(f"""
+        SELECT r.user_id, r.year, r.month, r.type, r.category_id, c.name, r.total, r.transaction_count
+        FROM monthly_rollups r
+        LEFT JOIN categories c ON r.category_id = c.id
+        WHERE r.user_id IN ({placeholders})
+        AND r.year * 12 + r.month BETWEEN %s AND %s
+    """, (*user_ids, month_index(*periods[0]), month_index(*periods[-1])))
+
+    rows_by_user = {user_id: [] for user_id in user_ids}
+    for row in cursor.fetchall():
+        rows_by_user[row[0]].append(row[1:])
+
+    return {user_id: build_reports(rows, periods) for user_id, rows in rows_by_user.items()}
+
+
+def fetch_monthly_report(cursor, user_id, year, month):
+    """Return report data for a single month"""
+    return fetch_monthly_reports(cursor, user_id, [(year, month)])[(year, month)]
@@ -0,0 +1,212 @@
+# PDF rendering for monthly financial reports
+#
+# Rendering only needs the report data, never the database, so it can run in
+# worker processes during the monthly batch. Paragraph styles, table styles
+# and page layout are built once per process by report_templates() and shared
+# by every report that process renders; only the flowables are per report.
+
+import calendar
+import io
+from functools import lru_cache
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.units import inch
+
+
+def _category_table_style(header_color, body_color, grid_color):
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(header_color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor(body_color)),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor(grid_color))
+    ])
+
+
+def build_templates():
+    """Build the styles and layout shared by all monthly reports"""
+    styles = getSampleStyleSheet()
+    return {
+        'page': {
+            'pagesize': A4,
+            'rightMargin': 72,
+            'leftMargin': 72,
+            'topMargin': 72,
+            'bottomMargin': 18
+        },
+        'normal': styles['Normal'],
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            spaceAfter=30,
+            alignment=1,  # Center alignment
+            textColor=colors.HexColor('#2563eb')
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=16,
+            spaceAfter=12,
+            textColor=colors.HexColor('#1e293b')
+        ),
+        'summary_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8fafc')),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0'))
+        ]),
+        'expense_table': _category_table_style('#ef4444', '#fef2f2', '#fecaca'),
+        'income_table': _category_table_style('#10b981', '#f0fdf4', '#bbf7d0'),
+        'summary_widths': [2*inch, 1.5*inch, 1.5*inch],
+        'category_widths': [2*inch, 1.5*inch, 1*inch],
+    }
+
+
+@lru_cache(maxsize=None)
+def report_templates():
+    """The per-process shared templates, built on first use"""
+    return build_templates()
+
+
+def render_monthly_report_pdf(username, month, year, report_data, prev_data, templates=None):
+    """Render the monthly report PDF and return its bytes"""
+    t = templates or report_templates()
+    month_name = calendar.month_name[month]
+    month_year = f"{month_name} {year}"
+
+    # Create PDF buffer
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, **t['page'])
+
+    # Container for the 'Flowable' objects
+    elements = []
+    title_style = t['title']
+    heading_style = t['heading']
+    normal_style = t['normal']
+
+    # Title
+    title = Paragraph(f"Monthly Financial Report<br/>{month_year}", title_style)
+    elements.append(title)
+    elements.append(Spacer(1, 20))
+
+    # User info
+    # The period rather than the render date, so a cached PDF reads the same whenever it is served
+    last_day = calendar.monthrange(year, month)[1]
+    user_info_text = f"<b>Report for:</b> {username}<br/><b>Period:</b> {month_name} 1 - {month_name} {last_day}, {year}"
+    elements.append(Paragraph(user_info_text, normal_style))
+    elements.append(Spacer(1, 30))
+
+    # Financial Summary
+    elements.append(Paragraph("Financial Summary", heading_style))
+
+    summary_data = [
+        ['Metric', 'Amount', 'Status'],
+        ['Total Income', f"₹{report_data['total_income']:,.2f}", '✓'],
+        ['Total Expenses', f"₹{report_data['total_expense']:,.2f}", '✓'],
+        ['Net Savings', f"₹{report_data['total_saving']:,.2f}", 
+         '✓ Positive' if report_data['total_saving'] >= 0 else '⚠ Negative']
+    ]
+
+    summary_table = Table(summary_data, colWidths=t['summary_widths'])
+    summary_table.setStyle(t['summary_table'])
+
+    elements.append(summary_table)
+    elements.append(Spacer(1, 30))
+
+    # Expense Categories
+    if report_data['expense_categories']:
+        elements.append(Paragraph("Expense Breakdown by Category", heading_style))
+
+        expense_data = [['Category', 'Amount', 'Percentage']]
+        for category in report_data['expense_categories']:
+            percentage = (category['amount'] / report_data['total_expense'] * 100) if report_data['total_expense'] > 0 else 0
+            expense_data.append([
+                category['name'],
+                f"₹{category['amount']:,.2f}",
+                f"{percentage:.1f}%"
+            ])
+
+        expense_table = Table(expense_data, colWidths=t['category_widths'])
+        expense_table.setStyle(t['expense_table'])
+
+        elements.append(expense_table)
+        elements.append(Spacer(1, 20))
+
+    # Income Categories
+    if report_data['income_categories']:
+        elements.append(Paragraph("Income Breakdown by Category", heading_style))
+
+        income_data = [['Category', 'Amount', 'Percentage']]
+        for category in report_data['income_categories']:
+            percentage = (category['amount'] / report_data['total_income'] * 100) if report_data['total_income'] > 0 else 0
+            income_data.append([
+                category['name'],
+                f"₹{category['amount']:,.2f}",
+                f"{percentage:.1f}%"
+            ])
+
+        income_table = Table(income_data, colWidths=t['category_widths'])
+        income_table.setStyle(t['income_table'])
+
+        elements.append(income_table)
+        elements.append(Spacer(1, 30))
+
+    # Financial Insights
+    elements.append(Paragraph("Financial Insights & Recommendations", heading_style))
+
+    insights = []
+
+    # Savings rate
+    if report_data['total_income'] > 0:
+        savings_rate = (report_data['total_saving'] / report_data['total_income']) * 100
+        if savings_rate >= 20:
+            insights.append(f"✅ Excellent! You saved {savings_rate:.1f}% of your income this month.")
+        elif savings_rate >= 10:
+            insights.append(f"👍 Good job! You saved {savings_rate:.1f}% of your income. Try to reach 20% for optimal savings.")
+        elif savings_rate > 0:
+            insights.append(f"⚠️ You saved {savings_rate:.1f}% of your income. Consider reducing expenses to increase savings.")
+        else:
+            insights.append(f"🚨 You spent more than you earned this month. Review your expenses and create a budget.")
+
+    # Top expense category
+    if report_data['expense_categories']:
+        top_expense = report_data['expense_categories'][0]
+        top_percentage = (top_expense['amount'] / report_data['total_expense'] * 100) if report_data['total_expense'] > 0 else 0
+        insights.append(f"📊 Your highest expense category is '{top_expense['name']}' at {top_percentage:.1f}% of total expenses.")
+
+    # Monthly comparison (if previous month data exists)
+    if prev_data['total_expense'] > 0:
+        expense_change = ((report_data['total_expense'] - prev_data['total_expense']) / prev_data['total_expense']) * 100
+        if expense_change > 10:
+            insights.append(f"📈 Your expenses increased by {expense_change:.1f}% compared to last month. Review your spending.")
+        elif expense_change < -10:
+            insights.append(f"📉 Great! Your expenses decreased by {abs(expense_change):.1f}% compared to last month.")
+
+    for insight in insights:
+        elements.append(Paragraph(f"• {insight}", normal_style))
+        elements.append(Spacer(1, 8))
+
+    elements.append(Spacer(1, 20))
+
+    # Footer
+    footer_text = f"""
+    <i>This report was automatically generated by Expense Tracker.<br/>
+    For questions or support, please contact us through the application.</i>
+    """
+    elements.append(Paragraph(footer_text, normal_style))
+
+    # Build PDF
+    doc.build(elements)
+    return buffer.getvalue()
+
@@ -0,0 +1,201 @@
+# Materialized monthly rollups
+#
+# monthly_rollups holds one row per (user_id, year, month, type, category_id)
+# with the summed amount and number of transactions. Write routes keep it up
+# to date inside their own DB transaction so reads cost O(categories) instead
+# of O(transactions). Transactions without a category use category_id 0.
+
+import click
+
+
+def add_transaction(cursor, transaction_id):
+    """Fold a freshly inserted transaction into its rollup row"""
+    cursor.execute("""
+        INSERT INTO monthly_rollups (user_id, year, month, type, category_id, total, transaction_count)
+        SELECT user_id, YEAR(transaction_date), MONTH(transaction_date), type,
+               COALESCE(category_id, 0), amount, 1
+        FROM transactions
+        WHERE id = %s
+        ON DUPLICATE KEY UPDATE total = monthly_rollups.total + VALUES(total),
+                                transaction_count = monthly_rollups.transaction_count + VALUES(transaction_count)
+    """, (transaction_id,))
+
+
+def remove_transaction(cursor, user_id, transaction_date, trans_type, category_id, amount):
+    """Take a transaction that is about to be deleted out of its rollup row"""
+    key = (user_id, transaction_date.year, transaction_date.month, trans_type, category_id or 0)
+    cursor.execute("""
+        UPDATE monthly_rollups
+        SET total = total - %s, transaction_count = transaction_count - 1
+        WHERE user_id = %s AND year = %s AND month = %s AND type = %s AND category_id = %s
+    """, (amount, *key))
+    cursor.execute("""
+        DELETE FROM monthly_rollups
+        WHERE user_id = %s AND year = %s AND month = %s AND type = %s AND category_id = %s
+        AND transaction_count <= 0
+    """, key)
+
+
+def add_totals(cursor, user_id, totals):
+    """Fold {(year, month, type, category_id): (total, count)} into the rollups with one statement"""
+    if not totals:
+        return
+    cursor.executemany("""
+        INSERT INTO monthly_rollups (user_id, year, month, type, category_id, total, transaction_count)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE total = monthly_rollups.total + VALUES(total),
+                                transaction_count = monthly_rollups.transaction_count + VALUES(transaction_count)
+    """, [(user_id, *key, round(total, 2), count) for key, (total, count) in sorted(totals.items())])
+
+
+def remove_account_transactions(cursor, user_id, account_id):
+    """Subtract the transactions an account deletion is about to cascade away"""
+    cursor.execute("""
+        UPDATE monthly_rollups r
+        JOIN (
+            SELECT YEAR(transaction_date) as year, MONTH(transaction_date) as month, type,
+                   COALESCE(category_id, 0) as category_id,
+                   SUM(amount) as total, COUNT(*) as transaction_count
+            FROM transactions
+            WHERE user_id = %s AND account_id = %s
+            GROUP BY YEAR(transaction_date), MONTH(transaction_date), type, COALESCE(category_id, 0)
+        ) d ON r.year = d.year AND r.month = d.month AND r.type = d.type AND r.category_id = d.category_id
+        SET r.total = r.total - d.total, r.transaction_count = r.transaction_count - d.transaction_count
+        WHERE r.user_id = %s
+    """, (user_id, account_id, user_id))
+    cursor.execute(
+        "DELETE FROM monthly_rollups WHERE user_id = %s AND transaction_count <= 0",
+        (user_id,)
+    )
+
+
+def uncategorize(cursor, user_id, category_id):
+    """Move a category's rollups to category 0 before the category is deleted
+
+    Deleting a category sets transactions.category_id to NULL, so its
+    amounts still count towards totals but no longer towards a category.
+    """
+    cursor.execute("""
+        INSERT INTO monthly_rollups (user_id, year, month, type, category_id, total, transaction_count)
+        SELECT * FROM (
+            SELECT user_id, year, month, type, 0 as category_id, total, transaction_count
+            FROM monthly_rollups
+            WHERE user_id = %s AND category_id = %s
+        ) moved
+        WHERE moved.transaction_count > 0
+        ON DUPLICATE KEY UPDATE total = monthly_rollups.total + VALUES(total),
+                                transaction_count = monthly_rollups.transaction_count + VALUES(transaction_count)
+    """, (user_id, category_id))
+    cursor.execute(
+        "DELETE FROM monthly_rollups WHERE user_id = %s AND category_id = %s",
+        (user_id, category_id)
+    )
+
+
+def rebuild(cursor, user_id=None):
+    """Recompute rollups from raw transactions, for one user or everybody"""
+    where, params = ("WHERE user_id = %s", (user_id,)) if user_id is not None else ("", ())
+    cursor.execute(f"DELETE FROM monthly_rollups {where}", params)
+    cursor.execute(f"""
+        INSERT INTO monthly_rollups (user_id, year, month, type, category_id, total, transaction_count)
+        SELECT user_id, YEAR(transaction_date), MONTH(transaction_date), type,
+               COALESCE(category_id, 0), SUM(amount), COUNT(*)
+        FROM transactions
+        {where}
+        GROUP BY user_id, YEAR(transaction_date), MONTH(transaction_date), type, COALESCE(category_id, 0)
+    """, params)
+    return cursor.rowcount
+
+
+def check_consistency(cursor, user_id=None):
+    """Compare rollups with raw transactions and return the rows that differ"""
+    where, params = ("WHERE user_id = %s", (user_id,)) if user_id is not None else ("", ())
+
+    cursor.execute(f"""
+        SELECT user_id, YEAR(transaction_date), MONTH(transaction_date), type,
+               COALESCE(category_id, 0), SUM(amount), COUNT(*)
+        FROM transactions
+        {where}
+        GROUP BY user_id, YEAR(transaction_date), MONTH(transaction_date), type, COALESCE(category_id, 0)
+    """, params)
+    expected = {tuple(row[:5]): (float(row[5]), int(row[6])) for row in cursor.fetchall()}
+
+    cursor.execute(f"""
+        SELECT user_id, year, month, type, category_id, total, transaction_count
+        FROM monthly_rollups
+        {where}
+    """, params)
+    actual = {tuple(row[:5]): (float(row[5]), int(row[6])) for row in cursor.fetchall()}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=str):
+        want = expected.get(key, (0.0, 0))
+        have = actual.get(key, (0.0, 0))
+        if abs(want[0] - have[0]) >= 0.005 or want[1] != have[1]:
+            user, year, month, trans_type, category_id = key
+            mismatches.append({
+                'user_id': user,
+                'year': year,
+                'month': month,
+                'type': trans_type,
+                'category_id': category_id,
+                'expected_total': want[0],
+                'expected_count': want[1],
+                'rollup_total': have[0],
+                'rollup_count': have[1],
+            })
+    return mismatches
+
+
+def init_app(app, get_connection):
+    """Register the `flask rollups` maintenance commands"""
+
+    @app.cli.group()
+    def rollups():
+        """Maintain the monthly_rollups table."""
+
+    @rollups.command('rebuild')
+    @click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+    def rebuild_command(user_id):
+        """Recompute rollups from the transactions table."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            rows = rebuild(cursor, user_id)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        click.echo(f"Rebuilt {rows} rollup rows.")
+
+    @rollups.command('check')
+    @click.option('--user-id', type=int, default=None, help='Only check this user.')
+    @click.option('--repair', is_flag=True, help='Rebuild the affected users.')
+    def check_command(user_id, repair):
+        """Report rollup rows that disagree with the transactions table."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            mismatches = check_consistency(cursor, user_id)
+            for m in mismatches:
+                click.echo(
+                    f"user {m['user_id']} {m['year']}-{m['month']:02d} {m['type']} "
+                    f"category {m['category_id']}: expected {m['expected_total']:.2f} "
+                    f"({m['expected_count']}), rollup {m['rollup_total']:.2f} ({m['rollup_count']})"
+                )
+            if mismatches and repair:
+                for affected in sorted({m['user_id'] for m in mismatches}):
+                    rebuild(cursor, affected)
+                conn.commit()
+                click.echo(f"Repaired {len({m['user_id'] for m in mismatches})} users.")
+        finally:
+            cursor.close()
+            conn.close()
+
+        if not mismatches:
+            click.echo("Rollups are consistent.")
+        elif not repair:
+            raise SystemExit(1)
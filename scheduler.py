@@ -0,0 +1,352 @@
+# Leader-elected job scheduler backed by the scheduled_jobs and job_runs tables
+#
+# Every worker process runs a LeaderScheduler thread, but only the one holding
+# the MySQL advisory lock (GET_LOCK) runs jobs. The lock belongs to a dedicated
+# unpooled connection, so when the leader's process dies MySQL drops the lock
+# with its session and another worker takes over on its next poll. Jobs run on
+# the polling thread and can take far longer than the server's wait_timeout,
+# so a heartbeat thread pings the lock's session every heartbeat_interval
+# seconds to keep it from being dropped as idle mid-job.
+#
+# Each job's next run time is stored in scheduled_jobs, so a run that fell due
+# while no leader was up still happens (once, however many were missed). The
+# leader claims a run by moving next_run_at forward with a conditional UPDATE,
+# so a run is executed once even if two workers briefly both hold leadership.
+# Every run is logged in job_runs with its start, end, duration and the counts
+# the job returns.
+
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+import click
+
+import metrics
+
+
+class ScheduledJob:
+    """A function run on an APScheduler trigger (e.g. CronTrigger)"""
+
+    def __init__(self, job_id, func, trigger, name=None):
+        self.id = job_id
+        self.func = func
+        self.trigger = trigger
+        self.name = name or job_id
+
+    def next_run(self, now):
+        """First fire time after now, as a naive local datetime"""
+        fire_time = self.trigger.get_next_fire_time(None, now.astimezone(self.trigger.timezone))
+        return fire_time.astimezone().replace(tzinfo=None) if fire_time else None
+
+
+def _run_counts(result):
+    """(users, succeeded, failed, summary JSON) from a job's return value"""
+    if result is None:
+        return None, None, None, None
+    summary = result.as_dict() if hasattr(result, 'as_dict') else dict(result)
+    # Per-user failure details are printed by the job; the log keeps the counts
+    summary.pop('failures', None)
+    return (summary.get('users'), summary.get('sent', summary.get('succeeded')),
+            summary.get('failed'), json.dumps(summary, default=str))
+
+
+class LeaderScheduler:
+    """Runs registered jobs in exactly one of the processes sharing a database
+
+    connect opens the unpooled connection that holds the leader lock;
+    get_connection checks out connections for the job tables.
+    """
+
+    def __init__(self, connect, get_connection, lock_name='expense_tracker:scheduler', poll_interval=30.0,
+                 heartbeat_interval=60.0):
+        self.connect = connect
+        self.get_connection = get_connection
+        self.lock_name = lock_name
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._jobs = {}
+        self._lock_conn = None
+        self._synced = False
+        self._stopping = threading.Event()
+        self._thread = None
+        self._heartbeat_thread = None
+        self._lock = threading.Lock()
+        # The lock's connection is shared by the polling and heartbeat threads
+        self._session_lock = threading.RLock()
+        self._elections_won = 0
+        self._runs = 0
+        self._failed_runs = 0
+        self._last_poll = None
+
+    def add_job(self, job_id, func, trigger, name=None):
+        self._jobs[job_id] = ScheduledJob(job_id, func, trigger, name)
+        self._synced = False
+
+    @property
+    def is_leader(self):
+        return self._lock_conn is not None
+
+    def _acquire(self):
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (self.lock_name,))
+            acquired = cursor.fetchone()[0] == 1
+            cursor.close()
+        except Exception:
+            conn.close()
+            raise
+        if not acquired:
+            conn.close()
+            return False
+        self._lock_conn = conn
+        self._synced = False
+        with self._lock:
+            self._elections_won += 1
+        print(f"Scheduler: {self.worker} is now the leader")
+        return True
+
+    def _still_leader(self):
+        """Check the lock's session is alive; a dead session has already lost the lock"""
+        with self._session_lock:
+            if self._lock_conn is None:
+                return False
+            try:
+                cursor = self._lock_conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+                return True
+            except Exception as e:
+                print(f"Scheduler: {self.worker} lost leadership: {e}")
+                self._resign()
+                return False
+
+    def _resign(self):
+        with self._session_lock:
+            conn, self._lock_conn = self._lock_conn, None
+        if conn is None:
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (self.lock_name,))
+            cursor.fetchall()
+            cursor.close()
+        except Exception:
+            pass
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def ensure_leader(self):
+        """Try to become leader if nobody is; return whether this process leads"""
+        if self._lock_conn is not None:
+            return self._still_leader()
+        return self._acquire()
+
+    def _sync_jobs(self, cursor, now):
+        """Insert rows for new jobs and reschedule jobs whose trigger changed"""
+        for job in self._jobs.values():
+            cursor.execute("""
+                INSERT INTO scheduled_jobs (id, name, schedule, next_run_at)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    next_run_at = CASE WHEN schedule = VALUES(schedule) THEN next_run_at ELSE VALUES(next_run_at) END,
+                    name = VALUES(name),
+                    schedule = VALUES(schedule)
+            """, (job.id, job.name, str(job.trigger), job.next_run(now)))
+
+    def run_pending(self, now=None):
+        """Claim and run every due job; only call this while leader"""
+        now = now or datetime.now()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        claimed = []
+        try:
+            if not self._synced:
+                self._sync_jobs(cursor, now)
+                self._synced = True
+            cursor.execute(
+                "SELECT id, next_run_at FROM scheduled_jobs WHERE next_run_at <= %s ORDER BY next_run_at",
+                (now,)
+            )
+            for job_id, scheduled_for in cursor.fetchall():
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                # Missed runs collapse into this one; the next run is computed from now
+                cursor.execute(
+                    "UPDATE scheduled_jobs SET next_run_at = %s, last_run_at = %s WHERE id = %s AND next_run_at = %s",
+                    (job.next_run(now), now, job_id, scheduled_for)
+                )
+                if cursor.rowcount == 1:
+                    claimed.append((job, scheduled_for))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+        return [self._execute(job, scheduled_for) for job, scheduled_for in claimed]
+
+    def _log(self, sql, params):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            conn.commit()
+            return cursor.lastrowid
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _execute(self, job, scheduled_for):
+        started_at = datetime.now()
+        run_id = self._log("""
+            INSERT INTO job_runs (job_id, scheduled_for, worker, status, started_at)
+            VALUES (%s, %s, %s, 'running', %s)
+        """, (job.id, scheduled_for, self.worker, started_at))
+
+        start = time.perf_counter()
+        status, error, counts = 'succeeded', None, (None, None, None, None)
+        try:
+            counts = _run_counts(job.func())
+        except Exception as e:
+            status, error = 'failed', f"{type(e).__name__}: {e}"[:1000]
+            print(f"Error in scheduled job {job.id}: {error}")
+        elapsed = time.perf_counter() - start
+        duration_ms = int(elapsed * 1000)
+        metrics.job_seconds.labels(job.id).observe(elapsed)
+        metrics.job_runs.labels(job.id, status).inc()
+
+        self._log("""
+            UPDATE job_runs
+            SET status = %s, finished_at = %s, duration_ms = %s,
+                users = %s, succeeded = %s, failed = %s, summary = %s, error = %s
+            WHERE id = %s
+        """, (status, datetime.now(), duration_ms, *counts, error, run_id))
+        with self._lock:
+            self._runs += 1
+            if status == 'failed':
+                self._failed_runs += 1
+        return run_id
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                if self.ensure_leader():
+                    self.run_pending()
+            except Exception as e:
+                print(f"Error in scheduler: {e}")
+            self._last_poll = datetime.now()
+            self._stopping.wait(self.poll_interval)
+        self._resign()
+
+    def _heartbeat(self):
+        while not self._stopping.wait(self.heartbeat_interval):
+            if self._lock_conn is not None:
+                self._still_leader()
+
+    def start(self):
+        """Start the election and polling thread and the lock heartbeat"""
+        self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+        self._thread.start()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name='scheduler-heartbeat', daemon=True)
+        self._heartbeat_thread.start()
+
+    def stop(self, timeout=10):
+        """Stop polling and give up leadership so another worker can take over"""
+        self._stopping.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(timeout)
+            self._heartbeat_thread = None
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        else:
+            self._resign()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'worker': self.worker,
+                'is_leader': self.is_leader,
+                'jobs': sorted(self._jobs),
+                'elections_won': self._elections_won,
+                'runs': self._runs,
+                'failed_runs': self._failed_runs,
+                'last_poll': self._last_poll.isoformat() if self._last_poll else None,
+            }
+
+
+def init_app(app, scheduler):
+    """Register the `flask scheduler` maintenance commands"""
+
+    @app.cli.group('scheduler')
+    def scheduler_group():
+        """Inspect scheduled jobs and their run log."""
+
+    @scheduler_group.command('status')
+    def status_command():
+        """Show each job's next and last run."""
+        conn = scheduler.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id, next_run_at, last_run_at FROM scheduled_jobs ORDER BY id")
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        for job_id, next_run_at, last_run_at in rows:
+            click.echo(f"{job_id:<24} next {next_run_at or '-'}   last {last_run_at or '-'}")
+
+    @scheduler_group.command('runs')
+    @click.option('--job-id', default=None, help='Only show this job.')
+    @click.option('--limit', type=int, default=20, show_default=True)
+    def runs_command(job_id, limit):
+        """Show the most recent runs."""
+        conn = scheduler.get_connection()
+        cursor = conn.cursor()
+        try:
+            where, params = ("WHERE job_id = %s", [job_id]) if job_id else ("", [])
+            cursor.execute(f"""
+                SELECT id, job_id, worker, status, started_at, duration_ms, users, succeeded, failed, error
+                FROM job_runs {where}
+                ORDER BY started_at DESC, id DESC
+                LIMIT %s
+            """, (*params, limit))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        for run_id, job, worker, status, started_at, duration_ms, users, succeeded, failed, error in rows:
+            counts = f"users {users} ok {succeeded} failed {failed}" if users is not None else ""
+            duration = f"{duration_ms} ms" if duration_ms is not None else "-"
+            click.echo(f"#{run_id} {job} {status:<9} {started_at} {duration:>10} on {worker} {counts}")
+            if error:
+                click.echo(f"    {error}")
+
+    @scheduler_group.command('run')
+    @click.argument('job_id')
+    def run_command(job_id):
+        """Make a job due now; the leader runs it on its next poll."""
+        conn = scheduler.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UPDATE scheduled_jobs SET next_run_at = %s WHERE id = %s", (datetime.now(), job_id))
+            updated = cursor.rowcount
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        if not updated:
+            raise click.ClickException(f"Unknown job: {job_id}")
+        click.echo(f"{job_id} is due; the leader runs it within {scheduler.poll_interval:g}s.")
@@ -0,0 +1,47 @@
+-- MySQL Migration Script for the account balance ledger
+-- Run this script in MySQL Workbench
+
+-- accounts.balance is now a cached total: opening_balance plus the effect of
+-- the account's transactions (see ledger.py). Existing accounts get the
+-- opening balance that makes their current balance consistent.
+--
+-- The column is added as NULL and only NULL rows are backfilled, so running
+-- the script again never recomputes opening balances from balances that may
+-- have drifted since (that drift is what `flask ledger reconcile` reports).
+SET @sql = (SELECT IF(
+    (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE()
+     AND TABLE_NAME = 'accounts'
+     AND COLUMN_NAME = 'opening_balance') = 0,
+    'ALTER TABLE accounts ADD COLUMN opening_balance DECIMAL(10,2) NULL AFTER balance',
+    'SELECT "Column opening_balance already exists" as message'
+));
+
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Backfill: opening balance = current balance - net effect of transactions
+UPDATE accounts a
+LEFT JOIN (
+    SELECT account_id, SUM(delta) as net
+    FROM (
+        SELECT account_id, CASE WHEN type = 'income' THEN amount ELSE -amount END as delta
+        FROM transactions
+        UNION ALL
+        SELECT to_account_id, amount
+        FROM transactions
+        WHERE type = 'transfer' AND to_account_id IS NOT NULL
+    ) e
+    GROUP BY account_id
+) n ON n.account_id = a.id
+SET a.opening_balance = COALESCE(a.balance, 0) - COALESCE(n.net, 0)
+WHERE a.opening_balance IS NULL;
+
+ALTER TABLE accounts MODIFY opening_balance DECIMAL(10,2) NOT NULL DEFAULT 0.00;
+
+-- Show the updated table structure
+DESCRIBE accounts;
+
+-- Display success message
+SELECT 'Migration completed successfully! opening_balance column added to accounts table.' as status;
@@ -0,0 +1,23 @@
+-- MySQL Migration Script for the email_jobs outbound mail queue
+-- Run this script in MySQL Workbench
+
+-- One row per queued email. Workers claim due rows with FOR UPDATE SKIP
+-- LOCKED (MySQL 8.0+); next_attempt_at doubles as the claim lease while a
+-- row is 'sending'. Rows that run out of attempts stay as 'dead'.
+CREATE TABLE IF NOT EXISTS email_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(30) NOT NULL,
+    recipient VARCHAR(100) NOT NULL,
+    payload TEXT NOT NULL,
+    status ENUM('pending', 'sending', 'sent', 'dead') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    next_attempt_at DATETIME NOT NULL,
+    last_error TEXT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at DATETIME NULL,
+    INDEX idx_email_jobs_status_next (status, next_attempt_at)
+);
+
+-- Display success message
+SELECT 'Migration completed successfully! email_jobs table created.' as status;
@@ -0,0 +1,33 @@
+-- MySQL Migration Script for the monthly_rollups table
+-- Run this script in MySQL Workbench
+
+-- One row per user, month, transaction type and category with the summed
+-- amount and number of transactions. category_id 0 means "no category".
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    user_id INT NOT NULL,
+    year INT NOT NULL,
+    month INT NOT NULL,
+    type ENUM('income', 'expense', 'transfer') NOT NULL,
+    category_id INT NOT NULL DEFAULT 0,
+    total DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    transaction_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, year, month, type, category_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Backfill from existing transactions (same as `flask --app app rollups rebuild`)
+DELETE FROM monthly_rollups;
+
+INSERT INTO monthly_rollups (user_id, year, month, type, category_id, total, transaction_count)
+SELECT user_id, YEAR(transaction_date), MONTH(transaction_date), type,
+       COALESCE(category_id, 0), SUM(amount), COUNT(*)
+FROM transactions
+GROUP BY user_id, YEAR(transaction_date), MONTH(transaction_date), type, COALESCE(category_id, 0);
+
+-- Verify the backfill
+SELECT
+    (SELECT COUNT(*) FROM transactions) as transactions,
+    (SELECT COALESCE(SUM(transaction_count), 0) FROM monthly_rollups) as rolled_up_transactions;
+
+-- Display success message
+SELECT 'Migration completed successfully! monthly_rollups table created and backfilled.' as status;
@@ -0,0 +1,13 @@
+-- MySQL Migration Script for claimed monthly report deliveries
+-- Run this script in MySQL Workbench
+
+-- A run claims due deliveries by moving them to 'sending' with its claim
+-- token and next_attempt_at as the lease expiry, so overlapping runs of the
+-- same month never email a user twice. 'rendered' stays for rows left by
+-- older runs.
+ALTER TABLE report_deliveries
+    MODIFY status ENUM('pending', 'sending', 'rendered', 'sent', 'failed', 'skipped') NOT NULL DEFAULT 'pending',
+    ADD COLUMN claim VARCHAR(32) NULL AFTER status;
+
+-- Display success message
+SELECT 'Migration completed successfully! report_deliveries can now be claimed.' as status;
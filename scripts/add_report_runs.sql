@@ -0,0 +1,40 @@
+-- MySQL Migration Script for resumable monthly report runs
+-- Run this script in MySQL Workbench
+
+-- One run per month. checkpoint_user_id is the last user id for which a
+-- delivery row has been created, so a resumed run only scans newer users.
+CREATE TABLE IF NOT EXISTS report_runs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    year INT NOT NULL,
+    month INT NOT NULL,
+    status ENUM('running', 'completed') NOT NULL DEFAULT 'running',
+    checkpoint_user_id INT NOT NULL DEFAULT 0,
+    invocations INT NOT NULL DEFAULT 0,
+    started_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    finished_at DATETIME NULL,
+    users INT NULL,
+    sent INT NULL,
+    failed INT NULL,
+    skipped INT NULL,
+    UNIQUE KEY uniq_report_runs_period (year, month)
+);
+
+-- One row per user and run: pending -> rendered -> sent, or failed / skipped
+CREATE TABLE IF NOT EXISTS report_deliveries (
+    run_id INT NOT NULL,
+    user_id INT NOT NULL,
+    status ENUM('pending', 'rendered', 'sent', 'failed', 'skipped') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at DATETIME NULL,
+    fingerprint VARCHAR(16) NULL,
+    stage VARCHAR(10) NULL,
+    last_error TEXT NULL,
+    sent_at DATETIME NULL,
+    PRIMARY KEY (run_id, user_id),
+    FOREIGN KEY (run_id) REFERENCES report_runs(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Display success message
+SELECT 'Migration completed successfully! report_runs and report_deliveries tables created.' as status;
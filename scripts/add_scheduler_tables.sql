@@ -0,0 +1,34 @@
+-- MySQL Migration Script for the leader-elected job scheduler
+-- Run this script in MySQL Workbench
+
+-- One row per scheduled job. The leader claims a due run by moving
+-- next_run_at forward with a conditional UPDATE, so each run happens once
+-- even if two workers briefly both believe they are leader.
+CREATE TABLE IF NOT EXISTS scheduled_jobs (
+    id VARCHAR(64) PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    schedule VARCHAR(200) NOT NULL,
+    next_run_at DATETIME NULL,
+    last_run_at DATETIME NULL
+);
+
+-- Run log: one row per executed run with its timing and counts
+CREATE TABLE IF NOT EXISTS job_runs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    job_id VARCHAR(64) NOT NULL,
+    scheduled_for DATETIME NOT NULL,
+    worker VARCHAR(100) NOT NULL,
+    status ENUM('running', 'succeeded', 'failed') NOT NULL DEFAULT 'running',
+    started_at DATETIME NOT NULL,
+    finished_at DATETIME NULL,
+    duration_ms INT NULL,
+    users INT NULL,
+    succeeded INT NULL,
+    failed INT NULL,
+    summary TEXT NULL,
+    error TEXT NULL,
+    INDEX idx_job_runs_job_started (job_id, started_at)
+);
+
+-- Display success message
+SELECT 'Migration completed successfully! scheduled_jobs and job_runs tables created.' as status;
@@ -0,0 +1,62 @@
+-- MySQL Migration Script for date-range filtering on transactions
+-- Run this script in MySQL Workbench
+
+-- Monthly queries filter on transaction_date >= start AND transaction_date < end,
+-- which these composite indexes serve without scanning a user's whole history.
+
+-- Dashboard totals, analysis overviews and monthly reports: (user_id, type, date range)
+SET @index_exists := (
+    SELECT COUNT(*)
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'transactions'
+      AND index_name = 'idx_transactions_user_type_date'
+);
+
+SET @stmt := IF(@index_exists = 0,
+    'CREATE INDEX idx_transactions_user_type_date ON transactions(user_id, type, transaction_date)',
+    'SELECT "Index idx_transactions_user_type_date already exists"');
+
+PREPARE run_stmt FROM @stmt;
+EXECUTE run_stmt;
+DEALLOCATE PREPARE run_stmt;
+
+-- Transaction counts and the list of months with transactions: (user_id, date range)
+SET @index_exists := (
+    SELECT COUNT(*)
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'transactions'
+      AND index_name = 'idx_transactions_user_date'
+);
+
+SET @stmt := IF(@index_exists = 0,
+    'CREATE INDEX idx_transactions_user_date ON transactions(user_id, transaction_date)',
+    'SELECT "Index idx_transactions_user_date already exists"');
+
+PREPARE run_stmt FROM @stmt;
+EXECUTE run_stmt;
+DEALLOCATE PREPARE run_stmt;
+
+-- Budget spending per category: (user_id, category_id, type, date range)
+SET @index_exists := (
+    SELECT COUNT(*)
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'transactions'
+      AND index_name = 'idx_transactions_user_category_type_date'
+);
+
+SET @stmt := IF(@index_exists = 0,
+    'CREATE INDEX idx_transactions_user_category_type_date ON transactions(user_id, category_id, type, transaction_date)',
+    'SELECT "Index idx_transactions_user_category_type_date already exists"');
+
+PREPARE run_stmt FROM @stmt;
+EXECUTE run_stmt;
+DEALLOCATE PREPARE run_stmt;
+
+-- Show the indexes on the transactions table
+SHOW INDEX FROM transactions;
+
+-- Display success message
+SELECT 'Migration completed successfully! Date-range indexes added to transactions table.' as status;
@@ -0,0 +1,65 @@
+-- MySQL Migration Script for the filtered transaction listing
+-- Run this script in MySQL Workbench
+
+-- /api/transactions filtered by type or category pages through
+-- (transaction_date, created_at, id) newest first. These indexes put that
+-- order right after the filter column so a filtered page is a range scan
+-- with no filesort.
+
+-- Type filter. Supersedes idx_transactions_user_type_date, whose columns are
+-- its prefix, so the monthly range queries keep using it.
+SET @index_exists := (
+    SELECT COUNT(*)
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'transactions'
+      AND index_name = 'idx_transactions_user_type_date_created_id'
+);
+
+SET @stmt := IF(@index_exists = 0,
+    'CREATE INDEX idx_transactions_user_type_date_created_id ON transactions(user_id, type, transaction_date, created_at, id)',
+    'SELECT "Index idx_transactions_user_type_date_created_id already exists"');
+
+PREPARE run_stmt FROM @stmt;
+EXECUTE run_stmt;
+DEALLOCATE PREPARE run_stmt;
+
+SET @index_exists := (
+    SELECT COUNT(*)
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'transactions'
+      AND index_name = 'idx_transactions_user_type_date'
+);
+
+SET @stmt := IF(@index_exists = 1,
+    'DROP INDEX idx_transactions_user_type_date ON transactions',
+    'SELECT "Index idx_transactions_user_type_date already dropped"');
+
+PREPARE run_stmt FROM @stmt;
+EXECUTE run_stmt;
+DEALLOCATE PREPARE run_stmt;
+
+-- Category filter. idx_transactions_user_category_type_date stays for the
+-- per-category monthly totals, which group by type.
+SET @index_exists := (
+    SELECT COUNT(*)
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'transactions'
+      AND index_name = 'idx_transactions_user_category_date_created_id'
+);
+
+SET @stmt := IF(@index_exists = 0,
+    'CREATE INDEX idx_transactions_user_category_date_created_id ON transactions(user_id, category_id, transaction_date, created_at, id)',
+    'SELECT "Index idx_transactions_user_category_date_created_id already exists"');
+
+PREPARE run_stmt FROM @stmt;
+EXECUTE run_stmt;
+DEALLOCATE PREPARE run_stmt;
+
+-- Show the indexes on the transactions table
+SHOW INDEX FROM transactions;
+
+-- Display success message
+SELECT 'Migration completed successfully! Filtered listing indexes added to transactions table.' as status;
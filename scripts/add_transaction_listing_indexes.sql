@@ -0,0 +1,64 @@
+-- MySQL Migration Script for the keyset-paginated transaction listing
+-- Run this script in MySQL Workbench
+
+-- /api/transactions pages through (transaction_date, created_at, id) newest
+-- first. This index serves that order and supersedes idx_transactions_user_date,
+-- whose columns are its prefix.
+SET @index_exists := (
+    SELECT COUNT(*)
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'transactions'
+      AND index_name = 'idx_transactions_user_date_created_id'
+);
+
+SET @stmt := IF(@index_exists = 0,
+    'CREATE INDEX idx_transactions_user_date_created_id ON transactions(user_id, transaction_date, created_at, id)',
+    'SELECT "Index idx_transactions_user_date_created_id already exists"');
+
+PREPARE run_stmt FROM @stmt;
+EXECUTE run_stmt;
+DEALLOCATE PREPARE run_stmt;
+
+SET @index_exists := (
+    SELECT COUNT(*)
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'transactions'
+      AND index_name = 'idx_transactions_user_date'
+);
+
+SET @stmt := IF(@index_exists = 1,
+    'DROP INDEX idx_transactions_user_date ON transactions',
+    'SELECT "Index idx_transactions_user_date already dropped"');
+
+PREPARE run_stmt FROM @stmt;
+EXECUTE run_stmt;
+DEALLOCATE PREPARE run_stmt;
+
+-- Listing filtered by account in the same order. MySQL drops the implicit
+-- foreign key index on account_id once this one exists.
+SET @index_exists := (
+    SELECT COUNT(*)
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'transactions'
+      AND index_name = 'idx_transactions_account_date_created_id'
+);
+
+SET @stmt := IF(@index_exists = 0,
+    'CREATE INDEX idx_transactions_account_date_created_id ON transactions(account_id, transaction_date, created_at, id)',
+    'SELECT "Index idx_transactions_account_date_created_id already exists"');
+
+PREPARE run_stmt FROM @stmt;
+EXECUTE run_stmt;
+DEALLOCATE PREPARE run_stmt;
+
+-- Type and category filters get their own indexes in
+-- add_transaction_filter_indexes.sql
+
+-- Show the indexes on the transactions table
+SHOW INDEX FROM transactions;
+
+-- Display success message
+SELECT 'Migration completed successfully! Listing indexes added to transactions table.' as status;
@@ -29,6 +29,7 @@ CREATE TABLE IF NOT EXISTS accounts (
     user_id INT NOT NULL,
     name VARCHAR(50) NOT NULL,
     balance DECIMAL(10,2) DEFAULT 0.00,
+    opening_balance DECIMAL(10,2) NOT NULL DEFAULT 0.00,
     account_type ENUM('upi', 'card', 'cash', 'personal') NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
@@ -60,7 +61,12 @@ CREATE TABLE IF NOT EXISTS transactions (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (account_id) REFERENCES accounts(id) ON DELETE CASCADE,
     FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE SET NULL,
-    FOREIGN KEY (to_account_id) REFERENCES accounts(id) ON DELETE SET NULL
+    FOREIGN KEY (to_account_id) REFERENCES accounts(id) ON DELETE SET NULL,
+    INDEX idx_transactions_user_date_created_id (user_id, transaction_date, created_at, id),
+    INDEX idx_transactions_user_type_date_created_id (user_id, type, transaction_date, created_at, id),
+    INDEX idx_transactions_user_category_date_created_id (user_id, category_id, transaction_date, created_at, id),
+    INDEX idx_transactions_account_date_created_id (account_id, transaction_date, created_at, id),
+    INDEX idx_transactions_user_category_type_date (user_id, category_id, type, transaction_date)
 );
 
 -- Budget table
@@ -77,5 +83,94 @@ CREATE TABLE IF NOT EXISTS budgets (
     UNIQUE KEY unique_budget (user_id, category_id, month, year)
 );
 
+-- Monthly rollups maintained by the write routes (category_id 0 = no category)
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    user_id INT NOT NULL,
+    year INT NOT NULL,
+    month INT NOT NULL,
+    type ENUM('income', 'expense', 'transfer') NOT NULL,
+    category_id INT NOT NULL DEFAULT 0,
+    total DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    transaction_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, year, month, type, category_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Outbound mail queue (see mail_queue.py)
+CREATE TABLE IF NOT EXISTS email_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(30) NOT NULL,
+    recipient VARCHAR(100) NOT NULL,
+    payload TEXT NOT NULL,
+    status ENUM('pending', 'sending', 'sent', 'dead') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    next_attempt_at DATETIME NOT NULL,
+    last_error TEXT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at DATETIME NULL,
+    INDEX idx_email_jobs_status_next (status, next_attempt_at)
+);
+
+-- Leader-elected job scheduler (see scheduler.py)
+CREATE TABLE IF NOT EXISTS scheduled_jobs (
+    id VARCHAR(64) PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    schedule VARCHAR(200) NOT NULL,
+    next_run_at DATETIME NULL,
+    last_run_at DATETIME NULL
+);
+
+CREATE TABLE IF NOT EXISTS job_runs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    job_id VARCHAR(64) NOT NULL,
+    scheduled_for DATETIME NOT NULL,
+    worker VARCHAR(100) NOT NULL,
+    status ENUM('running', 'succeeded', 'failed') NOT NULL DEFAULT 'running',
+    started_at DATETIME NOT NULL,
+    finished_at DATETIME NULL,
+    duration_ms INT NULL,
+    users INT NULL,
+    succeeded INT NULL,
+    failed INT NULL,
+    summary TEXT NULL,
+    error TEXT NULL,
+    INDEX idx_job_runs_job_started (job_id, started_at)
+);
+
+-- Resumable monthly report runs (see report_batch.py)
+CREATE TABLE IF NOT EXISTS report_runs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    year INT NOT NULL,
+    month INT NOT NULL,
+    status ENUM('running', 'completed') NOT NULL DEFAULT 'running',
+    checkpoint_user_id INT NOT NULL DEFAULT 0,
+    invocations INT NOT NULL DEFAULT 0,
+    started_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    finished_at DATETIME NULL,
+    users INT NULL,
+    sent INT NULL,
+    failed INT NULL,
+    skipped INT NULL,
+    UNIQUE KEY uniq_report_runs_period (year, month)
+);
+
+CREATE TABLE IF NOT EXISTS report_deliveries (
+    run_id INT NOT NULL,
+    user_id INT NOT NULL,
+    status ENUM('pending', 'sending', 'rendered', 'sent', 'failed', 'skipped') NOT NULL DEFAULT 'pending',
+    claim VARCHAR(32) NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at DATETIME NULL,
+    fingerprint VARCHAR(16) NULL,
+    stage VARCHAR(10) NULL,
+    last_error TEXT NULL,
+    sent_at DATETIME NULL,
+    PRIMARY KEY (run_id, user_id),
+    FOREIGN KEY (run_id) REFERENCES report_runs(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
 -- Insert default accounts for new users (will be handled in Python)
 -- Insert default categories (will be handled in Python)
@@ -64,14 +64,13 @@ async function loadDashboardData() {
   try {
     console.log("Loading dashboard data...")
 
-    // Load summary data
-    const summaryData = await apiRequest("/api/dashboard_data")
-    console.log("Summary data:", summaryData)
-    updateSummaryCards(summaryData)
+    // Summary, accounts, categories, budgets and the first transactions in one request
+    const data = await apiRequest("/api/dashboard/bootstrap")
+    console.log("Summary data:", data.summary)
+    updateSummaryCards(data.summary)
 
-    // Load accounts and categories
-    accounts = await apiRequest("/api/accounts")
-    categories = await apiRequest("/api/categories")
+    accounts = data.accounts
+    categories = data.categories
 
     console.log("Accounts:", accounts)
     console.log("Categories:", categories)
@@ -79,8 +78,14 @@ async function loadDashboardData() {
     // Update transaction form options
     updateTransactionFormOptions()
 
-    // Load initial tab data
-    loadTabData(currentTab)
+    // Render the initial tab from the same payload
+    if (currentTab === "records") {
+      displayTransactions(data.transactions)
+    } else if (currentTab === "budget") {
+      displayBudgets(data.budgets)
+    } else {
+      loadTabData(currentTab)
+    }
   } catch (error) {
     console.error("Failed to load dashboard data:", error)
     showNotification("Failed to load dashboard data", "error")
@@ -0,0 +1,88 @@
+# Streaming export of a user's transaction history as CSV or NDJSON
+#
+# Rows come from an unbuffered (server-side) cursor in fetchmany() batches
+# and are encoded and yielded batch by batch, so memory use does not grow
+# with the size of the history. The cursor's connection cannot run other
+# statements until the result set is exhausted, so the export gets its own
+# connection for the lifetime of the response.
+
+import csv
+import io
+import json
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_COLUMNS = ['id', 'transaction_date', 'type', 'amount', 'category', 'account', 'to_account',
+                  'description', 'created_at']
+
+
+def iter_transactions(cursor, conditions, params, batch_size=1000):
+    """Yield lists of export rows, oldest first"""
+    cursor.execute(f"""
+        SELECT t.id, t.transaction_date, t.type, t.amount,
+               c.name as category_name, a.name as account_name,
+               a2.name as to_account_name, t.description, t.created_at
+        FROM transactions t
+        LEFT JOIN categories c ON t.category_id = c.id
+        LEFT JOIN accounts a ON t.account_id = a.id
+        LEFT JOIN accounts a2 ON t.to_account_id = a2.id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY t.transaction_date, t.created_at, t.id
+    """, params)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def _value(value):
+    if value is None:
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (int, str)):
+        return value
+    # DECIMAL amounts keep their exact two-decimal form
+    return str(value)
+
+
+def encode_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        writer.writerows([['' if v is None else _value(v) for v in row] for row in rows])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def encode_ndjson(batches):
+    for rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, [_value(v) for v in row]))) + '\n'
+            for row in rows
+        )
+
+
+def stream_export(connection, conditions, params, fmt, batch_size=1000):
+    """Generator of encoded chunks; closes the connection when done or abandoned"""
+    cursor = connection.cursor(buffered=False)
+    try:
+        batches = iter_transactions(cursor, conditions, params, batch_size)
+        encode = encode_csv if fmt == 'csv' else encode_ndjson
+        for chunk in encode(batches):
+            yield chunk
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            # An abandoned download leaves unread rows; the pool discards
+            # the connection when its rollback fails on return
+            pass
+        connection.close()
@@ -0,0 +1,156 @@
+# Keyset pagination for the transaction listing API
+#
+# Pages are ordered by (transaction_date, created_at, id), newest first, and
+# the next page starts strictly after the last row of the previous one. Each
+# equality filter has an index ending in (transaction_date, created_at, id):
+#
+#   no filter / dates only   (user_id, transaction_date, created_at, id)
+#   type                     (user_id, type, transaction_date, created_at, id)
+#   category_id              (user_id, category_id, transaction_date, created_at, id)
+#   account_id               (account_id, transaction_date, created_at, id)
+#
+# so a page is a range scan in index order with no sort, reading one page of
+# rows however deep into the history it is, whereas OFFSET would read and
+# discard every earlier row. Amount bounds, and any filter combined with
+# another, are checked on rows along that scan: still no sort, but a page
+# costs as many rows as the scan passes over before it fills.
+
+import base64
+import json
+import math
+from datetime import date, datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+TRANSACTION_TYPES = ('income', 'expense', 'transfer')
+
+
+class InvalidListingQuery(ValueError):
+    """Raised for malformed filters or cursors; the message is safe to show"""
+
+
+def encode_cursor(transaction_date, created_at, transaction_id):
+    """Opaque cursor pointing just after the given row"""
+    raw = json.dumps([transaction_date.isoformat(), created_at.isoformat(), transaction_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        transaction_date, created_at, transaction_id = json.loads(raw)
+        return date.fromisoformat(transaction_date), datetime.fromisoformat(created_at), int(transaction_id)
+    except (ValueError, TypeError):
+        raise InvalidListingQuery('Invalid cursor')
+
+
+def _parse(args, name, convert, label):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return convert(value)
+    except ValueError:
+        raise InvalidListingQuery(f"Invalid {label}: {value}")
+
+
+def _amount(value):
+    amount = float(value)
+    # float() accepts 'nan' and 'inf', which would make the filter meaningless
+    if not math.isfinite(amount):
+        raise ValueError(value)
+    return amount
+
+
+def parse_filters(args):
+    """Turn request query arguments into a filter dict"""
+    filters = {
+        'start_date': _parse(args, 'start_date', date.fromisoformat, 'start_date'),
+        'end_date': _parse(args, 'end_date', date.fromisoformat, 'end_date'),
+        'type': args.get('type') or None,
+        'category_id': _parse(args, 'category_id', int, 'category_id'),
+        'account_id': _parse(args, 'account_id', int, 'account_id'),
+        'min_amount': _parse(args, 'min_amount', _amount, 'min_amount'),
+        'max_amount': _parse(args, 'max_amount', _amount, 'max_amount'),
+        'after': _parse(args, 'cursor', decode_cursor, 'cursor'),
+    }
+    if filters['type'] is not None and filters['type'] not in TRANSACTION_TYPES:
+        raise InvalidListingQuery(f"Invalid type: {filters['type']}")
+
+    limit = _parse(args, 'limit', int, 'limit')
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    elif limit < 1:
+        raise InvalidListingQuery(f"Invalid limit: {limit}")
+    filters['limit'] = min(limit, MAX_PAGE_SIZE)
+    return filters
+
+
+def filter_conditions(user_id, filters):
+    """WHERE conditions and parameters for the filters shared by listing and export"""
+    conditions = ["t.user_id = %s"]
+    params = [user_id]
+
+    if filters['start_date']:
+        conditions.append("t.transaction_date >= %s")
+        params.append(filters['start_date'])
+    if filters['end_date']:
+        conditions.append("t.transaction_date <= %s")
+        params.append(filters['end_date'])
+    if filters['type']:
+        conditions.append("t.type = %s")
+        params.append(filters['type'])
+    if filters['category_id'] is not None:
+        conditions.append("t.category_id = %s")
+        params.append(filters['category_id'])
+    if filters['account_id'] is not None:
+        conditions.append("t.account_id = %s")
+        params.append(filters['account_id'])
+    if filters['min_amount'] is not None:
+        conditions.append("t.amount >= %s")
+        params.append(filters['min_amount'])
+    if filters['max_amount'] is not None:
+        conditions.append("t.amount <= %s")
+        params.append(filters['max_amount'])
+    return conditions, params
+
+
+def fetch_page(cursor, user_id, filters):
+    """Return (rows, next_cursor) for one page; next_cursor is None on the last page
+
+    Rows are (id, amount, type, transaction_date, description, category_name,
+    account_name, to_account_name).
+    """
+    conditions, params = filter_conditions(user_id, filters)
+
+    if filters['after']:
+        # Expanded row comparison; the leading date bound keeps it a range scan
+        after_date, after_created, after_id = filters['after']
+        conditions.append("""t.transaction_date <= %s AND (
+            t.transaction_date < %s
+            OR (t.transaction_date = %s AND (t.created_at < %s OR (t.created_at = %s AND t.id < %s)))
+        )""")
+        params.extend([after_date, after_date, after_date, after_created, after_created, after_id])
+
+    # One extra row tells us whether another page exists
+    params.append(filters['limit'] + 1)
+    cursor.execute(f"""
+        SELECT t.id, t.amount, t.type, t.transaction_date, t.description,
+               c.name as category_name, a.name as account_name,
+               a2.name as to_account_name, t.created_at
+        FROM transactions t
+        LEFT JOIN categories c ON t.category_id = c.id
+        LEFT JOIN accounts a ON t.account_id = a.id
+        LEFT JOIN accounts a2 ON t.to_account_id = a2.id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY t.transaction_date DESC, t.created_at DESC, t.id DESC
+        LIMIT %s
+    """, params)
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > filters['limit']:
+        rows = rows[:filters['limit']]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[3], last[8], last[0])
+    return [row[:8] for row in rows], next_cursor